@@ -0,0 +1,4 @@
+'''Benchmarks for prog3 and mp3_demo. Each bench_* module can be run from the repository root with
+python3 -m benchmarks.bench_<name>
+
+bench_suite times seeded workloads for the main entry points and can save its results and compare a later run against them.'''
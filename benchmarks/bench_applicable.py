@@ -0,0 +1,75 @@
+'''Walks a long plan on a generated river crossing problem and keeps the set of applicable actions up to date after every step, once with
+prog3_planner.ApplicableActions (only the actions indexed under a changed fact are checked again), once by checking every ground action and
+once by grounding the operators against the state. Also times prog3_planner.validate_plan on the same plan.
+
+    python3 -m benchmarks.bench_applicable [copies] [steps]'''
+import sys
+import time
+
+import prog3
+import prog3_planner
+from benchmarks import generators
+
+def boat_plan(copies, steps):
+    '''Moves the boat of every copy back and forth, one copy after another.'''
+    plan = list()
+    for i in range(steps):
+        label = generators.operator_suffix(i % copies)
+        there = (i // copies) % 2 == 0
+        plan.append('(MoveBoat%s (%s)(%s)(|j|))' % (label, '|d|' if there else '|e|', '|e|' if there else '|d|'))
+    return plan
+
+def main(argv):
+    copies = int(argv[1]) if len(argv) > 1 else 8
+    steps = int(argv[2]) if len(argv) > 2 else 2000
+    domain = prog3_planner.load_domain(generators.river_crossing_problem(copies))
+    actions = prog3_planner.relaxed_actions(domain)
+    plan = boat_plan(copies, steps)
+    ground_plan = list()
+    for action_s in plan:
+        label, arguments = prog3.parse_action(action_s)
+        ground_plan.append(prog3_planner.GroundAction(domain.operators[label], arguments))
+    print('%d copies, %d ground actions, %d step plan' % (copies, len(actions), steps))
+
+    start = time.perf_counter()
+    index = prog3_planner.ApplicableActions(actions, domain.init)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    sizes = list()
+    for action in ground_plan:
+        index.apply(action)
+        sizes.append(len(index.applicable))
+    index_time = time.perf_counter() - start
+    print('index build      %10.2f ms' % (build_time * 1e3))
+    print('incremental      %10.2f us/step  %6.1f rechecks/step' % (index_time / steps * 1e6, index.rechecks / steps))
+
+    #The full rescan is slow, so it is measured on a prefix of the plan
+    scan_steps = min(steps, 200)
+    world_state = prog3.WorldState(domain.init)
+    start = time.perf_counter()
+    for step, action in enumerate(ground_plan[:scan_steps]):
+        world_state.apply(action.add_facts, action.delete_facts)
+        count = 0
+        for candidate in actions:
+            if all([fact in world_state.facts for fact in candidate.delete_facts]) and candidate.op.preconditions_hold(candidate.arguments, world_state):
+                count += 1
+        assert count == sizes[step]
+    scan_time = (time.perf_counter() - start) / scan_steps
+    print('full rescan      %10.2f us/step  %8.1fx' % (scan_time * 1e6, scan_time / (index_time / steps)))
+
+    world_state = prog3.WorldState(domain.init)
+    start = time.perf_counter()
+    for step, action in enumerate(ground_plan[:scan_steps]):
+        world_state.apply(action.add_facts, action.delete_facts)
+        count = len(list(prog3_planner.applicable_actions(domain, world_state)))
+        assert count == sizes[step]
+    ground_time = (time.perf_counter() - start) / scan_steps
+    print('re-grounding     %10.2f us/step  %8.1fx' % (ground_time * 1e6, ground_time / (index_time / steps)))
+
+    start = time.perf_counter()
+    failed_step, world_state = prog3_planner.validate_plan(domain, plan)
+    assert failed_step is None
+    print('validate_plan    %10.2f us/step' % ((time.perf_counter() - start) / steps * 1e6))
+
+if __name__ == '__main__':
+    main(sys.argv)
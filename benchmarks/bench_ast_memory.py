@@ -0,0 +1,64 @@
+'''Measures with tracemalloc how much memory it takes to keep many parsed propositions alive as LexNode trees (with and without
+__slots__) and as rows of a prog3.NodeTable.
+
+    python3 -m benchmarks.bench_ast_memory [propositions]'''
+import random
+import sys
+import time
+import tracemalloc
+
+import prog3
+from benchmarks import generators
+
+class DictLexNode(object):
+    '''LexNode as it was before it had __slots__, with a per-instance __dict__.'''
+    def __init__(self, token, parent = None):
+        self.non_term = token.non_term
+        self.val = token.val
+        self.loc = token.loc
+        self.parent = parent
+        self.children = list()
+
+def dict_tree(lex_tree):
+    '''Copies a LexNode tree into DictLexNode objects.'''
+    root = DictLexNode(lex_tree)
+    stack = [(lex_tree, root)]
+    while stack:
+        node, copy = stack.pop()
+        for child in node.children:
+            child_copy = DictLexNode(child, copy)
+            copy.children.append(child_copy)
+            stack.append((child, child_copy))
+    return root
+
+def measure(label, build, props, node_count):
+    '''Builds every proposition with build and keeps the results alive while tracemalloc measures them.'''
+    tracemalloc.start()
+    start = time.perf_counter()
+    kept = build(props)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('%-22s %10.1f KiB retained %10.1f KiB peak %8.1f bytes/node %8.0f ms' % (label, current / 1024, peak / 1024, current / node_count, elapsed * 1000))
+    return kept
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 2000
+    rng = random.Random(1)
+    atoms = generators.atom_names(16)
+    props = [generators.random_proposition(rng, atoms, 6) for _ in range(count)]
+    trees = [prog3.construct_parse_tree(prog3.tokenize_string(prop)) for prop in props]
+    node_count = sum(len(tree.construct_text_from_nodes()) + 1 for tree in trees)
+    print('%d propositions, %d nodes' % (count, node_count))
+    del trees
+
+    measure('LexNode, __dict__', lambda ps: [dict_tree(prog3.construct_parse_tree(prog3.tokenize_string(p))) for p in ps], props, node_count)
+    measure('LexNode, __slots__', lambda ps: [prog3.construct_parse_tree(prog3.tokenize_string(p)) for p in ps], props, node_count)
+
+    def build_table(ps):
+        table = prog3.NodeTable()
+        return table, [table.add_string(p) for p in ps]
+    measure('NodeTable', build_table, props, node_count)
+
+if __name__ == '__main__':
+    main(sys.argv)
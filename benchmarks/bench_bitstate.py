@@ -0,0 +1,57 @@
+'''Compares the two state representations of prog3_planner.search on generated river crossing problems: frozensets of fact tuples and ints
+from prog3_bitstate. Reports the time to generate successors, to hash states into a closed set, the memory of one state and whole searches.
+
+    python3 -m benchmarks.bench_bitstate [copies] [states]'''
+import sys
+import time
+
+import prog3_bitstate
+import prog3_planner
+from benchmarks import generators
+from benchmarks.bench_relaxed import random_states
+
+def successor_time(space, states):
+    start = time.perf_counter()
+    count = 0
+    for state in states:
+        for action, successor in space.successors(state):
+            count += 1
+    return (time.perf_counter() - start) / len(states), count
+
+def main(argv):
+    copies = int(argv[1]) if len(argv) > 1 else 8
+    state_count = int(argv[2]) if len(argv) > 2 else 500
+    domain = prog3_planner.load_domain(generators.river_crossing_problem(copies))
+    actions = prog3_planner.relaxed_actions(domain)
+    set_states = random_states(domain, actions, state_count)
+    set_space = prog3_planner.SetStateSpace(domain, actions)
+    bit_space = prog3_bitstate.BitStateSpace(domain, actions)
+    bit_states = [bit_space.encoder.encode(state) for state in set_states]
+    print('%d copies, %d ground actions, %d facts numbered, %d states' % (copies, len(actions), len(bit_space.encoder.facts), len(set_states)))
+
+    set_time, set_count = successor_time(set_space, set_states)
+    bit_time, bit_count = successor_time(bit_space, bit_states)
+    assert set_count == bit_count
+    print('successors        sets %9.1f us/state   bits %9.1f us/state  %6.1fx' % (set_time * 1e6, bit_time * 1e6, set_time / bit_time))
+
+    #A fresh copy of every state, as the search would build, so no cached hash is reused
+    fresh_sets = [frozenset(list(state)) for state in set_states] * 20
+    fresh_bits = [state + 0 for state in bit_states] * 20
+    start = time.perf_counter()
+    closed = set(fresh_sets)
+    set_hash = (time.perf_counter() - start) / len(fresh_sets)
+    start = time.perf_counter()
+    closed = set(fresh_bits)
+    bit_hash = (time.perf_counter() - start) / len(fresh_bits)
+    print('closed set insert sets %9.3f us/state   bits %9.3f us/state  %6.1fx' % (set_hash * 1e6, bit_hash * 1e6, set_hash / bit_hash))
+
+    set_bytes = sum([sys.getsizeof(state) for state in set_states]) / len(set_states)
+    bit_bytes = sum([sys.getsizeof(state) for state in bit_states]) / len(bit_states)
+    print('bytes per state   sets %9.1f            bits %9.1f           %6.1fx' % (set_bytes, bit_bytes, set_bytes / bit_bytes))
+
+    for states in ('sets', 'bits'):
+        result = prog3_planner.search(domain, 'gbfs', 'hff', None, states)
+        print('gbfs h_ff search  %-4s %9.3f s  plan length %d, %d expanded' % (states, result.seconds, len(result.plan), result.expanded))
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,92 @@
+'''Compares loading a planning problem from its lisp-readable source (parsing it and grounding its actions) with loading the compiled file
+from prog3_compiled, both in this process with an empty parse cache and as a cold start of a new interpreter. Both ways end with the ground
+actions in memory, except for the first compiled time, which is what validating plans needs. First checks that a domain with quantified
+preconditions validates and plans the same way from its compiled file as from its source.
+
+    python3 -m benchmarks.bench_compiled [copies]'''
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import prog3
+import prog3_compiled
+import prog3_planner
+from benchmarks import generators
+
+PARSE_SCRIPT = 'import sys, prog3_planner; prog3_planner.relaxed_actions(prog3_planner.load_domain(open(sys.argv[1])))'
+COMPILED_SCRIPT = 'import sys, prog3_compiled; prog3_compiled.load_compiled(sys.argv[1] + ".p3d", sys.argv[1]).ground_actions'
+#Each script's time has the time of just its imports taken off
+PARSE_IMPORTS = 'import sys, prog3_planner'
+COMPILED_IMPORTS = 'import sys, prog3_compiled'
+QUANTIFIED_PROBLEM = '''(init (Q |a| |b|) (R |b| |c|) (R |b| |d|) (Q |a| |c|))
+(goal (P |e| |b|))
+(actions
+(MoveAll (Param (|u|) (|x|)) (Precon (AND (Q |u| |x|) (ALL |y| (IMPLIES (R |x| |y|) (Q |u| |y|))))) (AddList (P |e| |x|)) (DelList (Q |u| |x|)))
+(Add (Param (|u|) (|x|)) (Precon (AND (R |b| |x|) (NOT (Q |u| |x|)))) (AddList (Q |u| |x|)) (DelList (R |b| |x|)))
+)
+'''
+QUANTIFIED_PLANS = [['(MoveAll (|a|)(|b|))'], ['(Add (|a|)(|d|))', '(MoveAll (|a|)(|b|))'], ['(MoveAll (|a|)(|c|))', '(MoveAll (|a|)(|b|))']]
+
+def best_of(function, repeat=5):
+    times = list()
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def parse_source(source_path):
+    prog3.parse_cache.clear()
+    with open(source_path) as source_file:
+        return prog3_planner.relaxed_actions(prog3_planner.load_domain(source_file))
+
+def cold_start(script, source_path):
+    return best_of(lambda: subprocess.run([sys.executable, '-c', script, source_path], check=True), 9)
+
+def check_quantified(directory):
+    '''Checks that quantified preconditions read back from a compiled file are model checked just as the parsed ones are.'''
+    source_path = os.path.join(directory, 'quantified.in')
+    with open(source_path, 'w') as source_file:
+        source_file.write(QUANTIFIED_PROBLEM)
+    parsed = prog3_compiled.compile_domain(source_path, source_path + '.p3d')
+    compiled = prog3_compiled.load_compiled(source_path + '.p3d', source_path)
+    for plan in QUANTIFIED_PLANS:
+        compiled_step, compiled_state = prog3_planner.validate_plan(compiled, plan)
+        parsed_step, parsed_state = prog3_planner.validate_plan(parsed, plan)
+        assert (compiled_step, list(compiled_state)) == (parsed_step, list(parsed_state)), plan
+    for states in ('sets', 'bits'):
+        assert prog3_planner.search(compiled, states=states).plan_text() == prog3_planner.search(parsed, states=states).plan_text(), states
+
+def main(argv):
+    copies = int(argv[1]) if len(argv) > 1 else 8
+    with tempfile.TemporaryDirectory() as directory:
+        check_quantified(directory)
+        for name, text in (('demo', None), ('%d copies' % copies, generators.river_crossing_problem(copies))):
+            if text is None:
+                source_path = os.path.abspath('prog3_plan_demo.in')
+                compiled_source = os.path.join(directory, 'demo.in')
+                with open(source_path) as source_file, open(compiled_source, 'w') as copy_file:
+                    copy_file.write(source_file.read())
+                source_path = compiled_source
+            else:
+                source_path = os.path.join(directory, 'copies.in')
+                with open(source_path, 'w') as source_file:
+                    source_file.write(text)
+            domain = prog3_compiled.compile_domain(source_path, source_path + '.p3d')
+            print('%s: %d operators, %d ground actions, %d byte compiled file' % (name, len(domain.operators), len(domain.ground_actions), os.path.getsize(source_path + '.p3d')))
+            parse_time = best_of(lambda: parse_source(source_path))
+            load_time = best_of(lambda: prog3_compiled.load_compiled(source_path + '.p3d', source_path))
+            actions_time = best_of(lambda: prog3_compiled.load_compiled(source_path + '.p3d', source_path).ground_actions)
+            print('  in process   parse %8.2f ms   compiled %8.2f ms  %6.1fx   compiled with ground actions %8.2f ms  %6.1fx' % (parse_time * 1e3,
+                  load_time * 1e3, parse_time / load_time, actions_time * 1e3, parse_time / actions_time))
+            parse_imports = cold_start(PARSE_IMPORTS, source_path)
+            compiled_imports = cold_start(COMPILED_IMPORTS, source_path)
+            parse_cold = cold_start(PARSE_SCRIPT, source_path) - parse_imports
+            load_cold = cold_start(COMPILED_SCRIPT, source_path) - compiled_imports
+            print('  cold start   parse %8.2f ms   compiled %8.2f ms  (after %.1f / %.1f ms of interpreter start and imports)' % (parse_cold * 1e3,
+                  load_cold * 1e3, parse_imports * 1e3, compiled_imports * 1e3))
+
+if __name__ == '__main__':
+    main(sys.argv)
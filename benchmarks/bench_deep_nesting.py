@@ -0,0 +1,47 @@
+'''Stress test for deeply nested propositions. Builds (NOT (NOT (... (P) ...))) chains, right nested AND chains and a deep FOL
+term, then runs every tree walker in prog3 on them at the default recursion limit and reports how long each one took.
+
+    python3 -m benchmarks.bench_deep_nesting [depth]'''
+import sys
+import time
+
+import prog3
+
+def not_chain(depth):
+    return '(NOT ' * depth + '(P)' + ')' * depth
+
+def and_chain(depth):
+    return '(AND (P) ' * depth + '(Q)' + ')' * depth
+
+def fol_chain(depth):
+    return '(NOT ' * depth + '(P |x| |a| (|f| |y|))' + ')' * depth
+
+def timed(label, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    print('%-38s %9.2f ms' % (label, (time.perf_counter() - start) * 1000))
+    return result
+
+def main(argv):
+    depth = int(argv[1]) if len(argv) > 1 else 100000
+    print('Nesting depth %d, recursion limit %d' % (depth, sys.getrecursionlimit()))
+
+    tree = timed('NOT chain: parse', lambda s: prog3.construct_parse_tree(prog3.tokenize_string(s)), not_chain(depth))
+    assert timed('NOT chain: evaluate_tree', prog3.evaluate_tree, tree, {'P': True}) == (depth % 2 == 0)
+    text = timed('NOT chain: construct_text_from_nodes', tree.construct_text_from_nodes)
+    assert len(text) == depth + 1
+    program, symbol_list = timed('NOT chain: compile_tree', prog3.compile_tree, tree)
+    assert timed('NOT chain: evaluate_postorder', prog3.evaluate_postorder, program, symbol_list, {'P': True}) == (depth % 2 == 0)
+    assert timed('NOT chain: IsTautology', prog3.IsTautology, not_chain(depth)) == 'nil'
+
+    tree = timed('AND chain: parse', lambda s: prog3.construct_parse_tree(prog3.tokenize_string(s)), and_chain(depth))
+    assert timed('AND chain: evaluate_tree', prog3.evaluate_tree, tree, {'P': True, 'Q': True}) is True
+    assert len(timed('AND chain: construct_text_from_nodes', tree.construct_text_from_nodes)) == 2 * depth + 1
+
+    tree = timed('FOL chain: parse', lambda s: prog3.construct_parse_tree(prog3.tokenize_string(s), True), fol_chain(depth))
+    assert timed('FOL chain: get_var_terms', tree.get_var_terms) == ['(|x|)', '(|a|)', '(|f|)', '(|y|)']
+    assert timed('FOL chain: wfp_checkerFOL', prog3.wfp_checkerFOL, fol_chain(depth)) == 't'
+    print('All walkers completed without RecursionError.')
+
+if __name__ == '__main__':
+    main(sys.argv)
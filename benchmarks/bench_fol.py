@@ -0,0 +1,99 @@
+'''Model checks quantified formulas against random graphs over growing sets of constants, once with prog3_fol.ModelChecker (guard atoms
+found through the WorldState indexes, subformulas memoized per binding) and once by a naive evaluator that loops over every constant for every
+quantifier. The naive evaluator is skipped for larger sizes once it takes longer than a few seconds.
+
+    python3 -m benchmarks.bench_fol [max_constants] [seed]'''
+import random
+import sys
+import time
+
+import prog3_fol
+
+FORMULAS = [
+    ('every P has a P successor', '(ALL |x| (IMPLIES (P |x|) (EXISTS |y| (AND (Q |x| |y|) (P |y|)))))'),
+    ('some two-cycle', '(EXISTS |x| (EXISTS |y| (AND (Q |x| |y|) (Q |y| |x|))))'),
+    ('every edge continues', '(ALL |x| |y| (IMPLIES (Q |x| |y|) (EXISTS |z| (Q |y| |z|))))'),
+    ('no self loop', '(NOT (EXISTS |x| (Q |x| |x|)))'),
+]
+
+NAIVE_LIMIT = 5.0
+
+def random_facts(constants, degree, rng):
+    '''Returns the facts of a random graph: (P c) for half the constants and degree (Q c d) edges out of every constant.'''
+    facts = list()
+    for constant in constants:
+        if rng.random() < 0.5:
+            facts.append(('P', constant))
+        for d in range(degree):
+            facts.append(('Q', constant, rng.choice(constants)))
+    return facts
+
+def naive_holds(node, binding, facts, constants):
+    '''Evaluates a compiled formula by trying every constant for every quantifier, without an index or a memo.'''
+    if node.kind == 'atom':
+        return (node.value,) + tuple([binding[term[1]] if term[0] == 'var' else term[1] for term in node.terms]) in facts
+    if node.kind == 'NOT':
+        return not naive_holds(node.children[0], binding, facts, constants)
+    if node.kind in prog3_fol.QUANTIFIERS:
+        for constant in constants:
+            extended = dict(binding)
+            extended[node.value] = constant
+            if naive_holds(node.children[0], extended, facts, constants) != (node.kind == 'ALL'):
+                return node.kind == 'EXISTS'
+        return node.kind == 'ALL'
+    a = naive_holds(node.children[0], binding, facts, constants)
+    if node.kind == 'AND' and not a or node.kind == 'OR' and a or node.kind == 'IMPLIES' and not a:
+        return node.kind != 'AND'
+    b = naive_holds(node.children[1], binding, facts, constants)
+    return a == b if node.kind == 'EQUIV' else b
+
+#Pairs of formulas that differ only in their predicates, so their compiled trees have the same shape
+SHARED_CHECKER_FORMULAS = ['(NOT (P |a|))', '(NOT (R |a|))', '(EXISTS |x| (P |x|))', '(EXISTS |x| (R |x|))'] + [wfp_s for name, wfp_s in FORMULAS]
+
+def check_shared_checker(rng):
+    '''Checks that one ModelChecker gives the naive answer for every formula when it is reused across different formulas, since its memo
+outlives each call to holds.'''
+    #Constants that can be written in a formula
+    constants = ['|a|', '|b|', '|c|', '|d|', '|e|', '|j|']
+    facts = random_facts(constants, 2, rng)
+    structure = prog3_fol.Structure(facts, constants)
+    fact_set = set(structure.world_state.facts)
+    checker = prog3_fol.ModelChecker(structure)
+    for wfp_s in SHARED_CHECKER_FORMULAS * 2:
+        formula = prog3_fol.compile_formula(wfp_s)
+        assert checker.holds(formula) == naive_holds(formula, dict(), fact_set, constants), wfp_s
+
+def main(argv):
+    max_constants = int(argv[1]) if len(argv) > 1 else 5000
+    rng = random.Random(int(argv[2]) if len(argv) > 2 else 0)
+    check_shared_checker(rng)
+    naive_skipped = set()
+    size = 100
+    while size <= max_constants:
+        constants = ['|c%d|' % i for i in range(size)]
+        facts = random_facts(constants, 3, rng)
+        structure = prog3_fol.Structure(facts, constants)
+        fact_set = set(structure.world_state.facts)
+        print('%d constants, %d facts' % (size, len(facts)))
+        for name, wfp_s in FORMULAS:
+            formula = prog3_fol.compile_formula(wfp_s)
+            checker = prog3_fol.ModelChecker(structure)
+            start = time.perf_counter()
+            value = checker.holds(formula)
+            checker_time = time.perf_counter() - start
+            line = '  %-26s %-5s checker %9.2f ms  %8d lookups %8d memo hits' % (name, value, checker_time * 1e3, checker.lookups, checker.memo_hits)
+            if name in naive_skipped:
+                line += '  naive skipped'
+            else:
+                start = time.perf_counter()
+                naive_value = naive_holds(formula, dict(), fact_set, constants)
+                naive_time = time.perf_counter() - start
+                assert naive_value == value
+                line += '  naive %10.2f ms %8.1fx' % (naive_time * 1e3, naive_time / checker_time)
+                if naive_time > NAIVE_LIMIT / 4:
+                    naive_skipped.add(name)
+            print(line)
+        size *= 4
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,81 @@
+'''A differential check, not a unit test: prog3.wfp_checker and prog3.wfp_checkerFOL now validate with check_well_formed, and this
+makes sure they give the same answer as the tokenize-and-parse checkers they replaced on generated propositions, FOL formulas, their
+broken variants and random token soup. Then times both versions on the generated inputs.
+
+    python3 -m benchmarks.bench_fused_checker [count] [seed]'''
+import random
+import sys
+import time
+
+import prog3
+from benchmarks import generators
+
+def legacy_wfp_checker(input_string):
+    '''The wfp_checker that tokenized the input and built its tree.'''
+    tokens = prog3.tokenize_string(input_string)
+    if tokens is None:
+        return 'nil'
+    if prog3.construct_parse_tree(tokens):
+        return 't'
+    return 'nil'
+
+def legacy_wfp_checkerFOL(input_s):
+    '''The wfp_checkerFOL that tokenized the input and built its tree.'''
+    tokenized_input = prog3.tokenize_string(input_s)
+    if tokenized_input:
+        if prog3.construct_parse_tree(tokenized_input, True):
+            return 't'
+        return 'nil'
+    return 'nil'
+
+#Pieces of input that random token soup is built from, covering every kind of token, whitespace and characters that do not tokenize
+SOUP = ['(', ')', '(', ')', 'AND', 'OR', 'NOT', 'IMPLIES', 'EQUIV', 'ALL', 'EXISTS', 'P', 'Q1', '"quoted atom"', '|a|', '|j|', '|f|',
+        '|x|', '|z|', ' ', ' ', '\t', '\n', 'p', '|k|', '?', '']
+
+def token_soup(rng, length):
+    return ''.join([rng.choice(SOUP) + (' ' if rng.random() < 0.5 else '') for i in range(length)])
+
+def differential_inputs(rng, count):
+    '''Returns count inputs of every kind the checkers have to agree on.'''
+    atoms = generators.atom_names(6)
+    predicates = ['A', 'P', 'Q']
+    inputs = ['', ' ', '(', ')', '()', '(()', '(P))', '((P))', '(P) (Q)', '(P AND)', '(NOT)', '(ALL |x| (P |x|))']
+    makers = [lambda: generators.random_proposition(rng, atoms, rng.randint(0, 6)),
+              lambda: generators.ill_formed_proposition(rng, atoms, rng.randint(0, 6)),
+              lambda: generators.random_fol_formula(rng, predicates, rng.randint(0, 6)),
+              lambda: generators.ill_formed_fol_formula(rng, predicates, rng.randint(0, 6)),
+              lambda: token_soup(rng, rng.randint(1, 12))]
+    while len(inputs) < count:
+        inputs.append(rng.choice(makers)())
+    return inputs
+
+def time_checker(checker, inputs):
+    start = time.perf_counter()
+    for input_s in inputs:
+        checker(input_s)
+    return (time.perf_counter() - start) / len(inputs)
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 200000
+    rng = random.Random(int(argv[2]) if len(argv) > 2 else 0)
+    inputs = differential_inputs(rng, count)
+    pairs = [('wfp_checker', prog3.wfp_checker, legacy_wfp_checker), ('wfp_checkerFOL', prog3.wfp_checkerFOL, legacy_wfp_checkerFOL)]
+    for name, checker, legacy_checker in pairs:
+        mismatches = [input_s for input_s in inputs if checker(input_s) != legacy_checker(input_s)]
+        accepted = len([input_s for input_s in inputs if checker(input_s) == 't'])
+        print('%-15s %d inputs, %d well-formed, %d mismatches' % (name, len(inputs), accepted, len(mismatches)))
+        for input_s in mismatches[:10]:
+            print('    %r' % input_s)
+        assert not mismatches
+
+    atoms = generators.atom_names(8)
+    sample = min(count, 20000)
+    propositions = [generators.random_proposition(rng, atoms, 7) for i in range(sample)]
+    formulas = [generators.random_fol_formula(rng, ['A', 'P', 'Q'], 7) for i in range(sample)]
+    for name, checker, legacy_checker, timed_inputs in [pairs[0] + (propositions,), pairs[1] + (formulas,)]:
+        legacy_time = time_checker(legacy_checker, timed_inputs)
+        fused_time = time_checker(checker, timed_inputs)
+        print('%-15s tokenize and parse %8.2f us  single scan %8.2f us  %5.1fx' % (name, legacy_time * 1e6, fused_time * 1e6, legacy_time / fused_time))
+
+if __name__ == '__main__':
+    main(sys.argv)
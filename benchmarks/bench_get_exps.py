@@ -0,0 +1,91 @@
+'''Compares prog3.get_exps with the stack based splitter it replaced, on a large generated input, and shows that
+prog3.iter_exps reading from a file keeps its peak memory flat as the file grows.
+
+    python3 -m benchmarks.bench_get_exps [megabytes]'''
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import prog3
+from benchmarks import generators
+
+def legacy_get_exps(string_to_parse):
+    '''The original implementation of prog3.get_exps, which scans its character stack for '(' on every character.'''
+    paren_stack = list()
+    list_exps = list()
+    start_i = 0
+    end_i = 0
+    for index,character in enumerate(string_to_parse):
+        if not character in string.whitespace:
+            if not '(' in paren_stack:
+                start_i = index
+            if character == ')':
+                top = paren_stack.pop()
+                while(top != '(' and len(paren_stack) > 0):
+                    top = paren_stack.pop()
+                if not '(' in paren_stack:
+                    end_i = index+1
+                    list_exps.append(string_to_parse[start_i:end_i])
+            else:
+                paren_stack.append(character)
+    return list_exps
+
+def generated_text(size):
+    '''Returns at least size characters of newline separated part_a blocks of random propositions.'''
+    rng = random.Random(1)
+    atoms = generators.atom_names(16)
+    blocks = list()
+    total = 0
+    while total < size:
+        block = '(part_a %s)\n' % ' '.join(generators.random_proposition(rng, atoms, 5) for _ in range(50))
+        blocks.append(block)
+        total += len(block)
+    return ''.join(blocks)
+
+def count_file_exps(path):
+    count = 0
+    with open(path, 'rb') as f:
+        for offset, expression in prog3.iter_exps(f):
+            count += 1
+    return count
+
+def main(argv):
+    megabytes = float(argv[1]) if len(argv) > 1 else 4
+    text = generated_text(int(megabytes * (1 << 20)))
+    print('Input of %.1f MB' % (len(text) / float(1 << 20)))
+
+    start = time.perf_counter()
+    old = legacy_get_exps(text)
+    legacy_time = time.perf_counter() - start
+    start = time.perf_counter()
+    new = prog3.get_exps(text)
+    new_time = time.perf_counter() - start
+    assert old == new
+    print('legacy get_exps  %8.2f s' % legacy_time)
+    print('get_exps         %8.2f s  %6.1fx' % (new_time, legacy_time / new_time))
+
+    handle, path = tempfile.mkstemp(suffix='.in')
+    try:
+        for copies in [1, 4]:
+            with os.fdopen(os.open(path, os.O_WRONLY | os.O_TRUNC), 'w') as f:
+                for _ in range(copies):
+                    f.write(text)
+            start = time.perf_counter()
+            count = count_file_exps(path)
+            elapsed = time.perf_counter() - start
+            #Second pass under tracemalloc, which slows everything down too much to time the first one
+            tracemalloc.start()
+            count_file_exps(path)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print('iter_exps over a %6.1f MB file: %d expressions, %6.2f s, peak %6.2f MB' % (os.path.getsize(path) / float(1 << 20), count, elapsed, peak / float(1 << 20)))
+    finally:
+        os.close(handle)
+        os.remove(path)
+
+if __name__ == '__main__':
+    main(sys.argv)
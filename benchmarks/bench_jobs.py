@@ -0,0 +1,60 @@
+'''Measures mp3_demo throughput with 1 to N worker processes on a generated input file, and checks that every parallel run
+writes exactly the same output as the serial run.
+
+    python3 -m benchmarks.bench_jobs [propositions] [max-jobs]'''
+import filecmp
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import mp3_demo
+from benchmarks import generators
+
+def write_input(path, count, seed=1):
+    '''Writes count propositions to path, split between part_a, part_b, part_b_tautology and part_c sections of 1000 each.'''
+    rng = random.Random(seed)
+    atoms = generators.atom_names(8)
+    valuation = '(valuation %s)' % ''.join('(%s %s)' % (atom, rng.choice(['t', 'nil'])) for atom in atoms)
+    sections = ['(part_a %s)', '(part_b (tests %%s) %s)' % valuation, '(part_b_tautology (tests %s))', '(part_c %s)']
+    with open(path, 'w') as f:
+        written = 0
+        while written < count:
+            size = min(1000, count - written)
+            props = ' '.join(generators.random_proposition(rng, atoms, 4) for _ in range(size))
+            f.write(sections[(written // 1000) % 4] % props + '\n')
+            written += size
+
+def run(input_path, output_path, jobs):
+    start = time.perf_counter()
+    with open(input_path) as input_file:
+        with open(output_path, 'w') as output_file:
+            mp3_demo.parse_input(input_file, output_file, jobs)
+    return time.perf_counter() - start
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 1000000
+    max_jobs = int(argv[2]) if len(argv) > 2 else multiprocessing.cpu_count()
+    directory = tempfile.mkdtemp()
+    try:
+        input_path = os.path.join(directory, 'bench.in')
+        write_input(input_path, count)
+        serial_path = os.path.join(directory, 'serial.out')
+        serial_time = run(input_path, serial_path, 1)
+        print('%d propositions, %d cpus' % (count, multiprocessing.cpu_count()))
+        print('jobs  1  %8.2f s  %10.0f props/s' % (serial_time, count / serial_time))
+        jobs = 2
+        while jobs <= max_jobs:
+            output_path = os.path.join(directory, 'jobs.out')
+            elapsed = run(input_path, output_path, jobs)
+            assert filecmp.cmp(serial_path, output_path, shallow=False), 'output of --jobs %d differs from the serial run' % jobs
+            print('jobs %2d  %8.2f s  %10.0f props/s  %5.2fx' % (jobs, elapsed, count / elapsed, serial_time / elapsed))
+            jobs *= 2
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main(sys.argv)
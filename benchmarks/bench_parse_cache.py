@@ -0,0 +1,48 @@
+'''Runs the part_b and part_b_tautology propositions from mp3.in over and over, the way our batch workloads do, once with
+prog3.parse_cache enabled and once with a cache that keeps nothing, and reports the speedup and the cache statistics.
+
+    python3 -m benchmarks.bench_parse_cache [repeats]'''
+import sys
+import time
+
+import prog3
+
+def mp3_workload(file_name):
+    '''Returns (propositions, valuation) taken from the part_b section of file_name.'''
+    with open(file_name) as f:
+        for exp in prog3.get_exps(f.read()):
+            if exp[1:7] == 'part_b' and exp[1:8] != 'part_b_':
+                tests, valuation = prog3.get_exps(prog3.remove_outer_parenthesis(exp))[:2]
+                return prog3.get_exps(prog3.remove_outer_parenthesis(tests)), valuation
+
+def run(props, valuation, repeats):
+    start = time.perf_counter()
+    results = list()
+    for _ in range(repeats):
+        for prop in props:
+            results.append(prog3.TruthValue(valuation, prop))
+            results.append(prog3.IsTautology(prop))
+    return time.perf_counter() - start, results
+
+def main(argv):
+    repeats = int(argv[1]) if len(argv) > 1 else 10000
+    props, valuation = mp3_workload('mp3.in')
+    saved_cache = prog3.parse_cache
+
+    prog3.parse_cache = prog3.ParseCache(max_size=0)
+    uncached_time, uncached_results = run(props, valuation, repeats)
+    prog3.parse_cache = prog3.ParseCache()
+    cached_time, cached_results = run(props, valuation, repeats)
+    assert cached_results == uncached_results
+    stats = prog3.parse_cache.stats()
+    prog3.parse_cache = saved_cache
+
+    calls = 2 * repeats * len(props)
+    print('%d propositions x %d repeats, %d calls' % (len(props), repeats, calls))
+    print('no cache   %8.2f s  %8.1f us/call' % (uncached_time, uncached_time / calls * 1e6))
+    print('cache      %8.2f s  %8.1f us/call' % (cached_time, cached_time / calls * 1e6))
+    print('speedup    %8.2fx' % (uncached_time / cached_time))
+    print('cache stats: %s' % stats)
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,99 @@
+'''Replays a long plan over the river crossing operators from prog3_plan_demo.in with the old execute_op, which rebuilt the add and
+delete terms from the trees and ran one re.sub per parameter on every step, and with the current one, which fills in precompiled templates.
+Also compares checking the goals after every step with WorldState.satisfies against keeping count of them with a prog3.GoalMonitor.
+
+    python3 -m benchmarks.bench_plan_replay [steps]'''
+import re
+import sys
+import time
+
+import prog3
+
+#Six actions that take the rat over the river and back again, leaving the world as it was
+CYCLE = ['(LoadBoat (|d|)(|j|)(|b|)(|a|)(|c|))', '(MoveBoat (|d|)(|e|)(|j|))', '(UnloadBoat (|e|)(|b|)(|j|))',
+         '(LoadBoat (|e|)(|j|)(|b|)(|c|)(|c|))', '(MoveBoat (|e|)(|d|)(|j|))', '(UnloadBoat (|d|)(|b|)(|j|))']
+
+def legacy_execute_op(strips_op, action_s, world_state):
+    '''The original StripsOp.execute_op.'''
+    param_list = prog3.get_exps(prog3.remove_outer_parenthesis(action_s))
+    new_add_term = '(' + " ".join(strips_op.addList.construct_text_from_nodes()) + ')'
+    for param,replacement in zip(strips_op.parameters,param_list):
+        new_add_term = re.sub("\\" + param[1:-2] + "\\|", replacement[1:-1], new_add_term)
+    world_state.append(new_add_term)
+    new_sub_term = '(' + " ".join(strips_op.deleteList.construct_text_from_nodes()) + ')'
+    for param,replacement in zip(strips_op.parameters, param_list):
+        new_sub_term = re.sub("\\" + param[1:-2] + "\\|", replacement[1:-1], new_sub_term)
+    world_state.remove(new_sub_term)
+    return world_state
+
+def load_demo():
+    '''Checks the operators of prog3_plan_demo.in (filling prog3.operator_dictionary) and returns the initial state.'''
+    with open('prog3_plan_demo.in') as f:
+        exps = prog3.get_exps(f.read())
+    for action in prog3.get_exps(prog3.remove_outer_parenthesis(exps[2])):
+        assert prog3.wf_op_check(action) == 't'
+    return prog3.get_exps(prog3.remove_outer_parenthesis(exps[0]))
+
+def replay(plan, world_state):
+    '''Replays the plan the way demonstrate_plan does.'''
+    start = time.perf_counter()
+    for action in plan:
+        label, arguments = prog3.parse_action(action)
+        world_state = prog3.operator_dictionary[label].apply_action(arguments, world_state)
+    return time.perf_counter() - start, world_state
+
+def legacy_replay(plan, world_state):
+    '''Replays the plan the way demonstrate_plan used to, matching the label with a regular expression built from the operator names.'''
+    start = time.perf_counter()
+    for action in plan:
+        match = re.match('\\(' + "(" + "|".join([key for key in prog3.operator_dictionary.keys()]) + ")", action)
+        world_state = legacy_execute_op(prog3.operator_dictionary[match.group(0)[1:]], action, world_state)
+    return time.perf_counter() - start, world_state
+
+def main(argv):
+    steps = int(argv[1]) if len(argv) > 1 else 60000
+    init = load_demo()
+    plan = (CYCLE * (steps // len(CYCLE) + 1))[:steps]
+    legacy_time, legacy_state = legacy_replay(plan, list(init))
+    list_time, list_state = replay(plan, list(init))
+    state_time, world_state = replay(plan, prog3.WorldState(init))
+    assert legacy_state == list_state and sorted(legacy_state) == sorted(world_state)
+    print('%d steps' % steps)
+    print('old replay, list            %8.2f us/step' % (legacy_time / steps * 1e6))
+    print('apply_action, list          %8.2f us/step  %6.1fx' % (list_time / steps * 1e6, legacy_time / list_time))
+    print('apply_action, WorldState    %8.2f us/step  %6.1fx' % (state_time / steps * 1e6, legacy_time / state_time))
+
+    #The cycle leaves the world as it was, so taking the init facts as the goals makes them hold again every six steps
+    goals = init
+    world_state = prog3.WorldState(init)
+    start = time.perf_counter()
+    satisfied_steps = list()
+    for step, action in enumerate(plan, 1):
+        label, arguments = prog3.parse_action(action)
+        prog3.operator_dictionary[label].apply_action(arguments, world_state)
+        if world_state.satisfies(goals):
+            satisfied_steps.append(step)
+    scan_time = time.perf_counter() - start
+    world_state = prog3.WorldState(init)
+    monitor = prog3.GoalMonitor(goals, world_state)
+    start = time.perf_counter()
+    monitored_steps = list()
+    for step, action in enumerate(plan, 1):
+        label, arguments = prog3.parse_action(action)
+        prog3.operator_dictionary[label].apply_action(arguments, world_state, monitor=monitor)
+        if monitor.satisfied():
+            monitored_steps.append(step)
+    monitor_time = time.perf_counter() - start
+    assert satisfied_steps == monitored_steps and satisfied_steps[0] == 6
+    print('goals rescanned every step  %8.2f us/step' % (scan_time / steps * 1e6))
+    print('goals monitored             %8.2f us/step  %6.1fx' % (monitor_time / steps * 1e6, scan_time / monitor_time))
+
+    op = prog3.operator_dictionary['LoadBoat']
+    arguments = ('|d|', '|j|', '|b|', '|a|', '|c|')
+    start = time.perf_counter()
+    for _ in range(steps):
+        op.ground(arguments)
+    print('ground only                 %8.2f us/step' % ((time.perf_counter() - start) / steps * 1e6))
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,30 @@
+'''Runs prog3_planner on the river crossing problem from prog3_plan_demo.in and on generated problems made of several copies of it,
+with every search algorithm and heuristic, and reports the plan length, the number of expanded and generated states and the time taken.
+In this domain every goal is a single MoveBoat away, so h_max is 1 almost everywhere and A* with it is close to blind search; it is stopped
+after max_expansions states.
+
+    python3 -m benchmarks.bench_planner [max_copies] [max_expansions]'''
+import sys
+
+import prog3_planner
+from benchmarks import generators
+
+CONFIGURATIONS = [('astar', 'hmax'), ('astar', 'hadd'), ('gbfs', 'hadd'), ('gbfs', 'hff')]
+
+def report(name, domain, max_expansions):
+    for algorithm, heuristic in CONFIGURATIONS:
+        result = prog3_planner.search(domain, algorithm, heuristic, max_expansions)
+        length = '-' if result.plan is None else str(len(result.plan))
+        print('%-16s %-6s %-5s %6s %9d %9d %10.3f' % (name, algorithm, heuristic, length, result.expanded, result.generated, result.seconds))
+
+def main(argv):
+    max_copies = int(argv[1]) if len(argv) > 1 else 3
+    max_expansions = int(argv[2]) if len(argv) > 2 else 1000
+    print('%-16s %-6s %-5s %6s %9s %9s %10s' % ('problem', 'search', 'h', 'length', 'expanded', 'generated', 'seconds'))
+    with open('prog3_plan_demo.in') as demo_file:
+        report('demo', prog3_planner.load_domain(demo_file), max_expansions)
+    for copies in range(1, max_copies + 1):
+        report('%d copies' % copies, prog3_planner.load_domain(generators.river_crossing_problem(copies)), max_expansions)
+
+if __name__ == '__main__':
+    main(sys.argv)
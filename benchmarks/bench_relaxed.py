@@ -0,0 +1,74 @@
+'''Measures the latency of one heuristic call on states of generated river crossing problems: h_max and h_add from
+prog3_planner.RelaxedCosts, and h_ff from prog3_relaxed.RelaxedPlanningGraph, both with the graph reused across calls and with a new graph
+built for every call. The states are collected with seeded random walks from the init facts.
+
+    python3 -m benchmarks.bench_relaxed [copies] [states]'''
+import random
+import sys
+import time
+
+import prog3_planner
+import prog3_relaxed
+from benchmarks import generators
+
+def random_states(domain, actions, count, seed=0, walk_length=30):
+    '''Returns count states (frozensets of fact tuples) visited by random walks that restart from the init facts every walk_length steps.'''
+    rng = random.Random(seed)
+    applicable = prog3_planner.ApplicableActions(actions, domain.init)
+    states = list()
+    while len(states) < count:
+        applicable.move_to(frozenset(domain.init))
+        for step in range(walk_length):
+            choices = list(applicable)
+            if not choices:
+                break
+            applicable.apply(rng.choice(choices))
+            states.append(frozenset(applicable.world_state.facts))
+    return states[:count]
+
+def percentile(sorted_times, fraction):
+    return sorted_times[min(len(sorted_times) - 1, int(fraction * len(sorted_times)))]
+
+def time_calls(estimate, states):
+    times = list()
+    values = list()
+    for state in states:
+        start = time.perf_counter()
+        values.append(estimate(state))
+        times.append(time.perf_counter() - start)
+    times.sort()
+    print('%-22s %9.1f %9.1f %9.1f %9.1f' % (estimate.name, sum(times) / len(times) * 1e6, percentile(times, 0.5) * 1e6,
+                                              percentile(times, 0.95) * 1e6, percentile(times, 0.99) * 1e6))
+    return values
+
+class FreshGraph(object):
+    '''Builds a new planning graph for every call, to show what reusing one graph saves.'''
+
+    def __init__(self, actions, goals, static_facts):
+        self.arguments = (actions, goals, static_facts)
+
+    def __call__(self, state):
+        return prog3_relaxed.RelaxedPlanningGraph(*self.arguments).h_ff(state)
+
+def main(argv):
+    copies = int(argv[1]) if len(argv) > 1 else 8
+    state_count = int(argv[2]) if len(argv) > 2 else 300
+    domain = prog3_planner.load_domain(generators.river_crossing_problem(copies))
+    actions = prog3_planner.relaxed_actions(domain)
+    static_facts = set(domain.init).difference([fact for action in actions for fact in action.delete_facts])
+    states = random_states(domain, actions, state_count)
+    print('%d copies, %d ground actions, %d states' % (copies, len(actions), len(states)))
+    print('%-22s %9s %9s %9s %9s' % ('heuristic (us/call)', 'mean', 'p50', 'p95', 'p99'))
+    estimates = [prog3_planner.RelaxedCosts(actions, domain.goals, 'hmax', static_facts),
+                 prog3_planner.RelaxedCosts(actions, domain.goals, 'hadd', static_facts),
+                 prog3_relaxed.RelaxedPlanningGraph(actions, domain.goals, static_facts),
+                 FreshGraph(actions, domain.goals, static_facts)]
+    for estimate, name in zip(estimates, ['h_max', 'h_add', 'h_ff', 'h_ff (new graph)']):
+        estimate.name = name
+    h_max, h_add, h_ff, fresh = [time_calls(estimate, states) for estimate in estimates]
+    assert h_ff == fresh
+    #A relaxed plan can not be shorter than the level of the last goal, which is h_max
+    assert all([a is None or a <= b for a, b in zip(h_max, h_ff)])
+
+if __name__ == '__main__':
+    main(sys.argv)
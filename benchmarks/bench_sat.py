@@ -0,0 +1,91 @@
+'''Times prog3.IsTautology(wfp_s, 'sat') on generated formulas with 30 to 200 atoms, far beyond what enumerating assignments can
+handle. Answers for the smaller families are checked against the bitvector engine first, and the solver itself against brute force on
+small CNFs whose unit clauses come first.
+
+    python3 -m benchmarks.bench_sat [seed]'''
+import random
+import sys
+import time
+
+import prog3
+import prog3_sat
+from benchmarks import generators
+
+def implication_chain(atom_count):
+    '''(IMPLIES (AND (IMPLIES (P0)(P1)) ... (IMPLIES (Pn-2)(Pn-1))) (IMPLIES (P0)(Pn-1))), a tautology.'''
+    links = '(IMPLIES (P0) (P1))'
+    for i in range(1, atom_count - 1):
+        links = '(AND %s (IMPLIES (P%d) (P%d)))' % (links, i, i + 1)
+    return '(IMPLIES %s (IMPLIES (P0) (P%d)))' % (links, atom_count - 1)
+
+def reassociation(atom_count):
+    '''(EQUIV X Y) where X is a left nested OR of every atom and Y the same atoms in reverse order nested to the right, a tautology.'''
+    left = '(P0)'
+    for i in range(1, atom_count):
+        left = '(OR %s (P%d))' % (left, i)
+    right = '(P0)'
+    for i in range(1, atom_count):
+        right = '(OR (P%d) %s)' % (i, right)
+    return '(EQUIV %s %s)' % (left, right)
+
+def weakening(rng, atom_count):
+    '''(IMPLIES (AND F G) (OR G H)) for random F, G and H over atom_count atoms, a tautology.'''
+    atoms = generators.atom_names(atom_count)
+    f, g, h = [generators.random_proposition(rng, atoms, 9) for _ in range(3)]
+    return '(IMPLIES (AND %s %s) (OR %s %s))' % (f, g, g, h)
+
+def random_formula(rng, atom_count):
+    '''A random formula over atom_count atoms, almost never a tautology.'''
+    return generators.random_proposition(rng, generators.atom_names(atom_count), 10)
+
+def check_small(rng):
+    '''Differential check of the sat engine against the bitvector engine on formulas small enough to enumerate.'''
+    for _ in range(300):
+        atom_count = rng.randint(1, 10)
+        for prop in [weakening(rng, atom_count), random_formula(rng, atom_count), implication_chain(max(atom_count, 2)), reassociation(atom_count)]:
+            assert prog3.IsTautology(prop, 'sat') == prog3.IsTautology(prop, 'bitvector'), prop
+
+def satisfiable(var_count, clauses):
+    '''Whether any assignment satisfies every clause, by trying them all.'''
+    for i in range(2 ** var_count):
+        if all([any([((i >> (abs(lit) - 1)) & 1) == (lit > 0) for lit in clause]) for clause in clauses]):
+            return True
+    return False
+
+def check_clause_order(rng):
+    '''Checks prog3_sat.Solver on small random CNFs with the unit clauses added first, so that later clauses are added after level 0
+assignments have already falsified some of their literals.'''
+    #Both watches of the last clause are false before it is added
+    assert prog3_sat.Solver(2, [[1], [2], [-1, -2]]).solve() is None
+    #Only one literal of the last clause is open, so it has to be propagated when the clause is added
+    model = prog3_sat.Solver(3, [[1], [2], [-1, -2, 3], [-3, -1, 2]]).solve()
+    assert model is not None and model[3]
+    for _ in range(500):
+        var_count = rng.randint(2, 6)
+        clauses = [[rng.choice([v, -v])] for v in rng.sample(range(1, var_count + 1), rng.randint(1, var_count))]
+        for _ in range(rng.randint(1, 3 * var_count)):
+            clauses.append([rng.choice([v, -v]) for v in rng.sample(range(1, var_count + 1), rng.randint(2, var_count))])
+        model = prog3_sat.Solver(var_count, [list(clause) for clause in clauses]).solve()
+        assert (model is not None) == satisfiable(var_count, clauses), clauses
+        if model is not None:
+            assert all([any([model[abs(lit)] == (lit > 0) for lit in clause]) for clause in clauses]), clauses
+
+def main(argv):
+    seed = int(argv[1]) if len(argv) > 1 else 1
+    rng = random.Random(seed)
+    check_clause_order(rng)
+    check_small(rng)
+    families = [('implication chain', lambda n: implication_chain(n)),
+                ('reassociation', lambda n: reassociation(n)),
+                ('weakening', lambda n: weakening(rng, n)),
+                ('random', lambda n: random_formula(rng, n))]
+    for atom_count in [30, 50, 100, 200]:
+        for label, build in families:
+            prop = build(atom_count)
+            start = time.perf_counter()
+            result = prog3.IsTautology(prop, 'sat')
+            elapsed = time.perf_counter() - start
+            print('%3d atoms  %-18s %-3s %8.2f ms  (%d chars)' % (atom_count, label, result, elapsed * 1000, len(prop)))
+
+if __name__ == '__main__':
+    main(sys.argv)
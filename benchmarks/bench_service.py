@@ -0,0 +1,48 @@
+'''Sends validate requests to an in-process prog3_service.ValidationService and reports its latency histogram, then compares the time per
+request with parsing the domain again for every plan, which is what running demonstrate_plan once per plan amounts to.
+
+    python3 -m benchmarks.bench_service [requests] [copies]'''
+import json
+import sys
+import time
+
+import prog3_planner
+import prog3_service
+from benchmarks import generators
+from benchmarks.bench_applicable import boat_plan
+
+def main(argv):
+    request_count = int(argv[1]) if len(argv) > 1 else 2000
+    copies = int(argv[2]) if len(argv) > 2 else 4
+    with open('prog3_plan_demo.in') as demo_file:
+        demo_text = demo_file.read()
+    copies_text = generators.river_crossing_problem(copies)
+    service = prog3_service.ValidationService()
+    for name, text in (('river', demo_text), ('copies', copies_text)):
+        response = json.loads(service.handle_line(json.dumps({'op': 'load', 'domain': name, 'text': text})))
+        assert response['ok']
+    requests = [json.dumps({'op': 'validate', 'domain': 'river', 'plan': '(plan (MoveBoat (|d|)(|e|)(|a|)) (MoveBoat (|d|)(|e|)(|b|)) (MoveBoat (|d|)(|e|)(|c|)))'}),
+                json.dumps({'op': 'validate', 'domain': 'copies', 'plan': '(plan %s)' % ' '.join(boat_plan(copies, 50))})]
+
+    start = time.perf_counter()
+    for i in range(request_count):
+        response = json.loads(service.handle_line(requests[i % 2]))
+        assert response['valid']
+    warm_time = (time.perf_counter() - start) / request_count
+    summary = json.loads(service.handle_line('{"op": "stats"}'))['latency']['validate']
+    print('%d validate requests on 2 loaded domains' % request_count)
+    print('  mean %.1f us  p50 < %d us  p95 < %d us  p99 < %d us  max %.1f us' % (summary['mean_us'], summary['p50_us'], summary['p95_us'], summary['p99_us'], summary['max_us']))
+    print('  histogram: ' + ', '.join(['%s: %d' % item for item in summary['buckets_us'].items()]))
+
+    cold_count = max(1, request_count // 20)
+    start = time.perf_counter()
+    for i in range(cold_count):
+        request = json.loads(requests[i % 2])
+        domain = prog3_planner.load_domain(demo_text if request['domain'] == 'river' else copies_text)
+        prog3_service.validate(domain, request['plan'])
+    cold_time = (time.perf_counter() - start) / cold_count
+    print('registry    %10.1f us/request' % (warm_time * 1e6))
+    print('re-parsing  %10.1f us/request  %8.1fx' % (cold_time * 1e6, cold_time / warm_time))
+
+if __name__ == '__main__':
+    main(sys.argv)
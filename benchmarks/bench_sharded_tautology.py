@@ -0,0 +1,37 @@
+'''Times prog3.IsTautology on 24 to 30 atom formulas with the single process bitvector engine and with the sharded parallel search
+in prog3_shards, and prints the per-shard timings of the parallel runs.
+
+    python3 -m benchmarks.bench_sharded_tautology [max-atoms] [jobs]'''
+import multiprocessing
+import sys
+import time
+
+import prog3
+import prog3_shards
+from benchmarks.bench_tautology import excluded_middle_chain
+
+def main(argv):
+    max_atoms = int(argv[1]) if len(argv) > 1 else 28
+    jobs = int(argv[2]) if len(argv) > 2 else multiprocessing.cpu_count()
+    print('%d jobs' % jobs)
+    for atom_count in range(24, max_atoms + 1, 2):
+        tautology = excluded_middle_chain(atom_count)
+        all_true = '(P0)'
+        for i in range(1, atom_count):
+            all_true = '(AND %s (P%d))' % (all_true, i)
+        #Only false when every atom is true, which is the very last assignment the serial search tries
+        last_assignment = '(OR (NOT %s) (NOT %s))' % (all_true, tautology)
+        for label, prop, expected in [('tautology', tautology, 't'), ('last', last_assignment, 'nil')]:
+            start = time.perf_counter()
+            assert prog3.IsTautology(prop) == expected
+            serial = time.perf_counter() - start
+            start = time.perf_counter()
+            counterexample, shard_times = prog3_shards.sharded_counterexample(prop, jobs)
+            parallel = time.perf_counter() - start
+            assert (counterexample is None) == (expected == 't')
+            seconds = [shard['seconds'] for shard in shard_times]
+            print('%2d atoms %-10s bitvector %8.3f s  sharded %8.3f s  %5.2fx  %d shards, %.3f-%.3f s per shard' % (
+                atom_count, label, serial, parallel, serial / parallel, len(shard_times), min(seconds), max(seconds)))
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,121 @@
+'''Compares evaluating propositions as written with evaluating them after prog3.simplify_tree, on plain random propositions and on
+propositions with the double negations, repeated subformulas and redundant implications simplify_tree removes. Checks that both give the
+same truth value under every valuation tried, then times evaluate_tree per valuation, IsTautology before and after, and IsTautology and
+TruthValue with the parse cache simplifying and not.
+
+    python3 -m benchmarks.bench_simplify [count] [seed]'''
+import random
+import sys
+import time
+
+import prog3
+from benchmarks import generators
+
+ATOM_COUNT = 10
+DEPTH = 8
+#Enough atoms that checking every assignment takes several blocks, so that evaluating, not parsing and compiling, is most of the time IsTautology takes
+TAUTOLOGY_ATOM_COUNT = 20
+TRUTH_VALUE_REPEATS = 1000
+
+def tree_size(tree):
+    return len(tree.construct_text_from_nodes())
+
+def timed(function, inputs):
+    start = time.perf_counter()
+    results = [function(argument) for argument in inputs]
+    return time.perf_counter() - start, results
+
+def cached_seconds(function, inputs, simplify):
+    '''Times function on every input with an empty parse cache that does or does not simplify.'''
+    prog3.parse_cache.simplify_after = prog3.SIMPLIFY_AFTER if simplify else None
+    prog3.parse_cache.clear()
+    try:
+        return timed(function, inputs)
+    finally:
+        prog3.parse_cache.simplify_after = prog3.SIMPLIFY_AFTER
+        prog3.parse_cache.clear()
+
+def legacy_enumerate(prop):
+    '''The enumerate engine of IsTautology, which evaluated the tree as written.'''
+    tokenized_input = prog3.tokenize_string(prop)
+    symbol_list = list()
+    for token in tokenized_input:
+        if token.non_term == 'atom' and not token.val in symbol_list:
+            symbol_list.append(token.val)
+    tree = prog3.construct_parse_tree(tokenized_input)
+    for i in range(2 ** len(symbol_list)):
+        if not prog3.evaluate_tree(tree, {symbol: ((i >> j) & 1) == 1 for j, symbol in enumerate(symbol_list)}):
+            return 'nil'
+    return 't'
+
+def compare(label, propositions, valuations, tautology_propositions):
+    trees = [prog3.construct_parse_tree(prog3.tokenize_string(prop)) for prop in propositions]
+    start = time.perf_counter()
+    simplified = [prog3.simplify_tree(tree) for tree in trees]
+    simplify_time = time.perf_counter() - start
+    for tree, simple_tree in zip(trees, simplified):
+        for valuation in valuations:
+            assert prog3.evaluate_tree(tree, valuation) == prog3.evaluate_tree(simple_tree, valuation)
+    nodes = sum([tree_size(tree) for tree in trees])
+    simple_nodes = sum([tree_size(tree) for tree in simplified])
+    print('%s: %d propositions, %d nodes before and %d after (%.1f%%), simplified in %.2f us each' % (
+        label, len(propositions), nodes, simple_nodes, 100.0 * simple_nodes / nodes, simplify_time / len(propositions) * 1e6))
+
+    pairs = [(tree, valuation) for tree in trees for valuation in valuations]
+    simple_pairs = [(tree, valuation) for tree in simplified for valuation in valuations]
+    tree_time, tree_results = timed(lambda pair: prog3.evaluate_tree(*pair), pairs)
+    simple_time, simple_results = timed(lambda pair: prog3.evaluate_tree(*pair), simple_pairs)
+    assert tree_results == simple_results
+    print('  evaluate_tree, as written        %8.2f us/evaluation' % (tree_time / len(pairs) * 1e6))
+    print('  evaluate_tree, simplified        %8.2f us/evaluation  %6.2fx' % (simple_time / len(pairs) * 1e6, tree_time / simple_time))
+
+    enumerate_time, enumerate_results = timed(legacy_enumerate, propositions)
+    simple_enumerate_time, simple_enumerate_results = timed(lambda prop: prog3.IsTautology(prop, 'enumerate'), propositions)
+    assert enumerate_results == simple_enumerate_results
+    print('  IsTautology enumerate, old        %7.2f ms/proposition' % (enumerate_time / len(propositions) * 1e3))
+    print('  IsTautology enumerate, now        %7.2f ms/proposition  %6.2fx' % (simple_enumerate_time / len(propositions) * 1e3,
+                                                                               enumerate_time / simple_enumerate_time))
+
+    tautology = lambda prop: prog3.IsTautology(prop, 'bitvector')
+    bitvector_time, bitvector_results = cached_seconds(tautology, tautology_propositions, False)
+    simple_bitvector_time, simple_bitvector_results = cached_seconds(tautology, tautology_propositions, True)
+    assert bitvector_results == simple_bitvector_results
+    print('  IsTautology bitvector, %d atoms, %d tautologies of %d:' % (TAUTOLOGY_ATOM_COUNT, bitvector_results.count('t'), len(tautology_propositions)))
+    print('    cache not simplifying          %8.2f ms/proposition' % (bitvector_time / len(tautology_propositions) * 1e3))
+    print('    cache simplifying              %8.2f ms/proposition  %6.2fx' % (simple_bitvector_time / len(tautology_propositions) * 1e3,
+                                                                               bitvector_time / simple_bitvector_time))
+
+    #The same few propositions evaluated over and over, as when one valuation is checked against a list of propositions many times
+    truth_inputs = [(valuation, prop) for prop in propositions[:20] for repeat in range(TRUTH_VALUE_REPEATS) for valuation in valuations[:1]]
+    truth_value = lambda pair: prog3.TruthValue(*pair)
+    truth_time, truth_results = cached_seconds(truth_value, truth_inputs, False)
+    simple_truth_time, simple_truth_results = cached_seconds(truth_value, truth_inputs, True)
+    assert truth_results == simple_truth_results
+    print('  TruthValue, each proposition %d times:' % TRUTH_VALUE_REPEATS)
+    print('    cache not simplifying          %8.2f us/evaluation' % (truth_time / len(truth_inputs) * 1e6))
+    print('    cache simplifying              %8.2f us/evaluation  %6.2fx' % (simple_truth_time / len(truth_inputs) * 1e6, truth_time / simple_truth_time))
+
+def tautology_inputs(rng, generate, count):
+    '''Propositions over TAUTOLOGY_ATOM_COUNT atoms that use every one of them, half of them turned into tautologies by OR-ing them with their own negation.'''
+    atoms = generators.atom_names(TAUTOLOGY_ATOM_COUNT)
+    inputs = list()
+    for i in range(count):
+        prop = generate(rng, atoms, DEPTH)
+        #Every atom appears, so that every proposition has 2**TAUTOLOGY_ATOM_COUNT assignments to check
+        for atom in atoms:
+            prop = '(AND %s (IMPLIES (%s) (%s)))' % (prop, atom, atom)
+        inputs.append('(OR %s (NOT %s))' % (prop, prop) if i % 2 else prop)
+    return inputs
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 200
+    seed = int(argv[2]) if len(argv) > 2 else 1
+    rng = random.Random(seed)
+    atoms = generators.atom_names(ATOM_COUNT)
+    valuations = [{atom: rng.random() < 0.5 for atom in atoms} for i in range(20)]
+    for label, generate in [('random', generators.random_proposition), ('redundant', generators.redundant_proposition)]:
+        propositions = [generate(rng, atoms, DEPTH) for i in range(count)]
+        compare(label, propositions, valuations, tautology_inputs(rng, generate, max(2, count // 20)))
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,123 @@
+'''The regression benchmark suite. Every workload is generated from a seed, so two runs with the same seed and scale time exactly
+the same inputs, and each workload reports its throughput, latency percentiles and peak memory.
+
+    python3 -m benchmarks.bench_suite [--seed N] [--scale X] [--repeats N] [--only NAME ...] [--save FILE] [--baseline FILE] [--tolerance F]
+
+--save writes the results as JSON, and --baseline compares this run with results saved earlier, exiting with status 1 if a workload got
+slower or bigger by more than the tolerance or computed something different.'''
+import argparse
+import platform
+import random
+import sys
+
+import prog3
+import prog3_planner
+from benchmarks import generators
+from benchmarks import harness
+
+FOL_PREDICATES = ['A', 'B', 'P', 'Q', 'R1']
+
+def mixed(rng, count, well_formed, ill_formed):
+    '''Returns count inputs, about half from well_formed(rng) and half from ill_formed(rng).'''
+    return [well_formed(rng) if rng.random() < 0.5 else ill_formed(rng) for i in range(count)]
+
+def wfp_checker_workload(rng, scale):
+    atoms = generators.atom_names(8)
+    inputs = mixed(rng, int(2000 * scale), lambda rng: generators.random_proposition(rng, atoms, 6),
+                   lambda rng: generators.ill_formed_proposition(rng, atoms, 6))
+    return prog3.wfp_checker, inputs
+
+def wfp_checkerFOL_workload(rng, scale):
+    inputs = mixed(rng, int(1000 * scale), lambda rng: generators.random_fol_formula(rng, FOL_PREDICATES, 6),
+                   lambda rng: generators.ill_formed_fol_formula(rng, FOL_PREDICATES, 6))
+    return prog3.wfp_checkerFOL, inputs
+
+def TruthValue_workload(rng, scale):
+    atoms = generators.atom_names(12)
+    #A pool of propositions, so that the parse cache is exercised the way repeated propositions in an input file exercise it
+    propositions = [generators.random_proposition(rng, atoms, 7) for i in range(200)]
+    inputs = [(generators.random_valuation(rng, atoms), rng.choice(propositions)) for i in range(int(2000 * scale))]
+    return lambda pair: prog3.TruthValue(*pair), inputs
+
+def IsTautology_workload(rng, scale):
+    atoms = generators.atom_names(10)
+    inputs = list()
+    for i in range(int(200 * scale)):
+        prop = generators.random_proposition(rng, atoms, 6)
+        #Half of them are tautologies, which have to be checked under every valuation
+        inputs.append('(OR %s (NOT %s))' % (prop, prop) if i % 2 else prop)
+    return prog3.IsTautology, inputs
+
+def get_exps_workload(rng, scale):
+    atoms = generators.atom_names(8)
+    inputs = ['(part_b %s)' % ' '.join([generators.random_proposition(rng, atoms, 5) for j in range(100)]) for i in range(int(50 * scale))]
+    return lambda text: prog3.get_exps(prog3.remove_outer_parenthesis(text)), inputs
+
+def plan_replay_workload(rng, scale):
+    copies = 8
+    domain = prog3_planner.load_domain(generators.river_crossing_problem(copies))
+
+    def replay(plan):
+        '''Replays a plan the way demonstrate_plan does and returns whether it reached the goals.'''
+        world_state = prog3.WorldState(domain.init)
+        monitor = prog3.GoalMonitor(domain.goals, world_state)
+        for action in plan:
+            label, arguments = prog3.parse_action(action)
+            domain.operators[label].apply_action(arguments, world_state, monitor=monitor)
+        return monitor.satisfied()
+    return replay, [generators.river_crossing_plan(rng, copies) for i in range(int(20 * scale))]
+
+WORKLOADS = [
+    ('wfp_checker', wfp_checker_workload),
+    ('wfp_checkerFOL', wfp_checkerFOL_workload),
+    ('TruthValue', TruthValue_workload),
+    ('IsTautology', IsTautology_workload),
+    ('get_exps', get_exps_workload),
+    ('plan_replay', plan_replay_workload),
+]
+
+def run(seed, scale, only=None, repeats=3):
+    '''Generates and times every workload (or only the ones named in only) and returns {name: harness.measure result}.'''
+    results = dict()
+    for index, (name, workload) in enumerate(WORKLOADS):
+        if only and not name in only:
+            continue
+        #Each workload gets its own generator, so leaving some out does not change the inputs of the others
+        function, inputs = workload(random.Random('%d/%d' % (seed, index)), scale)
+        results[name] = harness.measure(function, inputs, repeats, before_repeat=prog3.parse_cache.clear)
+    return results
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Times seeded workloads and compares them with a saved baseline.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplies the number of inputs of every workload')
+    parser.add_argument('--repeats', type=int, default=3, help='number of times every input is timed')
+    parser.add_argument('--only', action='append', choices=[name for name, workload in WORKLOADS], help='run only this workload')
+    parser.add_argument('--save', metavar='FILE', help='save the results to FILE')
+    parser.add_argument('--baseline', metavar='FILE', help='compare with results saved earlier')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed fractional change before a regression is reported')
+    args = parser.parse_args(argv[1:])
+
+    results = run(args.seed, args.scale, args.only, args.repeats)
+    print('%-16s %8s %12s %10s %10s %10s %10s %12s' % ('workload', 'calls', 'calls/s', 'mean us', 'p50 us', 'p95 us', 'p99 us', 'peak KiB'))
+    for name, result in results.items():
+        print('%-16s %8d %12.1f %10.1f %10.1f %10.1f %10.1f %12.1f' % (name, result['calls'], result['per_second'], result['mean_us'],
+                                                                       result['p50_us'], result['p95_us'], result['p99_us'], result['peak_bytes'] / 1024))
+    run_info = {'seed': args.seed, 'scale': args.scale, 'python': platform.python_version(), 'results': results}
+    if args.save:
+        harness.save_results(run_info, args.save)
+    if args.baseline:
+        baseline = harness.load_results(args.baseline)
+        if baseline['seed'] != args.seed or baseline['scale'] != args.scale:
+            print('The baseline was run with seed %d and scale %g, so its inputs are different.' % (baseline['seed'], baseline['scale']))
+            return 2
+        print('\nCompared with %s (python %s):' % (args.baseline, baseline['python']))
+        lines = harness.compare(results, baseline['results'], args.tolerance)
+        for name, message, is_regression in lines:
+            print('%-16s %s' % (name, message))
+        if any([is_regression for name, message, is_regression in lines]):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
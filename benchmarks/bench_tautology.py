@@ -0,0 +1,35 @@
+'''Times prog3.IsTautology with each of its engines on generated tautologies with an increasing number of atoms.
+The enumerate engine is skipped once it would take too long.
+
+    python3 -m benchmarks.bench_tautology [max-atoms]'''
+import sys
+import time
+
+import prog3
+
+ENUMERATE_MAX_ATOMS = 14
+
+def excluded_middle_chain(atom_count):
+    '''Builds a tautology that uses atom_count atoms: the conjunction of (OR (Pi) (NOT (Pi))) for every atom.'''
+    prop = '(OR (P0) (NOT (P0)))'
+    for i in range(1, atom_count):
+        prop = '(AND %s (OR (P%d) (NOT (P%d))))' % (prop, i, i)
+    return prop
+
+def main(argv):
+    max_atoms = int(argv[1]) if len(argv) > 1 else 22
+    for atom_count in range(4, max_atoms + 1, 2):
+        prop = excluded_middle_chain(atom_count)
+        row = '%3d atoms' % atom_count
+        for engine in ['enumerate', 'bitvector']:
+            if engine == 'enumerate' and atom_count > ENUMERATE_MAX_ATOMS:
+                row += '  %-9s %10s' % (engine, '-')
+                continue
+            start = time.perf_counter()
+            result = prog3.IsTautology(prop, engine)
+            assert result == 't'
+            row += '  %-9s %8.2f ms' % (engine, (time.perf_counter() - start) * 1000)
+        print(row)
+
+if __name__ == '__main__':
+    main(sys.argv)
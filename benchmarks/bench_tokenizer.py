@@ -0,0 +1,87 @@
+'''Compares prog3.tokenize_string and prog3.scan_tokens against the tokenizer prog3 used to have, which compiled nine regular
+expressions on every call and tried them one after another at each position.
+
+    python3 -m benchmarks.bench_tokenizer [operators-per-proposition] [repeats]'''
+import re
+import sys
+import time
+from collections import deque
+
+import prog3
+from benchmarks import generators
+
+def legacy_tokenize_string(string):
+    '''The original implementation of prog3.tokenize_string, kept here as the reference the new tokenizer is measured against.'''
+    tokens = deque()
+    exp = string
+    i = 0
+    left_paren = re.compile('\\(')
+    right_paren = re.compile('\\)')
+    binary_ops = re.compile('AND|OR|EQUIV|IMPLIES')
+    quantifier = re.compile('ALL|EXISTS')
+    const_term = re.compile('\\|[a-ej]\\|')
+    func_term = re.compile('\\|[f-h]\\|')
+    var_term = re.compile('\\|[u-z]\\|')
+    unary_ops = re.compile('NOT')
+    atoms = re.compile('[A-Z]\\d*|"[\\w ]+"')
+    ws = re.compile('[\\s]+')
+    ordered = [(left_paren, 'lparen'), (right_paren, 'rparen'), (binary_ops, 'binaryop'), (quantifier, 'quantifier'),
+               (const_term, 'const'), (func_term, 'function'), (var_term, 'variable'), (unary_ops, 'unaryop'), (atoms, 'atom')]
+    while(i < len(exp)):
+        for pattern, non_term in ordered:
+            match = pattern.match(exp, i)
+            if match:
+                tokens.append(prog3.PToken(non_term, match.group(0), match.start()))
+                i = match.end()
+                break
+        else:
+            match_ws = ws.match(exp, i)
+            if match_ws:
+                i = match_ws.end()
+                continue
+            return None
+    return tokens
+
+def time_call(function, argument, repeats):
+    '''Calls function(argument) repeats times and returns the best wall clock time of a single call in seconds.'''
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(argument)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def check_same_tokens(props):
+    '''Makes sure the new tokenizer produces the same token kinds, values and locations as the legacy one.'''
+    for prop in props:
+        old = legacy_tokenize_string(prop)
+        new = prog3.tokenize_string(prop)
+        if old is None or new is None:
+            assert old is None and new is None, prop
+            continue
+        assert [(t.non_term, t.val, t.loc) for t in old] == [(t.non_term, t.val, t.loc) for t in new], prop
+
+def main(argv):
+    size = int(argv[1]) if len(argv) > 1 else 20000
+    repeats = int(argv[2]) if len(argv) > 2 else 5
+    fixtures = list()
+    for name in ['mp3.in', 'prog3_test1.in', 'prog3_test2.in', 'prog3_test3.in', 'prog3_plan_demo.in']:
+        with open(name) as f:
+            fixtures.append(f.read())
+    fixtures += ['(|x| ALL |y|)', '(8up)', '(P "John is up" |f| |u| NOTX)', '(P |k|)']
+    check_same_tokens(fixtures)
+
+    prop = generators.large_proposition(1, size)
+    check_same_tokens([prop])
+    token_count = len(prog3.scan_tokens(prop))
+    print('Proposition of %d characters, %d tokens' % (len(prop), token_count))
+    for label, function in [('legacy tokenize_string', legacy_tokenize_string),
+                            ('tokenize_string', prog3.tokenize_string),
+                            ('scan_tokens', prog3.scan_tokens)]:
+        best = time_call(function, prop, repeats)
+        print('%-24s %8.2f ms  %10.0f tokens/s' % (label, best * 1000, token_count / best))
+
+if __name__ == '__main__':
+    main(sys.argv)
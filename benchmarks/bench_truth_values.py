@@ -0,0 +1,50 @@
+'''Compares evaluating one proposition under many valuations with one TruthValue call per valuation against a single
+prog3.TruthValues call, for dictionary rows and (when NumPy is installed) a boolean matrix.
+
+    python3 -m benchmarks.bench_truth_values [valuations] [atoms]'''
+import random
+import sys
+import time
+
+import prog3
+from benchmarks import generators
+
+def valuation_string(row):
+    return '(valuation ' + ''.join('(%s %s)' % (atom, 't' if value else 'nil') for atom, value in row.items()) + ')'
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 100000
+    atom_count = int(argv[2]) if len(argv) > 2 else 12
+    rng = random.Random(1)
+    atoms = generators.atom_names(atom_count)
+    prop = generators.random_proposition(rng, atoms, 8)
+    rows = [{atom: rng.random() < 0.5 for atom in atoms} for _ in range(count)]
+    strings = [valuation_string(row) for row in rows]
+
+    sample = min(count, 5000)
+    start = time.perf_counter()
+    expected = [prog3.TruthValue(s, prop) for s in strings[:sample]]
+    single = (time.perf_counter() - start) / sample
+    print('%d valuations, %d atoms' % (count, atom_count))
+    print('TruthValue per valuation  %10.2f us/valuation (measured on %d)' % (single * 1e6, sample))
+
+    for label, batch in [('TruthValues, strings', strings), ('TruthValues, dicts', rows)]:
+        start = time.perf_counter()
+        results = prog3.TruthValues(prop, batch)
+        elapsed = time.perf_counter() - start
+        assert results[:sample] == expected
+        print('%-25s %10.2f us/valuation  %6.1fx' % (label, elapsed / count * 1e6, single * count / elapsed))
+
+    try:
+        import numpy
+    except ImportError:
+        return
+    matrix = numpy.array([[row[atom] for atom in atoms] for row in rows], dtype=bool)
+    start = time.perf_counter()
+    results = prog3.TruthValues(prop, matrix, atoms)
+    elapsed = time.perf_counter() - start
+    assert results[:sample] == expected
+    print('%-25s %10.2f us/valuation  %6.1fx' % ('TruthValues, NumPy', elapsed / count * 1e6, single * count / elapsed))
+
+if __name__ == '__main__':
+    main(sys.argv)
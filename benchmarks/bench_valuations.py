@@ -0,0 +1,71 @@
+'''Parses wide valuations, such as 10000 atoms each, with the regular expressions parse_valuation used to run per pair, with
+prog3.parse_valuation, and with prog3.Valuation, and reads a file of them as a stream with prog3.iter_valuations. Then evaluates several
+propositions against each valuation, once re-parsing the valuation string for every proposition and once with the Valuation parsed before.
+
+    python3 -m benchmarks.bench_valuations [atoms] [valuations] [seed]'''
+import io
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+import prog3
+from benchmarks import generators
+
+def legacy_parse_valuation(truth_val_s):
+    '''The parse_valuation that ran two lookaround searches per pair.'''
+    truth_list = re.findall('\\([\\w\\s]+\\)', truth_val_s[1:-1])
+    return {re.search('\\w+(?=\\s)', pair).group(0): re.search('(?<=\\s)\\w+', pair).group(0) == 't' for pair in truth_list}
+
+def timed(function, arguments):
+    start = time.perf_counter()
+    results = [function(argument) for argument in arguments]
+    return (time.perf_counter() - start) / len(arguments), results
+
+def main(argv):
+    atom_count = int(argv[1]) if len(argv) > 1 else 10000
+    count = int(argv[2]) if len(argv) > 2 else 20
+    rng = random.Random(int(argv[3]) if len(argv) > 3 else 0)
+    atoms = generators.atom_names(atom_count)
+    strings = ['(valuation %s)' % generators.random_valuation(rng, atoms)[1:-1] for i in range(count)]
+    print('%d valuations of %d atoms, %d KiB each' % (count, atom_count, len(strings[0]) // 1024))
+
+    legacy_time, legacy_rows = timed(legacy_parse_valuation, strings)
+    dict_time, dict_rows = timed(prog3.parse_valuation, strings)
+    valuation_time, valuations = timed(prog3.Valuation.from_string, strings)
+    assert legacy_rows == dict_rows == [valuation.to_dict() for valuation in valuations]
+    print('per pair regular expressions %10.2f ms/valuation' % (legacy_time * 1e3))
+    print('parse_valuation              %10.2f ms/valuation  %6.1fx' % (dict_time * 1e3, legacy_time / dict_time))
+    print('Valuation.from_string        %10.2f ms/valuation  %6.1fx' % (valuation_time * 1e3, legacy_time / valuation_time))
+
+    text = '\n'.join(strings)
+    start = time.perf_counter()
+    streamed = list(prog3.iter_valuations(io.StringIO(text)))
+    stream_time = (time.perf_counter() - start) / len(streamed)
+    assert [valuation.to_dict() for valuation in streamed] == legacy_rows
+    #Peak memory of reading the file one valuation at a time, without keeping them
+    tracemalloc.start()
+    for valuation in prog3.iter_valuations(io.StringIO(text)):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print('iter_valuations (stream)     %10.2f ms/valuation  peak %d KiB for a %d KiB file' % (stream_time * 1e3, peak // 1024, len(text) // 1024))
+    print('size: dict %d KiB, Valuation %d KiB plus a shared index' % (sys.getsizeof(legacy_rows[0]) // 1024,
+                                                                       (sys.getsizeof(valuations[0].known) + sys.getsizeof(valuations[0].bits)) // 1024))
+
+    #Propositions over a few hundred of the atoms, each evaluated against every valuation
+    propositions = [generators.random_proposition(rng, atoms[:300], 8) for i in range(50)]
+    start = time.perf_counter()
+    reparsed = [[prog3.TruthValue(truth_val_s, prop) for prop in propositions] for truth_val_s in strings[:5]]
+    reparse_time = time.perf_counter() - start
+    start = time.perf_counter()
+    parsed = [[prog3.TruthValue(valuation, prop) for prop in propositions] for valuation in valuations[:5]]
+    parsed_time = time.perf_counter() - start
+    assert reparsed == parsed
+    evaluations = 5 * len(propositions)
+    print('TruthValue, string each time %10.2f us/evaluation' % (reparse_time / evaluations * 1e6))
+    print('TruthValue, parsed Valuation %10.2f us/evaluation  %6.1fx' % (parsed_time / evaluations * 1e6, reparse_time / parsed_time))
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,68 @@
+'''Replays long plans of the river crossing MoveBoat operator from prog3_plan_demo.in on top of a large world state, once with the
+world state as a list of strings (the old representation) and once as a prog3.WorldState, and checks the goals after every step.
+
+    python3 -m benchmarks.bench_world_state [facts] [steps]'''
+import sys
+import time
+
+import prog3
+
+CONSTANTS = ['|a|', '|b|', '|c|', '|d|', '|e|', '|j|']
+MOVE_BOAT = '(MoveBoat (Param (|u|)(|v|)(|x|))(Precon (Q |u| |x|))(AddList (Q |v| |x|))(DelList (Q |u| |x|)))'
+
+def background_facts(count):
+    '''Returns count distinct ground facts that the plan never touches.'''
+    facts = list()
+    i = 0
+    while len(facts) < count:
+        for first in CONSTANTS:
+            for second in CONSTANTS:
+                facts.append('(R%d %s %s)' % (i, first, second))
+        i += 1
+    return facts[:count]
+
+def boat_plan(steps):
+    return ['(MoveBoat (|d|)(|e|)(|j|))' if i % 2 == 0 else '(MoveBoat (|e|)(|d|)(|j|))' for i in range(steps)]
+
+def replay(world_state, plan, goals):
+    op = prog3.operator_dictionary['MoveBoat']
+    start = time.perf_counter()
+    reached = 0
+    for action in plan:
+        world_state = op.execute_op(action, world_state)
+        if all(goal in world_state for goal in goals):
+            reached += 1
+    return time.perf_counter() - start, reached
+
+def main(argv):
+    fact_count = int(argv[1]) if len(argv) > 1 else 100000
+    steps = int(argv[2]) if len(argv) > 2 else 10000
+    assert prog3.wf_op_check(MOVE_BOAT) == 't'
+    facts = background_facts(fact_count) + ['(Q |d| |j|)']
+    goals = ['(Q |e| |j|)', '(R0 |a| |a|)']
+    plan = boat_plan(steps)
+    print('%d facts, %d step plan' % (len(facts), steps))
+
+    #The list version is too slow to run the whole plan, so it is timed on a prefix and reported per step
+    list_steps = min(steps, 200)
+    list_time, list_reached = replay(list(facts), plan[:list_steps], goals)
+    print('list of strings  %10.2f us/step  (measured on %d steps)' % (list_time / list_steps * 1e6, list_steps))
+
+    state = prog3.WorldState(facts)
+    state_time, state_reached = replay(state, plan, goals)
+    assert state_reached == (steps + 1) // 2
+    print('WorldState       %10.2f us/step  %8.1fx' % (state_time / steps * 1e6, list_time / list_steps / (state_time / steps)))
+
+    start = time.perf_counter()
+    records = [state.apply([('Q', '|e|', '|j|')], [('Q', '|d|', '|j|')]) if i % 2 == 0 else state.apply([('Q', '|d|', '|j|')], [('Q', '|e|', '|j|')]) for i in range(steps)]
+    for record in reversed(records):
+        state.undo(record)
+    print('apply + undo     %10.2f us/step' % ((time.perf_counter() - start) / steps * 1e6))
+    goal_facts = [prog3.parse_fact(goal) for goal in goals]
+    start = time.perf_counter()
+    for _ in range(steps):
+        state.satisfies(goal_facts)
+    print('goal check       %10.2f us/check' % ((time.perf_counter() - start) / steps * 1e6))
+
+if __name__ == '__main__':
+    main(sys.argv)
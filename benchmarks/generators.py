@@ -0,0 +1,202 @@
+'''Seeded generators for the synthetic inputs used by the benchmarks. Everything generated here uses the same lisp-readable
+syntax as mp3.in and prog3_plan_demo.in so that it can be handed directly to prog3.'''
+import random
+
+BINARY_OPS = ['AND', 'OR', 'IMPLIES', 'EQUIV']
+
+def atom_names(count):
+    '''Returns a list of count distinct atom names of the form P0, P1, ... which are all valid atoms for prog3.
+
+    Keyword Arguments:
+    count -- The number of atom names to generate
+
+    Returns:
+    A list of strings.'''
+    return ['P%d' % i for i in range(count)]
+
+def random_proposition(rng, atoms, depth):
+    '''Generates a random well-formed proposition whose tree is at most depth levels deep.
+
+    Keyword Arguments:
+    rng -- A random.Random object used for every choice so results are reproducible
+    atoms -- The list of atom names the proposition may use
+    depth -- The maximum depth of the generated tree
+
+    Returns:
+    A string containing a well-formed proposition.'''
+    if depth <= 0 or rng.random() < 0.15:
+        return '(%s)' % rng.choice(atoms)
+    if rng.random() < 0.2:
+        return '(NOT %s)' % random_proposition(rng, atoms, depth - 1)
+    return '(%s %s %s)' % (rng.choice(BINARY_OPS), random_proposition(rng, atoms, depth - 1), random_proposition(rng, atoms, depth - 1))
+
+def redundant_proposition(rng, atoms, depth):
+    '''Generates a random well-formed proposition like random_proposition, but with the kinds of redundancy prog3.simplify_tree
+removes: double negations, a subformula repeated with its operands swapped, and implications whose consequent repeats their antecedent.
+
+    Keyword Arguments:
+    rng -- A random.Random object used for every choice so results are reproducible
+    atoms -- The list of atom names the proposition may use
+    depth -- The maximum depth of the generated tree
+
+    Returns:
+    A string containing a well-formed proposition.'''
+    if depth <= 0 or rng.random() < 0.15:
+        return '(%s)' % rng.choice(atoms)
+    choice = rng.random()
+    if choice < 0.15:
+        return '(NOT (NOT %s))' % redundant_proposition(rng, atoms, depth - 1)
+    left = redundant_proposition(rng, atoms, depth - 1)
+    right = redundant_proposition(rng, atoms, depth - 1)
+    if choice < 0.3:
+        op = rng.choice(['AND', 'OR'])
+        return '(%s (%s %s %s) (%s %s %s))' % (rng.choice(BINARY_OPS), op, left, right, op, right, left)
+    if choice < 0.4:
+        return '(IMPLIES %s (OR %s %s))' % (left, right, left)
+    return '(%s %s %s)' % (rng.choice(BINARY_OPS), left, right)
+
+def large_proposition(seed, size):
+    '''Generates one large well-formed proposition with roughly size binary operators by chaining random subformulas together
+with AND. Used when a single long input string is needed rather than many short ones.
+
+    Keyword Arguments:
+    seed -- The seed for the random number generator
+    size -- The approximate number of operators in the result
+
+    Returns:
+    A string containing a well-formed proposition.'''
+    rng = random.Random(seed)
+    atoms = atom_names(32)
+    prop = random_proposition(rng, atoms, 4)
+    while prop.count('(') < size:
+        prop = '(AND %s %s)' % (prop, random_proposition(rng, atoms, 4))
+    return prop
+
+RIVER_CROSSING_ACTIONS = ['(LoadBoat{label} (Param (|u|)(|w|)(|x|)(|y|)(|z|))(Precon (AND (Q{i} |u| |x|) (AND (Q{i} |u| |w|)(AND (NOT (P{i} |u| |x|)) (R{i} |y| |z|)))))(AddList (P{i} |w| |x|))(DelList (Q{i} |u| |x|)))',
+                          '(MoveBoat{label} (Param (|u|)(|v|)(|x|))(Precon (Q{i} |u| |x|))(AddList (Q{i} |v| |x|))(DelList (Q{i} |u| |x|)))',
+                          '(UnloadBoat{label} (Param (|u|)(|x|)(|y|))(Precon (AND (Q{i} |u| |y|)(P{i} |y| |x|)))(AddList (Q{i} |u| |x|))(DelList (P{i} |y| |x|)))']
+RIVER_CROSSING_INIT = ['(Q{i} |d| |a|)', '(Q{i} |d| |b|)', '(Q{i} |d| |c|)', '(Q{i} |d| |j|)', '(R{i} |a| |b|)', '(R{i} |b| |c|)', '(R{i} |a| |a|)', '(R{i} |b| |b|)', '(R{i} |c| |c|)']
+RIVER_CROSSING_GOAL = ['(Q{i} |e| |a|)', '(Q{i} |e| |b|)', '(Q{i} |e| |c|)']
+
+def operator_suffix(i):
+    '''Returns a suffix of capital letters (A, B, ..., Z, AA, AB, ...) for operator labels, which may not contain digits.'''
+    suffix = ''
+    i += 1
+    while i > 0:
+        i, letter = divmod(i - 1, 26)
+        suffix = chr(ord('A') + letter) + suffix
+    return suffix
+
+def river_crossing_problem(copies):
+    '''Generates a planning problem made of copies independent copies of the river crossing problem in prog3_plan_demo.in. The constants
+of prog3 are fixed, so each copy gets its own predicates (Q0, Q1, ...) and operators (LoadBoatA, LoadBoatB, ...) instead.
+
+    Keyword Arguments:
+    copies -- The number of copies of the problem
+
+    Returns:
+    A string with init, goal and actions expressions that prog3_planner.load_domain can read.'''
+    init = list()
+    goal = list()
+    actions = list()
+    for i in range(copies):
+        init += [fact.format(i=i) for fact in RIVER_CROSSING_INIT]
+        goal += [fact.format(i=i) for fact in RIVER_CROSSING_GOAL]
+        actions += [action.format(i=i, label=operator_suffix(i)) for action in RIVER_CROSSING_ACTIONS]
+    return '(init %s)\n(goal %s)\n(actions\n%s)\n' % (' '.join(init), ' '.join(goal), '\n'.join(actions))
+
+def ill_formed_proposition(rng, atoms, depth):
+    '''Generates a proposition that is not well-formed by breaking a random well-formed one in one of a few ways: an unbalanced
+parenthesis, an empty pair of parentheses, an operator out of place, or a FOL variable where only atoms are allowed.
+
+    Keyword Arguments:
+    rng -- A random.Random object used for every choice so results are reproducible
+    atoms -- The list of atom names the proposition may use
+    depth -- The maximum depth of the well-formed proposition that is broken
+
+    Returns:
+    A string containing a proposition that wfp_checker rejects.'''
+    prop = random_proposition(rng, atoms, depth)
+    atom = '(%s)' % rng.choice(atoms)
+    mistake = rng.randrange(4)
+    if mistake == 0:
+        return prop[:-1]
+    if mistake == 1:
+        return '(AND %s ())' % prop
+    if mistake == 2:
+        return '(%s AND %s)' % (prop, atom)
+    return '(OR %s (%s |x|))' % (prop, atom[1:-1])
+
+FOL_CONSTANTS = ['|a|', '|b|', '|c|', '|d|', '|e|', '|j|']
+FOL_FUNCTIONS = ['|f|', '|g|', '|h|']
+FOL_VARIABLES = ['|u|', '|v|', '|w|', '|x|', '|y|', '|z|']
+
+def random_term(rng, variables, depth):
+    '''Generates a constant, one of the given variables, or a function of at most depth levels.'''
+    if depth > 0 and rng.random() < 0.2:
+        return '(%s %s)' % (rng.choice(FOL_FUNCTIONS), ' '.join([random_term(rng, variables, depth - 1) for i in range(rng.randint(1, 2))]))
+    if variables and rng.random() < 0.6:
+        return rng.choice(variables)
+    return rng.choice(FOL_CONSTANTS)
+
+def random_fol_formula(rng, predicates, depth, variables=()):
+    '''Generates a random well-formed FOL formula whose tree is at most depth levels deep. Variables are only used inside a quantifier
+that binds them, so the formula is closed.
+
+    Keyword Arguments:
+    rng -- A random.Random object used for every choice so results are reproducible
+    predicates -- The list of predicate names the formula may use
+    depth -- The maximum depth of the generated tree
+    variables -- The variables bound by the quantifiers around the formula
+
+    Returns:
+    A string containing a well-formed FOL formula.'''
+    if depth <= 0 or rng.random() < 0.15:
+        terms = [random_term(rng, list(variables), 1) for i in range(rng.randint(1, 3))]
+        return '(%s %s)' % (rng.choice(predicates), ' '.join(terms))
+    choice = rng.random()
+    if choice < 0.25 and len(variables) < len(FOL_VARIABLES):
+        variable = rng.choice([name for name in FOL_VARIABLES if not name in variables])
+        return '(%s %s %s)' % (rng.choice(['ALL', 'EXISTS']), variable, random_fol_formula(rng, predicates, depth - 1, tuple(variables) + (variable,)))
+    if choice < 0.4:
+        return '(NOT %s)' % random_fol_formula(rng, predicates, depth - 1, variables)
+    return '(%s %s %s)' % (rng.choice(BINARY_OPS), random_fol_formula(rng, predicates, depth - 1, variables),
+                           random_fol_formula(rng, predicates, depth - 1, variables))
+
+def ill_formed_fol_formula(rng, predicates, depth):
+    '''Generates a FOL formula that is not well-formed by breaking a random well-formed one: an unbalanced parenthesis, an empty
+pair of parentheses or an operator out of place.'''
+    formula = random_fol_formula(rng, predicates, depth)
+    mistake = rng.randrange(3)
+    if mistake == 0:
+        return formula[:-1]
+    if mistake == 1:
+        return '(AND %s ())' % formula
+    return '(%s OR (%s |a|))' % (formula, rng.choice(predicates))
+
+def random_valuation(rng, atoms):
+    '''Returns a valuation string ((P0 t)(P1 nil)...) giving every atom a random truth value.'''
+    return '(%s)' % ''.join(['(%s %s)' % (atom, 't' if rng.random() < 0.5 else 'nil') for atom in atoms])
+
+RIVER_CROSSING_PLAN = ['(LoadBoat{label} (|d|)(|j|)(|b|)(|a|)(|c|))', '(MoveBoat{label} (|d|)(|e|)(|j|))', '(UnloadBoat{label} (|e|)(|b|)(|j|))',
+                       '(MoveBoat{label} (|e|)(|d|)(|j|))', '(LoadBoat{label} (|d|)(|j|)(|c|)(|a|)(|a|))', '(MoveBoat{label} (|d|)(|e|)(|j|))',
+                       '(UnloadBoat{label} (|e|)(|c|)(|j|))', '(LoadBoat{label} (|e|)(|j|)(|b|)(|c|)(|c|))', '(MoveBoat{label} (|e|)(|d|)(|j|))',
+                       '(UnloadBoat{label} (|d|)(|b|)(|j|))', '(LoadBoat{label} (|d|)(|j|)(|a|)(|b|)(|b|))', '(MoveBoat{label} (|d|)(|e|)(|j|))',
+                       '(UnloadBoat{label} (|e|)(|a|)(|j|))', '(MoveBoat{label} (|e|)(|d|)(|j|))', '(LoadBoat{label} (|d|)(|j|)(|b|)(|b|)(|b|))',
+                       '(MoveBoat{label} (|d|)(|e|)(|j|))', '(UnloadBoat{label} (|e|)(|b|)(|j|))']
+
+def river_crossing_plan(rng, copies):
+    '''Generates a plan for river_crossing_problem(copies): the plan of prog3_plan_demo.in for every copy, with the copies interleaved in a
+random order that keeps the steps of each copy in sequence. Like the demo plan, it is meant to be replayed without checking
+preconditions: the first LoadBoat step of each copy needs an R fact the init does not have.
+
+    Returns:
+    A list of action strings.'''
+    order = [i for i in range(copies) for step in RIVER_CROSSING_PLAN]
+    rng.shuffle(order)
+    next_step = [0] * copies
+    plan = list()
+    for i in order:
+        plan.append(RIVER_CROSSING_PLAN[next_step[i]].format(label=operator_suffix(i)))
+        next_step[i] += 1
+    return plan
@@ -0,0 +1,98 @@
+'''Measurement helpers shared by the benchmark suite: timing a function over a list of inputs, peak memory, and comparing a run
+against a saved baseline.'''
+import hashlib
+import json
+import time
+import tracemalloc
+
+def percentile(sorted_times, fraction):
+    return sorted_times[min(len(sorted_times) - 1, int(fraction * len(sorted_times)))]
+
+def measure(function, inputs, repeats=3, memory_sample=200, before_repeat=None):
+    '''Calls function once per input, repeats times over, and summarizes the calls. Each input's latency is the fastest of its repeats,
+which keeps most of the noise of a busy machine out of the comparison with a baseline.
+
+    Keyword Arguments:
+    function -- A function of one argument
+    inputs -- The list of arguments to call it with
+    repeats -- The number of times every input is timed
+    before_repeat -- An optional function called before each repeat, to empty caches for example
+    memory_sample -- The number of inputs that are run again under tracemalloc to find the peak memory. Tracing slows every allocation
+down, so it is kept out of the timed run.
+
+    Returns:
+    A dictionary with the number of calls, the total seconds, the throughput in calls per second, the mean and the 50th, 95th and 99th
+percentile latencies in microseconds, the peak traced memory in bytes, and a digest of the results so that runs that compute something
+different can be told apart.'''
+    clock = time.perf_counter
+    times = [float('inf')] * len(inputs)
+    for repeat in range(repeats):
+        if before_repeat is not None:
+            before_repeat()
+        results = list()
+        for index, argument in enumerate(inputs):
+            start = clock()
+            result = function(argument)
+            elapsed = clock() - start
+            if elapsed < times[index]:
+                times[index] = elapsed
+            results.append(result)
+    total = sum(times)
+    times.sort()
+    if before_repeat is not None:
+        before_repeat()
+    tracemalloc.start()
+    for argument in inputs[:memory_sample]:
+        function(argument)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'calls': len(inputs), 'seconds': total, 'per_second': len(inputs) / total if total else 0.0,
+            'mean_us': total / len(inputs) * 1e6, 'p50_us': percentile(times, 0.5) * 1e6, 'p95_us': percentile(times, 0.95) * 1e6,
+            'p99_us': percentile(times, 0.99) * 1e6, 'peak_bytes': peak, 'digest': hashlib.sha1(repr(results).encode('utf-8')).hexdigest()[:12]}
+
+def save_results(results, file_name):
+    with open(file_name, 'w') as results_file:
+        json.dump(results, results_file, indent=2, sort_keys=True)
+        results_file.write('\n')
+
+def load_results(file_name):
+    with open(file_name) as results_file:
+        return json.load(results_file)
+
+def compare(results, baseline, tolerance):
+    '''Compares the workloads of a run with a baseline run made with the same seed and scale.
+
+    Keyword Arguments:
+    results -- The dictionary of workload results from this run
+    baseline -- The dictionary of workload results from the baseline run
+    tolerance -- The fraction by which the throughput may drop, or the p95 latency or peak memory grow, before it counts as a regression
+
+    Returns:
+    A list of (workload, message, is_regression) tuples, one per workload in either run.'''
+    lines = list()
+    for name in sorted(set(results) | set(baseline)):
+        if not name in baseline:
+            lines.append((name, 'not in the baseline', False))
+            continue
+        if not name in results:
+            lines.append((name, 'not run', False))
+            continue
+        now = results[name]
+        then = baseline[name]
+        problems = list()
+        if now['digest'] != then['digest']:
+            problems.append('different results')
+        if now['per_second'] < then['per_second'] * (1 - tolerance):
+            problems.append('throughput down')
+        if now['p95_us'] > then['p95_us'] * (1 + tolerance):
+            problems.append('p95 up')
+        if now['peak_bytes'] > then['peak_bytes'] * (1 + tolerance):
+            problems.append('peak memory up')
+        message = 'throughput %+6.1f%%  p95 %+6.1f%%  peak memory %+6.1f%%' % (
+            (now['per_second'] / then['per_second'] - 1) * 100 if then['per_second'] else 0.0,
+            (now['p95_us'] / then['p95_us'] - 1) * 100 if then['p95_us'] else 0.0,
+            (now['peak_bytes'] / then['peak_bytes'] - 1) * 100 if then['peak_bytes'] else 0.0)
+        if problems:
+            message += '  REGRESSION: ' + ', '.join(problems)
+        lines.append((name, message, bool(problems)))
+    return lines
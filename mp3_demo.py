@@ -1,23 +1,35 @@
 #!/usr/bin/python
+import argparse
+import multiprocessing
+
 import prog3
-import sys
+import prog3_profile
+
+#Number of propositions sent to a worker process at a time when running with more than one job
+JOB_CHUNK_SIZE = 256
 
-def parse_input(input_s, output_file = None):
+def parse_input(input_s, output_file = None, jobs = 1):
     '''Takes a file of lisp readable input and tests that output using
 three preset tests. The default mode is to print the results, but if 
 output_file is not None, then the results are saved to the file stream 
 passed to none. Note: output_file is a file object, NOT a string.
 
     Keyword Arguments:
-    input_s -- The lisp-readable input string to be tested.
+    input_s -- The lisp-readable input string to be tested. This may also be an open file object, in which case the tests are read
+from it one at a time rather than all at once.
     output_file -- The file object where results are printed (if it is not
 the default None value)
+    jobs -- The number of processes to test propositions with. With more than
+one job the propositions are handed out to a process pool in chunks, and the
+results are written in the same order as a serial run.
 
     returns:
     Nothing'''
 
-    tests = prog3.get_exps(input_s)
-    for exp in tests:
+    if jobs > 1:
+        parse_input_parallel(input_s, output_file, jobs)
+        return
+    for offset, exp in prog3.iter_exps(input_s):
         if(exp[1:7] == 'part_a'):
             test_a(exp, output_file)
         elif exp[1:8] == 'part_b_':
@@ -27,6 +39,73 @@ the default None value)
         elif exp[1:7] == 'part_c':
             test_c(exp, output_file)
 
+def parse_input_parallel(input_s, output_file, jobs, chunk_size = JOB_CHUNK_SIZE):
+    '''The multi-process version of parse_input. Every proposition in the input
+becomes one task, tasks are run by a pool of jobs processes, and the results are
+written back in input order, so the output is identical to a serial run.
+
+    Keyword Arguments:
+    input_s -- The lisp-readable input string or open file object to be tested.
+    output_file -- The file object where results are written, or None to print them.
+    jobs -- The number of worker processes.
+    chunk_size -- The number of tasks sent to a worker at a time.
+
+    Returns:
+    Nothing'''
+    with multiprocessing.Pool(jobs) as pool:
+        for line in pool.imap(run_task, iter_tasks(input_s), chunk_size):
+            write_line(line, output_file)
+
+def iter_tasks(input_s):
+    '''Yields one task per proposition in the input, in the order test_a,
+test_b, test_b_tautology and test_c would test them. A task is a tuple
+(part, prop, truth_values) where truth_values is only used by part_b. The blank
+line each of test_b, test_b_tautology and test_c starts with is yielded as None.'''
+    for offset, exp in prog3.iter_exps(input_s):
+        if exp[1:7] == 'part_a':
+            for prop in prog3.get_exps(prog3.remove_outer_parenthesis(exp)):
+                yield ('part_a', prop, None)
+        elif exp[1:8] == 'part_b_':
+            test_exps = prog3.get_exps(prog3.remove_outer_parenthesis(exp))[0]
+            yield None
+            for prop in prog3.get_exps(prog3.remove_outer_parenthesis(test_exps)):
+                yield ('part_b_tautology', prop, None)
+        elif exp[1:7] == 'part_b':
+            exps_and_vals = prog3.get_exps(prog3.remove_outer_parenthesis(exp))
+            yield None
+            for prop in prog3.get_exps(prog3.remove_outer_parenthesis(exps_and_vals[0])):
+                yield ('part_b', prop, exps_and_vals[1])
+        elif exp[1:7] == 'part_c':
+            yield None
+            for prop in prog3.get_exps(prog3.remove_outer_parenthesis(exp)):
+                yield ('part_c', prop, None)
+
+def run_task(task):
+    '''Runs the test for one task from iter_tasks and returns the line of output for it, or None for a blank line.'''
+    if task is None:
+        return None
+    part, prop, truth_values = task
+    if part == 'part_a':
+        result = prog3.wfp_checker(prop)
+    elif part == 'part_b':
+        result = prog3.TruthValue(truth_values, prop)
+    elif part == 'part_b_tautology':
+        result = prog3.IsTautology(prop)
+    else:
+        result = prog3.wfp_checkerFOL(prop)
+    return '({} {} {})'.format(part, prop, result)
+
+def write_line(line, output_file):
+    '''Prints a line of output from run_task, or writes it to output_file if it is not None, the same way the test_ functions do.'''
+    if line is None:
+        line = '\n'
+    if output_file is None:
+        print(line)
+    elif line == '\n':
+        output_file.write(line)
+    else:
+        output_file.write(line + '\n')
+
 def test_a(string_a, output_file):
     '''Performs the tests for part a based on the Lisp-readable input given for part a. Determines whether the given propositions are well-formed and prints out the answer.
 
@@ -133,15 +212,19 @@ If no file was specified, this value is simply None.
             output_file.write('(part_c {} {})\n'.format(prop, is_wf))
 
 if __name__ == '__main__':
-    command_input = sys.argv[1]
+    parser = argparse.ArgumentParser(description='Runs the part a, b and c tests on a lisp-readable input file.')
+    parser.add_argument('input_file')
+    parser.add_argument('output_file', nargs='?')
+    parser.add_argument('--jobs', type=int, default=1, help='number of processes to test propositions with')
+    prog3_profile.add_profile_arguments(parser)
+    args = parser.parse_args()
+    command_input = args.input_file
     print('Program 3 Demo loading from file {}.'.format(command_input))
     with open(command_input) as user_file:
-        file_in = user_file.read()
-        if (len(sys.argv) > 2):
-            with open(sys.argv[2], 'w') as file_out:
-                print('Output is being printed to {}.'.format(sys.argv[2]))
-                parse_input(file_in, file_out)
+        if args.output_file is not None:
+            with open(args.output_file, 'w') as file_out:
+                print('Output is being printed to {}.'.format(args.output_file))
+                prog3_profile.profiled_run(lambda: parse_input(user_file, file_out, args.jobs), args)
         else:
             print('Output is being printed to the console.\n')
-            parse_input(file_in)
-
+            prog3_profile.profiled_run(lambda: parse_input(user_file, jobs=args.jobs), args)
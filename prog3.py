@@ -1,12 +1,19 @@
 #!/usr/bin/python
+import argparse
+import functools
 import re
-from collections import deque
+import sys
+from array import array
+from collections import deque, OrderedDict
 import string
+import zlib
 
 operator_dictionary = dict()
 
 class PToken(object):
     '''Token class used to represent each meaningful set of characters when a string is broken up into parts that must be parsed.'''
+    __slots__ = ('non_term', 'val', 'loc')
+
     def __init__(self, non_term, val, loc):
         self.non_term = non_term
         self.val = val
@@ -21,6 +28,8 @@ class PToken(object):
     
 class LexNode(object):
     '''A node for the parse tree that is generated to determine the truth of well-formed propositions.'''
+    __slots__ = ('non_term', 'val', 'loc', 'parent', 'children')
+
     def __init__(self, token, parent = None):
         self.non_term = token.non_term
         self.val = token.val
@@ -45,11 +54,13 @@ and concatenating the values at each node.
     Returns:
     A list of characters representating of the lex_tree starting at the node which originally called construct_text_from_nodes. Should be called with join()'''
         my_val = list()
-        if self.non_term != 'start':
-            my_val = [self.val]
-
-        for child in self.children:
-            my_val += child.construct_text_from_nodes()
+        #Explicit stack instead of recursion so that deeply nested trees neither hit the recursion limit nor get copied at every level
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.non_term != 'start':
+                my_val.append(node.val)
+            stack.extend(reversed(node.children))
         return my_val
         
     def get_var_terms(self):
@@ -62,15 +73,19 @@ and concatenating the values at each node.
     A list of strings which are the values of the FOL constants, variables, and functions found in the tree.'''
 
         my_value = list()
-        if self.non_term in ['const','function','variable']:
-            my_value = ['(' + self.val + ')']
-        for child in self.children:
-            my_value += child.get_var_terms()
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.non_term in ['const','function','variable']:
+                my_value.append('(' + node.val + ')')
+            stack.extend(reversed(node.children))
 
         return my_value
 
 class StripsOp(object):
-    '''Node representing a STRIPS operator which contains its label, its parameters, its preconditions, add list, and delete list'''
+    '''Node representing a STRIPS operator which contains its label, its parameters, its preconditions, add list, and delete list.
+When it is created, the add and delete lists are compiled into fact templates in which every parameter is replaced by its position in the
+parameter list, so grounding an action only has to fill in those positions.'''
 
     def __init__(self, label, parameters, list_of_changes):
         self.label = label
@@ -78,6 +93,13 @@ class StripsOp(object):
         self.preconditions = list_of_changes[0]
         self.addList = list_of_changes[1]
         self.deleteList = list_of_changes[2]
+        #'(|u|)' -> '|u|'
+        self.variables = [remove_outer_parenthesis(param).strip() for param in parameters]
+        self.add_templates = self.compile_effects(self.addList)
+        self.delete_templates = self.compile_effects(self.deleteList)
+        self.precondition_program, self.required_templates = self.compile_precondition(self.preconditions)
+        #Compiled by prog3_fol the first time quantified preconditions are checked
+        self.precondition_formula = None
 
     def __str__(self):
         return "Action: %s\nParameters: %s\nPreconditions: %s\nAdd List: %s\nDelete List: %s" % (self.label,self.parameters,self.preconditions,self.addList,self.deleteList)
@@ -85,128 +107,411 @@ class StripsOp(object):
     def __repr__(self):
         return "StripsOp(%s,%s,[%s,%s,%s])" % (self.label, self.parameters, self.preconditions.construct_text_from_nodes(), self.addList.construct_text_from_nodes(), self.deleteList.construct_text_from_nodes())
 
-    def execute_op(self, action_s, world_state):
+    def compile_effects(self, effect_tree):
+        '''Turns an add or delete list tree into a list of fact templates. A template is a tuple like a fact from parse_fact, except that every
+parameter of the operator is replaced by its (int) position in the parameter list. An AND of facts gives one template per fact.
+
+    Keyword Arguments:
+    effect_tree -- The LexNode (or NodeRef) tree of the add or delete list
+
+    Returns:
+    A list of template tuples.'''
+        slots = {variable: position for position, variable in enumerate(self.variables)}
+        templates = list()
+        stack = [effect_tree.children[0] if effect_tree.non_term == 'start' else effect_tree]
+        while stack:
+            node = stack.pop()
+            if node.non_term == 'binaryop' and node.val == 'AND':
+                stack.extend(reversed(node.children))
+            else:
+                templates.append(tuple([slots.get(part, sys.intern(part)) for part in node.construct_text_from_nodes()]))
+        return templates
+
+    def compile_precondition(self, precondition_tree):
+        '''Turns the precondition tree into a postfix program over fact templates, in the same form compile_tree gives for a proposition.
+Atoms are replaced by ('fact', template) instructions, where the template is built the same way compile_effects builds them.
+
+    Keyword Arguments:
+    precondition_tree -- The LexNode (or NodeRef) tree of the preconditions
+
+    Returns:
+    A tuple (program, required_templates). program is a list of (opcode, argument) tuples, or None if the preconditions use something other
+than atoms and the propositional operators (a quantifier, for example). required_templates are the templates of the atoms joined only by AND
+from the root, which are facts every applicable action must have in the state.'''
+        slots = {variable: position for position, variable in enumerate(self.variables)}
+        root = precondition_tree.children[0] if precondition_tree.non_term == 'start' else precondition_tree
+        program = list()
+        required_templates = list()
+        stack = [(root, False, True)]
+        while stack:
+            node, children_done, required = stack.pop()
+            if node.non_term == 'atom':
+                template = tuple([slots.get(part, sys.intern(part)) for part in node.construct_text_from_nodes()])
+                program.append(('fact', template))
+                if required:
+                    required_templates.append(template)
+            elif children_done:
+                program.append((node.val, None))
+            elif node.non_term == 'binaryop' and len(node.children) == 2:
+                stack.append((node, True, required))
+                for child in reversed(node.children):
+                    stack.append((child, False, required and node.val == 'AND'))
+            elif node.non_term == 'unaryop' and len(node.children) == 1:
+                stack.append((node, True, required))
+                stack.append((node.children[0], False, False))
+            else:
+                return None, required_templates
+        return program, required_templates
+
+    def preconditions_hold(self, arguments, world_state):
+        '''Evaluates the preconditions of one action against a world state.
+
+    Keyword Arguments:
+    arguments -- A sequence of constants, one per parameter.
+    world_state -- A WorldState, a list of fact strings as execute_op accepts, or any other container of fact tuples.
+
+    Returns:
+    True if the preconditions are satisfied, False if they are not. Raises ValueError if the preconditions could not be compiled.'''
+        if world_state.__class__ is list:
+            #The facts are strings, or a mix of strings and tuples, so they have to be parsed before the programs can look them up
+            world_state = WorldState(world_state)
+        if self.precondition_program is None:
+            #Quantified preconditions are model checked, with the quantifiers ranging over the constants of the state
+            if self.preconditions is None:
+                raise ValueError('The preconditions of %s can not be evaluated' % self.label)
+            import prog3_fol
+            if self.precondition_formula is None:
+                self.precondition_formula = prog3_fol.compile_tree(self.preconditions)
+            checker = prog3_fol.ModelChecker(prog3_fol.Structure(world_state))
+            return checker.holds(self.precondition_formula, dict(zip(self.variables, arguments)))
+        facts = world_state.facts if world_state.__class__ is WorldState else world_state
+        stack = list()
+        for opcode, argument in self.precondition_program:
+            if opcode == 'fact':
+                stack.append(fill_template(argument, arguments) in facts)
+            elif opcode == 'NOT':
+                stack.append(not stack.pop())
+            else:
+                b = stack.pop()
+                a = stack.pop()
+                if opcode == 'AND':
+                    stack.append(a and b)
+                elif opcode == 'OR':
+                    stack.append(a or b)
+                elif opcode == 'IMPLIES':
+                    stack.append(not a or b)
+                else:
+                    stack.append(a == b)
+        return stack[0]
+
+    def ground(self, arguments):
+        '''Fills the add and delete templates in with the arguments of one action.
+
+    Keyword Arguments:
+    arguments -- A sequence of constants such as ('|d|', '|j|'), one per parameter. Parameters with no argument are left as they are.
+
+    Returns:
+    A tuple (add_facts, delete_facts) of lists of fact tuples.'''
+        if len(arguments) < len(self.variables):
+            arguments = list(arguments) + self.variables[len(arguments):]
+        add_facts = [fill_template(template, arguments) for template in self.add_templates]
+        delete_facts = [fill_template(template, arguments) for template in self.delete_templates]
+        return add_facts, delete_facts
+
+    def execute_op(self, action_s, world_state, check_preconditions=False, monitor=None):
         '''This function takes a string containing the strips operator and a list of strings representing the world state. Then, it changes the world_state list according to its add and delete list. 
 
     Keyword Arguments:
     action_s -- A string containing the STRIPS operator and its associated parameters
-    world_state -- A list of strings containing the facts about the world at that moment.
+    world_state -- A WorldState, or a list of strings, containing the facts about the world at that moment.
+    check_preconditions -- If True, the preconditions are evaluated first and ValueError is raised if they do not hold.
+    monitor -- An optional GoalMonitor that is told which facts the action changed. Only a WorldState can be monitored.
 
     Returns:
-    An updated world_state list.'''
+    The updated world_state.'''
     
-        #We start with the full string. We're only interested in the variables passed to it.
-        #Called (Add (|y|)(|x|)(|z|)) with addList '(P |x| |y|)'
-        #       (Add (|b|)(|a|)(|c|))
-        #param_list = ['|b|','|a|']
-        param_list = get_exps(remove_outer_parenthesis(action_s))
-        #addList = '(P |x| |y|)'
-        new_add_term = '(' + " ".join(self.addList.construct_text_from_nodes()) + ')'
-
-        #add_vars = ['|x|','|y|'], param_list = ['|a|', '|b|'] -> zip -> [('|x|','|a|'),('|y|','|b|')]
-        for param,replacement in zip(self.parameters,param_list):
-            new_add_term = re.sub("\\" + param[1:-2] + "\|", replacement[1:-1], new_add_term)
-        #Add the term from the add list
-        world_state.append(new_add_term)
-        
-        new_sub_term = '(' + " ".join(self.deleteList.construct_text_from_nodes()) + ')'
+        #Called (Add (|y|)(|x|)(|z|)) with addList '(P |x| |y|)' gives arguments ('|y|', '|x|', '|z|')
+        return self.apply_action(parse_action(action_s)[1], world_state, check_preconditions, monitor)
+
+    def apply_action(self, arguments, world_state, check_preconditions=False, monitor=None):
+        '''The same as execute_op, for an action whose arguments have already been parsed with parse_action.'''
+        if check_preconditions and not self.preconditions_hold(arguments, world_state):
+            raise ValueError('The preconditions of %s are not satisfied' % self.label)
+        add_facts, delete_facts = self.ground(arguments)
 
-        for param,replacement in zip(self.parameters, param_list):
-            new_sub_term = re.sub("\\" + param[1:-2] + "\|", replacement[1:-1], new_sub_term)
+        if isinstance(world_state, WorldState):
+            record = world_state.apply(add_facts, delete_facts)
+            if monitor is not None:
+                monitor.update(record)
+            return world_state
 
-        #Remove the delete list term from the world state. 
-        world_state.remove(new_sub_term)
+        #Add the terms from the add list
+        for fact in add_facts:
+            world_state.append(fact_text(fact))
+
+        #Remove the delete list terms from the world state. 
+        for fact in delete_facts:
+            world_state.remove(fact_text(fact))
 
         return world_state   
 
-def tokenize_string(string):
-    '''Takes a lisp-readable input, converts the string into tokens, and returns a double-ended queue of the tokens in the order they were found in the string
-    
+#Finds the label of an action such as (LoadBoat (|d|)(|j|)) and then each of its parenthesized arguments
+ACTION_LABEL_PATTERN = re.compile(r'\(\s*([A-Z][A-Za-z]+)')
+ACTION_ARG_PATTERN = re.compile(r'\(\s*([^()\s]*)\s*\)')
+
+@functools.lru_cache(maxsize=4096)
+def parse_action(action_s):
+    '''Splits an action string such as '(MoveBoat (|d|)(|e|)(|j|))' into its label and arguments. Plans repeat the same actions
+many times, so recent results are cached.
+
     Keyword Arguments:
-    string -- The lisp-readable input string
+    action_s -- The action string from a plan
 
     Returns:
-    A double-ended queue of PToken objects created by tokenize-ing the string. Returns None if the input string is not well formed (bad formatting)'''
-    tokens = deque()
-    exp = string
-    i = 0
+    A tuple (label, arguments) such as ('MoveBoat', ('|d|', '|e|', '|j|')), or None if action_s does not start with a label.'''
+    match = ACTION_LABEL_PATTERN.match(action_s)
+    if match is None:
+        return None
+    return match.group(1), tuple([sys.intern(argument) for argument in ACTION_ARG_PATTERN.findall(action_s, match.end())])
 
-    #Compile regular expression objects to be used when tokenizing input
-    #NOTE: In the original problem definition, |j| was not an acceptable input, but because I needed one extra constant for the planning portion, I made |j| acceptable. I hope this isn't a problem, but it was the only way I could think of to get one more constant
-    left_paren = re.compile('\(')
-    right_paren = re.compile('\)')
-    binary_ops = re.compile('AND|OR|EQUIV|IMPLIES')
-    quantifier = re.compile('ALL|EXISTS')
-    const_term = re.compile('\|[a-ej]\|')
-    func_term = re.compile('\|[f-h]\|')
-    var_term = re.compile('\|[u-z]\|')
-    unary_ops = re.compile('NOT')
-    atoms = re.compile('[A-Z]\d*|"[\w ]+"')
-    ws = re.compile('[\s]+')
-    while(i < len(exp)):
-        match_l = left_paren.match(exp, i)
-        if match_l: #If left parenthesis was read
-            tokens.append(PToken('lparen',match_l.group(0),match_l.start()))
-            i = match_l.end()#New location to start search
-            continue  #Match was found, start over at new location after the match
-
-        match_r = right_paren.match(exp, i)
-        if match_r: #If right parenthesis was read
-            tokens.append(PToken('rparen',match_r.group(0),match_r.start()))
-            i = match_r.end()
-            continue
+#Splits the inside of a ground fact such as (Q |d| |a|) into its predicate and arguments. An argument may itself be a parenthesized term.
+FACT_PART_PATTERN = re.compile(r'\((?:[^()]|\([^()]*\))*\)|[^\s()]+')
 
-        match_bin = binary_ops.match(exp, i)
-        if match_bin:#If a binary op was read
-            tokens.append(PToken('binaryop',match_bin.group(0),match_bin.start()))
-            i = match_bin.end()
-            continue
-        
-        match_quant = quantifier.match(exp, i)
-        if match_quant:#if a quantifier was read
-            tokens.append(PToken('quantifier',match_quant.group(0),match_quant.start()))
-            i = match_quant.end()
-            continue
+def parse_fact(fact_s):
+    '''Turns a ground fact string such as '(Q |d| |a|)' into the tuple ('Q', '|d|', '|a|'). The strings in the tuple are interned so that
+equal facts share their strings and compare quickly.
 
-        match_const = const_term.match(exp, i)
-        if match_const:#if a constant term was read
-            tokens.append(PToken('const', match_const.group(0),match_const.start()))
-            i = match_const.end()
-            continue
+    Keyword Arguments:
+    fact_s -- A string holding one parenthesized fact
 
-        match_func = func_term.match(exp, i)
-        if match_func:#if a function term was read
-            tokens.append(PToken('function', match_func.group(0),match_func.start()))
-            i = match_func.end()
-            continue
+    Returns:
+    A tuple of the predicate followed by the arguments.'''
+    return tuple([sys.intern(part) for part in FACT_PART_PATTERN.findall(remove_outer_parenthesis(fact_s.strip()))])
+
+def fact_text(fact):
+    '''The inverse of parse_fact. Returns the string '(Q |d| |a|)' for the tuple ('Q', '|d|', '|a|').'''
+    return '(' + ' '.join(fact) + ')'
+
+def fill_template(template, arguments):
+    '''Returns the fact tuple for a template from StripsOp, with every parameter position replaced by its argument.'''
+    return tuple([arguments[part] if part.__class__ is int else part for part in template])
+
+class WorldState(object):
+    '''The set of ground facts that are true in the world. Facts are kept as tuples from parse_fact in a hash table, so adding, removing and
+looking up a fact are O(1) and checking a list of goals is a subset test. Facts are also indexed by predicate and by (predicate, position, argument)
+so that every fact matching part of a pattern can be found without a scan.
+
+Iterating over a WorldState gives the facts as strings in the order they were added, so it can be printed and joined like the list of strings it replaces.'''
+
+    def __init__(self, facts=()):
+        #dict rather than set so that iteration follows insertion order
+        self.facts = dict()
+        self.by_predicate = dict()
+        self.by_argument = dict()
+        for fact in facts:
+            self.add(fact)
+
+    def as_fact(self, fact):
+        if fact.__class__ is str:
+            return parse_fact(fact)
+        return fact
+
+    def add(self, fact):
+        '''Adds a fact (a string or a tuple). Returns True if it was not already in the state.'''
+        fact = self.as_fact(fact)
+        if fact in self.facts:
+            return False
+        self.add_fact(fact)
+        return True
+
+    def remove(self, fact):
+        '''Removes a fact (a string or a tuple). Raises ValueError if it is not in the state, just as list.remove does.'''
+        fact = self.as_fact(fact)
+        if not fact in self.facts:
+            raise ValueError('%s is not in the world state' % fact_text(fact))
+        self.remove_fact(fact)
+
+    def add_fact(self, fact):
+        '''Adds a fact tuple that is known not to be in the state to the facts and the indexes.'''
+        predicate = fact[0]
+        self.facts[fact] = None
+        self.by_predicate.setdefault(predicate, dict())[fact] = None
+        by_argument = self.by_argument
+        for position in range(1, len(fact)):
+            key = (predicate, position, fact[position])
+            if key in by_argument:
+                by_argument[key][fact] = None
+            else:
+                by_argument[key] = {fact: None}
 
-        match_var = var_term.match(exp, i)
-        if match_var:#if a variable term was read
-            tokens.append(PToken('variable', match_var.group(0),match_var.start()))
-            i = match_var.end()
-            continue
+    def remove_fact(self, fact):
+        '''Removes a fact tuple that is known to be in the state from the facts and the indexes.'''
+        predicate = fact[0]
+        del self.facts[fact]
+        del self.by_predicate[predicate][fact]
+        by_argument = self.by_argument
+        for position in range(1, len(fact)):
+            del by_argument[(predicate, position, fact[position])][fact]
 
-        match_un = unary_ops.match(exp, i)
-        if match_un:#If a unary op was read
-            tokens.append(PToken('unaryop',match_un.group(0),match_un.start()))
-            i = match_un.end()
-            continue
+    def apply(self, add_facts, delete_facts):
+        '''Applies the effects of one action. Every fact in delete_facts is removed and then every fact in add_facts is added, so a fact that is
+both deleted and added ends up in the state. Nothing is changed if a fact to delete is missing.
 
-        match_atom = atoms.match(exp, i)
-        if match_atom:#If an atom is read
-            tokens.append(PToken('atom', match_atom.group(0),match_atom.start()))
-            i = match_atom.end()
-            continue
-        match_ws = ws.match(exp, i)
-        if match_ws:#If whitespace was read (but not end of input)
-            i = match_ws.end()
-            continue
+    Keyword Arguments:
+    add_facts -- A list of facts to add
+    delete_facts -- A list of facts to remove
 
-        #This return statement is only reached if tokenizing an input that is not well formed
-        return None
+    Returns:
+    An undo record that can be passed to undo to reverse the change. Raises ValueError if a fact in delete_facts is not in the state.'''
+        facts = self.facts
+        delete_facts = [parse_fact(fact) if fact.__class__ is str else fact for fact in delete_facts]
+        for fact in delete_facts:
+            if not fact in facts:
+                raise ValueError('%s is not in the world state' % fact_text(fact))
+        removed = list()
+        for fact in delete_facts:
+            #A fact listed twice is only removed once
+            if fact in facts:
+                self.remove_fact(fact)
+                removed.append(fact)
+        added = list()
+        for fact in add_facts:
+            if fact.__class__ is str:
+                fact = parse_fact(fact)
+            if not fact in facts:
+                self.add_fact(fact)
+                added.append(fact)
+        return added, removed
+
+    def undo(self, record):
+        '''Reverses a call to apply given the record it returned. The facts will be the same as before, though removed facts are put back at the end of the iteration order.'''
+        added, removed = record
+        for fact in added:
+            self.remove_fact(fact)
+        for fact in removed:
+            self.add_fact(fact)
+
+    def facts_with(self, predicate, position=None, argument=None):
+        '''Returns the facts that use predicate, or only those that also have argument at position when both are given.'''
+        if position is None:
+            return list(self.by_predicate.get(predicate, ()))
+        return list(self.by_argument.get((predicate, position, argument), ()))
+
+    def satisfies(self, goals):
+        '''Returns True if every fact in goals (strings or tuples) is in the state.'''
+        return set(map(self.as_fact, goals)) <= self.facts.keys()
+
+    def copy(self):
+        return WorldState(self.facts)
+
+    def key(self):
+        '''Returns a hashable value that is equal for any two states with the same facts.'''
+        return frozenset(self.facts)
+
+    def __contains__(self, fact):
+        return self.as_fact(fact) in self.facts
+
+    def __iter__(self):
+        return (fact_text(fact) for fact in self.facts)
+
+    def __len__(self):
+        return len(self.facts)
+
+    def __repr__(self):
+        return repr(list(self))
+
+class GoalMonitor(object):
+    '''Keeps count of the goals that do not hold while a plan is applied to a WorldState. The count is updated from the facts each step
+actually adds and removes, so finding out whether the goals hold after a step costs O(1) per changed fact rather than a scan of the goals.
+
+    Keyword Arguments:
+    goals -- A list of goal facts (strings or tuples)
+    world_state -- The WorldState the plan starts from, or any container of its fact tuples'''
+
+    def __init__(self, goals, world_state):
+        facts = world_state.facts if world_state.__class__ is WorldState else world_state
+        self.goals = set([parse_fact(goal) if goal.__class__ is str else goal for goal in goals])
+        self.unsatisfied = len([goal for goal in self.goals if not goal in facts])
+        self.step = 0
+        #Number of goals that held after each step, starting with the initial state
+        self.progress = [len(self.goals) - self.unsatisfied]
+        self.first_satisfied = 0 if self.unsatisfied == 0 else None
+
+    def update(self, record):
+        '''Counts one step given the undo record (added, removed) that WorldState.apply returned for it.
+
+    Returns:
+    True if every goal holds after the step.'''
+        added, removed = record
+        goals = self.goals
+        for fact in added:
+            if fact in goals:
+                self.unsatisfied -= 1
+        for fact in removed:
+            if fact in goals:
+                self.unsatisfied += 1
+        self.step += 1
+        self.progress.append(len(goals) - self.unsatisfied)
+        if self.unsatisfied == 0 and self.first_satisfied is None:
+            self.first_satisfied = self.step
+        return self.unsatisfied == 0
+
+    def satisfied(self):
+        return self.unsatisfied == 0
+
+#Single combined pattern used by scan_tokens. The alternatives are listed in the same order the tokenizer has always tried them,
+#and since python regex alternation is leftmost-first, one match here picks exactly the token the old one-regex-at-a-time loop picked.
+#NOTE: In the original problem definition, |j| was not an acceptable input, but because I needed one extra constant for the planning portion, I made |j| acceptable. I hope this isn't a problem, but it was the only way I could think of to get one more constant
+TOKEN_PATTERN = re.compile(r'''
+    (?P<lparen>\()
+   |(?P<rparen>\))
+   |(?P<binaryop>AND|OR|EQUIV|IMPLIES)
+   |(?P<quantifier>ALL|EXISTS)
+   |(?P<const>\|[a-ej]\|)
+   |(?P<function>\|[f-h]\|)
+   |(?P<variable>\|[u-z]\|)
+   |(?P<unaryop>NOT)
+   |(?P<atom>[A-Z]\d*|"[\w ]+")
+   |(?P<ws>\s+)''', re.VERBOSE)
+
+def scan_tokens(string):
+    '''Takes a lisp-readable input and breaks it into a compact token stream using a single pass of TOKEN_PATTERN.
+Each token is a (non_term, val, loc) tuple with the same kinds and locations tokenize_string gives its PToken objects.
+
+    Keyword Arguments:
+    string -- The lisp-readable input string
+
+    Returns:
+    A list of (non_term, val, loc) tuples in the order they were found in the string. Returns None if the input string is not well formed (bad formatting)'''
+    tokens = list()
+    append = tokens.append
+    match = TOKEN_PATTERN.match
+    i = 0
+    end = len(string)
+    while i < end:
+        match_tok = match(string, i)
+        if match_tok is None:
+            #Nothing matched at this position, the input is not well formed
+            return None
+        kind = match_tok.lastgroup
+        if kind != 'ws':
+            append((kind, match_tok.group(), i))
+        i = match_tok.end()
+    return tokens
+
+def tokenize_string(string):
+    '''Takes a lisp-readable input, converts the string into tokens, and returns a double-ended queue of the tokens in the order they were found in the string
     
+    Keyword Arguments:
+    string -- The lisp-readable input string
+
+    Returns:
+    A double-ended queue of PToken objects created by tokenize-ing the string. Returns None if the input string is not well formed (bad formatting)'''
+    scanned = scan_tokens(string)
+    if scanned is None:
+        return None
     #The input is well formed, return the deque of tokens
-    return tokens
+    return deque([PToken(kind, val, loc) for kind, val, loc in scanned])
 
 def construct_parse_tree(tokenized_input, is_FOL_tree=False):
     '''A function that creates an abstract syntax tree from a deque of parser tokens.
@@ -223,7 +528,9 @@ By default it does not build an AST based on first order logic, but by passing T
         c_token = tokenized_input.popleft()
         if c_token.non_term == 'lparen':
             #When left parenthesis is read use the next token's value to create a new node
-
+            #A left parenthesis at the very end has nothing inside it
+            if not tokenized_input:
+                return None
             c_token = tokenized_input.popleft()
             #If next char is a right parenthesis, nothing inside the parenthesis, proposition is not well-formed
             if c_token.non_term == 'rparen':
@@ -242,7 +549,9 @@ By default it does not build an AST based on first order logic, but by passing T
                 current_node = temp
 
         elif c_token.non_term == 'rparen':
-            #Current node is finished, go up one level in the tree
+            #Current node is finished, go up one level in the tree. A right parenthesis with nothing open is unbalanced.
+            if current_node.parent is None:
+                return None
             current_node = current_node.parent
         elif isOperator(c_token) or c_token.non_term == 'atom':
             #The operator, if one exists, is always the first term grabbed after a left parenthesis.The same goes for the capital-letter atoms
@@ -259,6 +568,325 @@ By default it does not build an AST based on first order logic, but by passing T
     else:
         return None 
 
+#Node kinds used by NodeTable. A node's kind is stored as its index in this list rather than as a string.
+NODE_KINDS = ['start', 'atom', 'unaryop', 'binaryop', 'quantifier', 'const', 'function', 'variable', 'lparen', 'rparen']
+KIND_CODES = {kind: code for code, kind in enumerate(NODE_KINDS)}
+
+class NodeTable(object):
+    '''A compact store for many parse trees at once. Instead of one LexNode object per node, every node is a row in a set of parallel arrays:
+its kind code, the index of its interned value in symbols, its loc, and the range of child_ids that holds its children.
+Nodes are added in postorder, so a node's children always have smaller indices than the node itself.
+When hash_cons is true, identical subtrees are only ever stored once and the table holds a DAG. The loc of a shared node is the loc of its first occurrence.'''
+
+    def __init__(self, hash_cons=False):
+        self.hash_cons = hash_cons
+        self.cons = dict()
+        self.kinds = array('B')
+        self.values = array('i')
+        self.locs = array('i')
+        self.child_start = array('i')
+        self.child_count = array('i')
+        self.child_ids = array('i')
+        self.symbols = list()
+        self.symbol_ids = dict()
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def intern(self, symbol):
+        '''Returns the index of symbol in self.symbols, adding it if it has not been seen before.'''
+        symbol_id = self.symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self.symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return symbol_id
+
+    def add_node(self, non_term, val, loc, children):
+        '''Appends one node whose children (a list of node indices) have already been added, and returns its index.
+If the table is hash-consed and an identical node already exists, that node's index is returned instead.'''
+        kind = KIND_CODES[non_term]
+        value = self.intern(val)
+        if self.hash_cons:
+            key = (kind, value, tuple(children))
+            index = self.cons.get(key)
+            if index is not None:
+                return index
+            self.cons[key] = len(self.kinds)
+        self.kinds.append(kind)
+        self.values.append(value)
+        self.locs.append(loc)
+        self.child_start.append(len(self.child_ids))
+        self.child_count.append(len(children))
+        self.child_ids.extend(children)
+        return len(self.kinds) - 1
+
+    def add_string(self, input_s, is_FOL_tree=False):
+        '''Tokenizes and parses a proposition straight into the table, without building PToken or LexNode objects. It accepts and rejects
+exactly the same input as construct_parse_tree(tokenize_string(input_s), is_FOL_tree).
+
+    Keyword Arguments:
+    input_s -- The lisp-readable string to parse
+    is_FOL_tree -- A boolean value, false by default. When is_FOL_tree is true, the tree is parsed as FOL.
+
+    Returns:
+    The index of the tree's start node, or None if the proposition is not well-formed.'''
+        tokens = scan_tokens(input_s)
+        if tokens is None:
+            return None
+        #Each open node is a [non_term, val, loc, children] list. The bottom one is the start node.
+        open_nodes = [['start', 'start', -1, list()]]
+        i = 0
+        token_count = len(tokens)
+        while i < token_count:
+            non_term, val, loc = tokens[i]
+            i += 1
+            if non_term == 'lparen':
+                if i == token_count:
+                    return None
+                non_term, val, loc = tokens[i]
+                i += 1
+                if non_term == 'rparen' or (not is_FOL_tree and non_term in ['quantifier','const','variable','function']):
+                    return None
+                open_nodes.append([non_term, val, loc, list()])
+            elif non_term == 'rparen':
+                if len(open_nodes) == 1:
+                    return None
+                node = open_nodes.pop()
+                open_nodes[-1][3].append(self.add_node(*node))
+            elif non_term in ['unaryop', 'atom']:
+                #Same rule as isOperator in construct_parse_tree: an operator or atom outside the first position is not well-formed
+                return None
+            elif is_FOL_tree:
+                open_nodes[-1][3].append(self.add_node(non_term, val, loc, []))
+            else:
+                return None
+        if len(open_nodes) != 1:
+            return None
+        return self.add_node(*open_nodes[0])
+
+    def add_tree(self, lex_tree):
+        '''Copies a LexNode tree into the table and returns the index of its root.'''
+        done = list()
+        stack = [(lex_tree, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if children_done:
+                child_count = len(node.children)
+                children = done[len(done) - child_count:]
+                del done[len(done) - child_count:]
+                done.append(self.add_node(node.non_term, node.val, node.loc, children))
+            else:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(node.children))
+        return done[0]
+
+    def node(self, index):
+        '''Returns a NodeRef for the node at index, which can be used anywhere a LexNode is read.'''
+        return NodeRef(self, index)
+
+    def to_lexnode(self, index):
+        '''Rebuilds an ordinary LexNode tree, with parent pointers, from the node at index.'''
+        kinds, values, locs = self.kinds, self.values, self.locs
+        root = LexNode(PToken(NODE_KINDS[kinds[index]], self.symbols[values[index]], locs[index]))
+        stack = [(index, root)]
+        while stack:
+            index, lex_node = stack.pop()
+            start = self.child_start[index]
+            for child in self.child_ids[start:start + self.child_count[index]]:
+                child_node = LexNode(PToken(NODE_KINDS[kinds[child]], self.symbols[values[child]], locs[child]), lex_node)
+                lex_node.children.append(child_node)
+                stack.append((child, child_node))
+        return root
+
+class NodeRef(object):
+    '''A read-only view of one node in a NodeTable with the same non_term, val, loc and children attributes as a LexNode, so evaluate_tree,
+compile_tree, StripsOp and the LexNode walkers work on compact trees unchanged. Views are created on demand and hold no data of their own.'''
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    @property
+    def non_term(self):
+        return NODE_KINDS[self.table.kinds[self.index]]
+
+    @property
+    def val(self):
+        return self.table.symbols[self.table.values[self.index]]
+
+    @property
+    def loc(self):
+        return self.table.locs[self.index]
+
+    @property
+    def children(self):
+        table = self.table
+        start = table.child_start[self.index]
+        return [NodeRef(table, child) for child in table.child_ids[start:start + table.child_count[self.index]]]
+
+    def __str__(self):
+        return self.val
+
+    def __repr__(self):
+        return "NodeRef(%s,%s,%d)" % (self.non_term, self.val, self.loc)
+
+    construct_text_from_nodes = LexNode.construct_text_from_nodes
+    get_var_terms = LexNode.get_var_terms
+
+#How many times a proposition is evaluated (or its program asked for) before it is simplified. Simplifying costs about as much as
+#several dozen evaluations of a typical proposition, which is only paid back by propositions that are evaluated many more times than that.
+SIMPLIFY_AFTER = 64
+
+class ParseCache(object):
+    '''A bounded least-recently-used cache of parsed propositions. Trees are kept in a hash-consed NodeTable, so a subformula that
+appears in many cached propositions is stored once. Each entry also remembers the program compile_tree produced for it. That program is
+compiled from the tree as written until it has been asked for more than simplify_after times (or straight away, when the caller says it is
+about to run it many times), and is then compiled again from the simplified tree. Propositions that are only evaluated a few times do not pay
+for simplify_tree. If simplify_after is None, programs are never simplified.
+Entries are keyed by the proposition string with its whitespace normalized and by whether it was parsed as FOL.'''
+
+    def __init__(self, max_size=1024, max_nodes=1 << 20, simplify_after=SIMPLIFY_AFTER):
+        self.max_size = max_size
+        self.max_nodes = max_nodes
+        self.simplify_after = simplify_after
+        self.table = NodeTable(hash_cons=True)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def normalize(self, input_s):
+        '''Returns the cache key text for input_s. Runs of whitespace are collapsed unless the string contains a quoted atom, where spacing matters.'''
+        if '"' in input_s:
+            return input_s.strip()
+        return ' '.join(input_s.split())
+
+    def lookup(self, input_s, is_FOL_tree):
+        '''Returns the [root, compiled, uses] entry for input_s, parsing and storing it first if it is not cached.'''
+        key = (self.normalize(input_s), is_FOL_tree)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+        self.misses += 1
+        #uses counts the programs asked for, and is None once the program has been simplified
+        entry = [self.table.add_string(input_s, is_FOL_tree), None, 0]
+        if self.max_size > 0:
+            self.entries[key] = entry
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            if len(self.table) > self.max_nodes:
+                self.compact()
+        return entry
+
+    def parse(self, input_s, is_FOL_tree=False):
+        '''The cached equivalent of construct_parse_tree(tokenize_string(input_s), is_FOL_tree).
+
+    Returns:
+    A NodeRef for the root of the tree, or None if the proposition is not well-formed.'''
+        root = self.lookup(input_s, is_FOL_tree)[0]
+        if root is None:
+            return None
+        return NodeRef(self.table, root)
+
+    def compile(self, input_s, hot=False):
+        '''The cached equivalent of compile_tree on the propositional tree of input_s. A simplified program is compiled with
+compile_simplified, so its symbol_list is the same as that of the program compiled from the tree as written.
+
+    Keyword Arguments:
+    input_s -- The proposition string
+    hot -- True if the program is about to be run many times, so it should be simplified now rather than after simplify_after requests
+
+    Returns:
+    The (program, symbol_list) tuple from compile_tree, or None if the proposition is not well-formed.'''
+        entry = self.lookup(input_s, False)
+        if entry[0] is None:
+            return None
+        if entry[2] is not None:
+            entry[2] += 1
+            if self.simplify_after is not None and (hot or entry[2] > self.simplify_after):
+                entry[1] = compile_simplified(NodeRef(self.table, entry[0]))
+                entry[2] = None
+        if entry[1] is None:
+            entry[1] = compile_tree(NodeRef(self.table, entry[0]))
+        return entry[1]
+
+    def compact(self):
+        '''Rebuilds the node table from the entries that are still cached, dropping the nodes only evicted entries were using.'''
+        old_table = self.table
+        self.table = NodeTable(hash_cons=True)
+        for entry in self.entries.values():
+            if entry[0] is not None:
+                entry[0] = self.table.add_tree(NodeRef(old_table, entry[0]))
+
+    def clear(self):
+        '''Empties the cache and resets its statistics.'''
+        self.__init__(self.max_size, self.max_nodes, self.simplify_after)
+
+    def stats(self):
+        '''Returns a dictionary with the hits, misses, evictions, number of cached entries and number of stored nodes.'''
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self.entries), 'nodes': len(self.table)}
+
+#Cache shared by TruthValue, IsTautology and wf_op_check
+parse_cache = ParseCache()
+
+#Group numbers of TOKEN_PATTERN, which check_well_formed compares instead of group names
+LPAREN_GROUP = TOKEN_PATTERN.groupindex['lparen']
+RPAREN_GROUP = TOKEN_PATTERN.groupindex['rparen']
+WS_GROUP = TOKEN_PATTERN.groupindex['ws']
+#A unary operator or an atom anywhere but straight after a left parenthesis makes a proposition ill-formed
+MISPLACED_GROUPS = frozenset([TOKEN_PATTERN.groupindex['unaryop'], TOKEN_PATTERN.groupindex['atom']])
+FOL_GROUPS = frozenset([TOKEN_PATTERN.groupindex[kind] for kind in ['quantifier', 'const', 'variable', 'function']])
+
+def check_well_formed(input_s, is_FOL_tree=False):
+    '''Decides whether input_s is well-formed without building PTokens or a tree. It gives the same answer as tokenizing and parsing the
+input with construct_parse_tree. TOKEN_PATTERN is matched one token at a time, and only the group number of each match is looked at, so no
+token text is copied. A small state machine keeps track of nothing but the number of open parentheses and whether the last token was a left
+parenthesis, and stops at the first character that is not a token or the first misplaced token.
+
+    Keyword Arguments:
+    input_s -- The lisp-readable string to check
+    is_FOL_tree -- A boolean value, false by default. When is_FOL_tree is true, the input is checked as FOL.
+
+    Returns:
+    True if the input is well-formed, False if it is not.'''
+    match = TOKEN_PATTERN.match
+    lparen = LPAREN_GROUP
+    rparen = RPAREN_GROUP
+    ws = WS_GROUP
+    misplaced = MISPLACED_GROUPS
+    fol_groups = FOL_GROUPS
+    depth = 0
+    after_lparen = False
+    position = 0
+    end = len(input_s)
+    while position < end:
+        token = match(input_s, position)
+        if token is None:
+            return False
+        position = token.end()
+        group = token.lastindex
+        if group == ws:
+            continue
+        if after_lparen:
+            #The token after a left parenthesis opens a node whatever it is, unless it closes the parenthesis or is FOL outside of FOL
+            if group == rparen or (not is_FOL_tree and group in fol_groups):
+                return False
+            after_lparen = False
+            depth += 1
+        elif group == lparen:
+            after_lparen = True
+        elif group == rparen:
+            if depth == 0:
+                return False
+            depth -= 1
+        elif group in misplaced or not is_FOL_tree:
+            return False
+    return depth == 0 and not after_lparen
+
 def wfp_checker(input_string):
     '''Takes a lisp-readable input and returns t if it is a well-formed proposition, and nil if it is not.
 
@@ -268,15 +896,11 @@ def wfp_checker(input_string):
     Returns:
     t if the proposition is well formed. nil if the proposition is not well formed.'''
 
-    tokens = tokenize_string(input_string)
-    if tokens is None: #the list is None, and not well-formed
-        return 'nil'
+    #Only the answer is needed, so the input is checked without tokenizing it or building its tree
+    if check_well_formed(input_string):
+        return 't'
     else:
-        abstract_tree = construct_parse_tree(tokens)
-        if abstract_tree: #A tree was generated, input is well-formed
-            return 't'
-        else:
-            return 'nil'
+        return 'nil'
 
 def isFOLProposition(token):
     '''Takes a token and tests its non_term field to determine whether or not it uses first order logic.
@@ -302,7 +926,7 @@ def isOperator(token):
 
 def evaluate_tree(abstract_tree, truth_vals):
     '''A function that is given an abstract syntax tree represented as a tree of LexNodes and a dictionary of truth values for the individual atoms,
-then recurses to the leaves and propagates the truth values obtained by applying the functions specified at function nodes
+then walks to the leaves and propagates the truth values obtained by applying the functions specified at function nodes
 to the values of their children. 
 
     Keyword Arguments:
@@ -312,77 +936,729 @@ to the values of their children.
     Returns:
     The overall truth value of a well-formed proposition based on the truth values supplied as a boolean value.'''
 
-    #Base case of recursion, return truth value of the atom
-    if (abstract_tree.non_term == 'atom'):
-        return truth_vals[abstract_tree.val]
-    #Binary-op case
-    elif abstract_tree.non_term == 'binaryop':
-        #AND operator
-        if abstract_tree.val == 'AND':
-            return (evaluate_tree(abstract_tree.children[0], truth_vals) and evaluate_tree(abstract_tree.children[1], truth_vals))
-        #OR operator
-        elif abstract_tree.val == 'OR':
-            return (evaluate_tree(abstract_tree.children[0], truth_vals) or evaluate_tree(abstract_tree.children[1], truth_vals))
-        #IMPLIES operator. a->b can also be interpreted as ((!a) or b)
-        elif abstract_tree.val == 'IMPLIES':
-            return (not(evaluate_tree(abstract_tree.children[0], truth_vals)) or evaluate_tree(abstract_tree.children[1], truth_vals))
-        #EQUIV operator. True if a == b, false if a != b
+    #Walk the tree with an explicit stack of (node, state) pairs rather than recursing, so deep trees cannot hit the recursion limit.
+    #state is how far the node has got: 0 = nothing evaluated yet, 1 = first child evaluated, 2 = both children evaluated.
+    #Operands are short-circuited exactly as the recursive version did, so atoms that are never reached do not need a truth value.
+    values = list()
+    stack = [(abstract_tree, 0)]
+    while stack:
+        node, state = stack.pop()
+        non_term = node.non_term
+        #Leaf case, push truth value of the atom
+        if non_term == 'atom':
+            values.append(truth_vals[node.val])
+        #Constant left by simplify_tree when the whole proposition folds to t or nil
+        elif non_term == 'truth':
+            values.append(node.val == 't')
+        #Binary-op case
+        elif non_term == 'binaryop':
+            if state == 0:
+                stack.append((node, 1))
+                stack.append((node.children[0], 0))
+            elif state == 1:
+                left = values[-1]
+                #AND with a false left side and OR with a true left side are decided by the left side alone
+                if (node.val == 'AND' and not left) or (node.val == 'OR' and left):
+                    continue
+                #IMPLIES with a false left side is true
+                if node.val == 'IMPLIES' and not left:
+                    values[-1] = True
+                    continue
+                stack.append((node, 2))
+                stack.append((node.children[1], 0))
+            else:
+                right = values.pop()
+                left = values.pop()
+                #EQUIV operator. True if a == b, false if a != b
+                if node.val == 'EQUIV':
+                    values.append(left == right)
+                #AND, OR and IMPLIES that were not short-circuited all take the value of the right side
+                else:
+                    values.append(right)
+        #Unary-op case
+        elif non_term == 'unaryop':
+            if state == 0:
+                stack.append((node, 1))
+                stack.append((node.children[0], 0))
+            else:
+                values[-1] = not values[-1]
+        #Start node case
+        else:
+            stack.append((node.children[0], 0))
+    return values[0]
+
+def evaluate_postorder(program, symbol_list, truth_vals):
+    '''Evaluates a proposition that has already been flattened by compile_tree for a single set of truth values. The program is a postorder
+array of the nodes, so this is one linear pass with no tree walk at all. Unlike evaluate_tree, every atom in symbol_list must have a truth value.
+
+    Keyword Arguments:
+    program -- The postfix program returned by compile_tree
+    symbol_list -- The list of atoms returned by compile_tree
+    truth_vals -- A dictionary that maps atom symbols to their truth values
+
+    Returns:
+    The truth value of the proposition as a boolean value.'''
+    return run_program(program, [1 if truth_vals[symbol] else 0 for symbol in symbol_list], 1) == 1
+
+#One match per (atom val) pair. The first alternative is the usual form, an atom, whitespace and a value, and gives them as groups 1 and 2.
+#Anything else made of word characters and whitespace in parentheses is group 3 and is read the way parse_valuation always read it.
+VALUATION_PAIR_PATTERN = re.compile(r'\((?:(\w+)\s+(\w+)[\w\s]*|([\w\s]+))\)')
+
+def valuation_pairs(truth_val_s):
+    '''Returns the (atom, value) string pairs of a valuation string, in the order they appear, found with a single findall.'''
+    pairs = list()
+    append = pairs.append
+    for atom, value, other in VALUATION_PAIR_PATTERN.findall(truth_val_s[1:-1]):
+        if atom:
+            append((atom, value))
         else:
-            return evaluate_tree(abstract_tree.children[0], truth_vals) == evaluate_tree(abstract_tree.children[1], truth_vals)
-    #Unary-op case
-    elif abstract_tree.non_term == 'unaryop':
-        return (not evaluate_tree(abstract_tree.children[0], truth_vals))
-    #Start node case
-    else:
-        return evaluate_tree(abstract_tree.children[0], truth_vals)
+            append((re.search(r'\w+(?=\s)', other).group(0), re.search(r'(?<=\s)\w+', other).group(0)))
+    return pairs
+
+def parse_valuation(truth_val_s):
+    '''Turns a valuation string into a dictionary of truth values.
+
+    Keyword Arguments:
+    truth_val_s -- A string of pairs in the form ((atom val)(atom val)...(atom val)). The val must be either t or nil.
+
+    Returns:
+    A dictionary mapping each atom to True if its value is 't' and False otherwise.'''
+    return {atom: value == 't' for atom, value in valuation_pairs(truth_val_s)}
+
+class Valuation(object):
+    '''The truth values of a valuation, kept as a mapping from atom to position and two packed bit arrays, one with the bits of the atoms
+that have a value and one with the bits of the atoms that are true. It can be used anywhere a dictionary of truth values can be read,
+so a valuation that is parsed once can be evaluated against any number of propositions.
+
+Several valuations may share one index, as iter_valuations does for a file of them, so that an atom has the same position in all of them.'''
+    __slots__ = ('index', 'known', 'bits')
+
+    def __init__(self, pairs=(), index=None):
+        '''Keyword Arguments:
+    pairs -- An iterable of (atom, value) pairs, where value is a boolean or a 't'/'nil' string
+    index -- An optional dictionary from atom to position to share with other valuations. New atoms are added to it.'''
+        self.index = dict() if index is None else index
+        index = self.index
+        #flags[position] is '1' for a true atom, '0' for a false one and '' for an atom with no value. A repeated atom keeps its last value,
+        #as it does in parse_valuation's dictionary.
+        flags = [''] * len(index)
+        for atom, value in pairs:
+            position = index.get(atom)
+            if position is None:
+                position = index[atom] = len(index)
+                flags.append('')
+            flags[position] = '1' if (value == 't' if value.__class__ is str else value) else '0'
+        #Both bit arrays are packed by int from a string of bits, with the last position first so that position p is bit p
+        flags.reverse()
+        size = (len(flags) + 7) >> 3
+        self.known = bytearray(int('0' + ''.join(['1' if flag else '0' for flag in flags]), 2).to_bytes(size, 'little'))
+        self.bits = bytearray(int('0' + ''.join([flag or '0' for flag in flags]), 2).to_bytes(size, 'little'))
+
+    @classmethod
+    def from_string(cls, truth_val_s, index=None):
+        '''Parses a valuation string such as (valuation (P t)(Q nil)) or ((P t)(Q nil)) in one pass.'''
+        triples = VALUATION_PAIR_PATTERN.findall(truth_val_s[1:-1])
+        if not triples:
+            return cls((), index)
+        atoms, values, others = zip(*triples)
+        index = dict() if index is None else index
+        fresh = not index
+        if fresh:
+            index.update(zip(atoms, range(len(atoms))))
+        #When every pair is in the usual form and the atoms are exactly those of the index in the same order, which they are for a fresh
+        #index without repeated atoms and for every block of a file that lists its atoms the same way, the bits can be packed in one go
+        if not all(atoms) or list(map(index.get, atoms)) != list(range(len(index))):
+            if fresh:
+                index.clear()
+            return cls(valuation_pairs(truth_val_s), index)
+        valuation = cls.__new__(cls)
+        valuation.index = index
+        size = (len(atoms) + 7) >> 3
+        valuation.known = bytearray(((1 << len(atoms)) - 1).to_bytes(size, 'little'))
+        valuation.bits = bytearray(int(''.join(['1' if value == 't' else '0' for value in reversed(values)]), 2).to_bytes(size, 'little'))
+        return valuation
+
+    def position(self, atom):
+        '''Returns the position of an atom that has a value, or None.'''
+        position = self.index.get(atom)
+        if position is None or position >> 3 >= len(self.known) or not self.known[position >> 3] >> (position & 7) & 1:
+            return None
+        return position
+
+    def __getitem__(self, atom):
+        position = self.position(atom)
+        if position is None:
+            raise KeyError(atom)
+        return self.bits[position >> 3] >> (position & 7) & 1 == 1
+
+    def __contains__(self, atom):
+        return self.position(atom) is not None
+
+    def get(self, atom, default=None):
+        position = self.position(atom)
+        if position is None:
+            return default
+        return self.bits[position >> 3] >> (position & 7) & 1 == 1
+
+    def flag_strings(self):
+        '''Returns the known and true bits as strings of '0' and '1' with position p at index p, for walking every atom at once.'''
+        size = len(self.known) * 8
+        return (format(int.from_bytes(self.known, 'little'), '0%db' % size)[::-1],
+                format(int.from_bytes(self.bits, 'little'), '0%db' % size)[::-1])
+
+    def __iter__(self):
+        known = self.flag_strings()[0]
+        return iter([atom for atom, position in self.index.items() if position < len(known) and known[position] == '1'])
+
+    def __len__(self):
+        return int.from_bytes(self.known, 'little').bit_count() if hasattr(int, 'bit_count') else bin(int.from_bytes(self.known, 'little')).count('1')
+
+    def to_dict(self):
+        known, bits = self.flag_strings()
+        return {atom: bits[position] == '1' for atom, position in self.index.items() if position < len(known) and known[position] == '1'}
+
+#A valuation block: an expression whose parentheses are nested at most two deep, such as (valuation (P t)(Q nil))
+VALUATION_BLOCK_PATTERN = re.compile(r'\((?:[^()]|\([^()]*\))*\)')
+#Text between blocks, which is skipped
+VALUATION_GAP_PATTERN = re.compile(r'[^(]*')
+#Amount of input iter_valuations reads at once from a file
+VALUATION_CHUNK_SIZE = 1 << 16
+
+def iter_valuations(source, index=None, chunk_size=VALUATION_CHUNK_SIZE):
+    '''Reads valuation blocks one after another from a string or an open text file, such as a file with one (valuation ...) per line,
+without reading the whole file at once. Each block is found with a single regular expression match rather than by counting its
+parentheses one at a time, so a block may only nest parentheses two deep, as valuations do. Every valuation shares one atom index, so a
+given atom has the same position in all of them.
+
+    Keyword Arguments:
+    source -- A string or an open text file holding any number of valuation expressions
+    index -- An optional dictionary from atom to position to start from
+    chunk_size -- How many characters to read at a time from a file
+
+    Returns:
+    A generator of Valuation objects. Raises ValueError at the end of the input if some text starting with '(' is not a valuation block.'''
+    if index is None:
+        index = dict()
+    chunks = [source] if isinstance(source, str) else iter(lambda: source.read(chunk_size), '')
+    block = VALUATION_BLOCK_PATTERN.match
+    gap = VALUATION_GAP_PATTERN.match
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        pos = 0
+        while True:
+            pos = gap(buffer, pos).end()
+            match = block(buffer, pos)
+            if match is None:
+                #Either the input ended or the rest of this block is in the next chunk
+                break
+            pos = match.end()
+            yield Valuation.from_string(match.group(), index)
+        buffer = buffer[pos:]
+    if buffer.strip():
+        raise ValueError('%s... is not a valuation' % buffer[:40])
 
 def TruthValue(truth_val_s, wfp_s):
     '''Determines the truth value of a well-formed proposition when given strings representing the truth values of the individual atoms and the proposition to be evaluated.
 
     Keyword Arguments:
     truth_val_s -- A string of pairs in the form ((atom val)(atom val)...(atom val)). The atom must conform to the standards of a well-formed proposition. The val must be either t or nil.
+It may also be a Valuation (or a dictionary of truth values) that was parsed before, so that it is not parsed again for every proposition.
     wfp_s -- A string representing a well-formed proposition.
 
     Returns: 
     True if the result of the evaluation is true, and false if the statement evaluates to false based on the truth values given.'''
 
-    #Generates a list of strings containing the key value pairs for truth assignments
-    truth_list = re.findall('\([\w\s]+\)', truth_val_s[1:-1])
-
-    #Generates a dictionary of truth values mapped to their respective atom. If the provided value is 't', then its value is True, else it is False.
-    truth_val_dict = {re.search('\w+(?=\s)', pair).group(0): re.search('(?<=\s)\w+', pair).group(0) == 't' for pair in truth_list }
+    if truth_val_s.__class__ is str:
+        truth_val_dict = Valuation.from_string(truth_val_s)
+    else:
+        truth_val_dict = truth_val_s
     
-    #Tokenize the proposition and turn it into a parse-able tree.
-    tokenized_prop = tokenize_string(wfp_s)
-    lex_tree = construct_parse_tree(tokenized_prop)
+    #Get the compiled proposition from the parse cache rather than tokenizing and parsing it again.
+    compiled = parse_cache.compile(wfp_s)
     
-    #Parse the tree based on the given truth values and return the overall evaluation of the proposition. t if True and nil if False
-    statement_value = evaluate_tree(lex_tree, truth_val_dict)
+    #Evaluate the proposition based on the given truth values and return the overall evaluation of the proposition. t if True and nil if False
+    if compiled is not None and all(symbol in truth_val_dict for symbol in compiled[1]):
+        statement_value = evaluate_postorder(compiled[0], compiled[1], truth_val_dict)
+    else:
+        #Some atom has no truth value. evaluate_tree short-circuits, so it only fails if it actually needs one.
+        statement_value = evaluate_tree(construct_parse_tree(tokenize_string(wfp_s)), truth_val_dict)
     #The statement evaluated to true
     if statement_value:
         return 't'
     else:
         return 'nil'
 
-def IsTautology(wfp_s):
+def TruthValues(wfp_s, valuations, atoms=None):
+    '''Determines the truth value of one well-formed proposition under many valuations at once. The proposition is parsed once, every atom's
+values across the whole batch are packed into one bit-vector, and the compiled proposition is evaluated a single time over those bit-vectors.
+
+    Keyword Arguments:
+    wfp_s -- A string representing a well-formed proposition.
+    valuations -- Either a list whose items are valuation strings (as taken by TruthValue), Valuations or dictionaries mapping atoms to truth values,
+or a 2D NumPy array of booleans with one row per valuation and one column per atom.
+    atoms -- The atom for each column when valuations is a NumPy array. Defaults to the atoms of the proposition in the order they first appear.
+
+    Returns:
+    A list holding 't' or 'nil' for each valuation, in the same order as valuations.'''
+    program, symbol_list = compile_proposition(wfp_s)
+    count = len(valuations)
+    if count == 0:
+        return list()
+    mask = (1 << count) - 1
+
+    atom_values = list()
+    if hasattr(valuations, 'shape'):
+        #NumPy matrix. Pack each column straight into an int, bit r holding row r.
+        import numpy
+        if atoms is None:
+            atoms = symbol_list
+        columns = {atom: k for k, atom in enumerate(atoms)}
+        for symbol in symbol_list:
+            packed = numpy.packbits(numpy.asarray(valuations[:, columns[symbol]], dtype=bool), bitorder='little')
+            atom_values.append(int.from_bytes(packed.tobytes(), 'little'))
+    else:
+        rows = [Valuation.from_string(row) if isinstance(row, str) else row for row in valuations]
+        for symbol in symbol_list:
+            #Build the bits as a string with the last row first, so that row r ends up in bit r
+            atom_values.append(int(''.join(['1' if row[symbol] else '0' for row in reversed(rows)]), 2))
+
+    result = run_program(program, atom_values, mask)
+    return ['t' if bit == '1' else 'nil' for bit in format(result, '0%db' % count)[::-1]]
+
+#Used to fold the hashes of a subformula's operands into its own, so that operands are sorted the same way in every run
+SIMPLIFY_HASH_MODULUS = (1 << 61) - 1
+
+class Simplifier(object):
+    '''Rewrites propositional trees into a simpler canonical form with the same truth value under every valuation. Every distinct
+subformula is stored once, as in a hash-consed NodeTable, and is identified by its index. While a tree is added:
+NOT (NOT x) becomes x, IMPLIES a b becomes OR (NOT a) b, chains of AND and of OR are flattened into one operator with any number of operands,
+repeated operands are dropped, and a chain holding both x and (NOT x) becomes a constant, as do IMPLIES x x and EQUIV x x.
+Constants are then folded into the operators above them, so one is only left if the whole proposition is constant.
+The operands of a chain (and of EQUIV) are sorted by size first, so that evaluate_tree reaches the cheap operands that can short-circuit
+the chain before the expensive ones, and then by a hash of their structure, so that equivalent orderings of the operands come out the same.'''
+
+    def __init__(self):
+        #Parallel lists with one entry per subformula: its operator ('atom', 'truth', 'NOT', 'AND', 'OR' or 'EQUIV'), its value (the
+        #atom, t or nil for constants, the operator otherwise), the indices of its operands, its number of nodes and its hash
+        self.ops = list()
+        self.values = list()
+        self.operands = list()
+        self.sizes = list()
+        self.hashes = list()
+        self.ids = dict()
+        #The atoms in the order they were first added, which for a single tree is the order compile_tree numbers them in
+        self.atoms = list()
+        self.true = self.make('truth', 't', ())
+        self.false = self.make('truth', 'nil', ())
+
+    def __len__(self):
+        return len(self.ops)
+
+    def make(self, op, value, operands):
+        '''Returns the index of the subformula op(operands), adding it if it has not been seen before.'''
+        key = (op, value, operands)
+        index = self.ids.get(key)
+        if index is None:
+            index = self.ids[key] = len(self.ops)
+            structure_hash = zlib.crc32(value.encode('utf-8'))
+            size = 1
+            for operand in operands:
+                structure_hash = (structure_hash * 1000003 + self.hashes[operand]) % SIMPLIFY_HASH_MODULUS
+                size += self.sizes[operand]
+            if op == 'atom':
+                self.atoms.append(value)
+            self.ops.append(op)
+            self.values.append(value)
+            self.operands.append(operands)
+            self.sizes.append(size)
+            self.hashes.append(structure_hash)
+        return index
+
+    def order(self, index):
+        '''The sort key of a subformula among the operands of a chain.'''
+        return (self.sizes[index], self.hashes[index], self.ops[index], self.values[index])
+
+    def negate(self, index):
+        '''Returns the index of NOT of the subformula at index.'''
+        if index == self.true:
+            return self.false
+        if index == self.false:
+            return self.true
+        if self.ops[index] == 'NOT':
+            return self.operands[index][0]
+        return self.make('NOT', 'NOT', (index,))
+
+    def junction(self, op, operands):
+        '''Returns the index of the AND or OR of operands, flattened, without repeats and sorted. OR puts its negated operands first so that
+to_lexnode can write them as the antecedents of IMPLIES instead of evaluating a NOT for each.'''
+        if op == 'AND':
+            absorbing, identity = self.false, self.true
+        else:
+            absorbing, identity = self.true, self.false
+        members = set()
+        pending = list(operands)
+        while pending:
+            index = pending.pop()
+            if index == absorbing:
+                return absorbing
+            if index == identity:
+                continue
+            if self.ops[index] == op:
+                pending.extend(self.operands[index])
+            else:
+                members.add(index)
+        for index in members:
+            if self.ops[index] == 'NOT' and self.operands[index][0] in members:
+                return absorbing
+        if not members:
+            return identity
+        if len(members) == 1:
+            return members.pop()
+        if op == 'OR':
+            key = lambda index: (self.ops[index] != 'NOT',) + self.order(index)
+        else:
+            key = self.order
+        return self.make(op, op, tuple(sorted(members, key=key)))
+
+    def equiv(self, left, right):
+        '''Returns the index of EQUIV left right.'''
+        if left == right:
+            return self.true
+        if left == self.negate(right):
+            return self.false
+        for constant, other in [(left, right), (right, left)]:
+            if constant == self.true:
+                return other
+            if constant == self.false:
+                return self.negate(other)
+        #EQUIV (NOT a) (NOT b) is EQUIV a b
+        if self.ops[left] == 'NOT' and self.ops[right] == 'NOT':
+            left, right = self.operands[left][0], self.operands[right][0]
+        return self.make('EQUIV', 'EQUIV', tuple(sorted([left, right], key=self.order)))
+
+    def add_tree(self, abstract_tree):
+        '''Simplifies a propositional LexNode (or NodeRef) tree and returns the index of the result. Raises ValueError if the tree has an
+operator without enough operands or a node that is not propositional, which evaluate_tree could not evaluate either.'''
+        if abstract_tree.__class__ is NodeRef:
+            return self.add_table_node(abstract_tree.table, abstract_tree.index)
+        table = NodeTable()
+        return self.add_table_node(table, table.add_tree(abstract_tree))
+
+    def add_table_node(self, table, index):
+        '''Simplifies the tree at index in a NodeTable, reading its arrays directly, and returns the index of the result.'''
+        kinds, values, symbols = table.kinds, table.values, table.symbols
+        child_start, child_count, child_ids = table.child_start, table.child_count, table.child_ids
+        atom, start, unaryop, binaryop = KIND_CODES['atom'], KIND_CODES['start'], KIND_CODES['unaryop'], KIND_CODES['binaryop']
+        #Results of the finished subtrees, left to right, and an explicit stack of node indices still to do. An (op, negated) tuple on the
+        #stack combines the last len(negated) results, negating those whose flag is set.
+        done = list()
+        stack = [index]
+        while stack:
+            item = stack.pop()
+            if item.__class__ is tuple:
+                op, negated = item
+                count = len(negated)
+                results = [self.negate(result) if flag else result for result, flag in zip(done[len(done) - count:], negated)]
+                del done[len(done) - count:]
+                if op == 'EQUIV':
+                    done.append(self.equiv(results[0], results[1]))
+                elif op == 'NOT':
+                    done.append(results[0])
+                else:
+                    done.append(self.junction(op, results))
+                continue
+            kind = kinds[item]
+            first = child_start[item]
+            if kind == atom:
+                done.append(self.make('atom', symbols[values[item]], ()))
+            elif kind == start and child_count[item]:
+                stack.append(child_ids[first])
+            elif kind == unaryop and child_count[item]:
+                stack.append(('NOT', (True,)))
+                stack.append(child_ids[first])
+            elif kind == binaryop and child_count[item] >= 2 and symbols[values[item]] == 'EQUIV':
+                stack.append(('EQUIV', (False, False)))
+                stack.append(child_ids[first + 1])
+                stack.append(child_ids[first])
+            elif kind == binaryop and child_count[item] >= 2:
+                #Collect the operands of the whole chain of AND (or of OR and IMPLIES) at once, rather than one level at a time,
+                #so a long chain is sorted once instead of once per level
+                op = 'AND' if symbols[values[item]] == 'AND' else 'OR'
+                chained = ['AND'] if op == 'AND' else ['OR', 'IMPLIES']
+                operands = list()
+                negated = list()
+                pending = [(item, False)]
+                while pending:
+                    operand, flag = pending.pop()
+                    operand_op = symbols[values[operand]]
+                    if not flag and kinds[operand] == binaryop and child_count[operand] >= 2 and operand_op in chained:
+                        operand_first = child_start[operand]
+                        pending.append((child_ids[operand_first + 1], False))
+                        pending.append((child_ids[operand_first], operand_op == 'IMPLIES'))
+                    else:
+                        operands.append(operand)
+                        negated.append(flag)
+                stack.append((op, tuple(negated)))
+                stack.extend(reversed(operands))
+            else:
+                raise ValueError('Cannot simplify a %s node with %d children' % (NODE_KINDS[kind], child_count[item]))
+        return done[0]
+
+    def to_lexnode(self, index):
+        '''Builds a LexNode tree, under a start node, for the subformula at index. A chain is written as right nested binary operators in
+the order of its operands, and OR (NOT a) rest as IMPLIES a rest. Nodes that were not in the original tree have a loc of -1.'''
+        root = LexNode(PToken('start', 'start', -1))
+        #(index, position, parent) where position is how many operands of a chain have already been written
+        stack = [(index, 0, root)]
+        while stack:
+            index, position, parent = stack.pop()
+            op = self.ops[index]
+            if op == 'atom' or op == 'truth':
+                parent.children.append(LexNode(PToken(op, self.values[index], -1), parent))
+                continue
+            operands = self.operands[index]
+            if op == 'NOT':
+                node = LexNode(PToken('unaryop', 'NOT', -1), parent)
+                parent.children.append(node)
+                stack.append((operands[0], 0, node))
+            elif op == 'EQUIV':
+                node = LexNode(PToken('binaryop', 'EQUIV', -1), parent)
+                parent.children.append(node)
+                stack.append((operands[1], 0, node))
+                stack.append((operands[0], 0, node))
+            elif position == len(operands) - 1:
+                stack.append((operands[position], 0, parent))
+            else:
+                operand = operands[position]
+                if op == 'OR' and self.ops[operand] == 'NOT':
+                    node = LexNode(PToken('binaryop', 'IMPLIES', -1), parent)
+                    operand = self.operands[operand][0]
+                else:
+                    node = LexNode(PToken('binaryop', op, -1), parent)
+                parent.children.append(node)
+                #The left operand is pushed last so that it is written (and appended to node.children) first
+                stack.append((index, position + 1, node))
+                stack.append((operand, 0, node))
+        return root
+
+def simplify_tree(abstract_tree):
+    '''Returns a simplified, canonical copy of a propositional AST, as described in Simplifier, which evaluate_tree and compile_tree
+evaluate to the same truth value as the original under every valuation. Use it when a tree is evaluated many times, as the parse cache
+does for the propositions it compiles often. Operands are reordered, so evaluate_tree may look up atoms that the original tree short-circuited past.
+
+    Keyword Arguments:
+    abstract_tree -- A LexNode (or NodeRef) that represents the root of the tree
+
+    Returns:
+    The start LexNode of the simplified tree. A tree that evaluate_tree could not evaluate, such as an AND with one operand, is returned as it is.'''
+    simplifier = Simplifier()
+    try:
+        root = simplifier.add_tree(abstract_tree)
+    except ValueError:
+        return abstract_tree
+    return simplifier.to_lexnode(root)
+
+def compile_simplified(abstract_tree):
+    '''Returns the (program, symbol_list) pair compile_tree gives for the simplified abstract_tree, with the atoms numbered in the order
+compile_tree numbers them in abstract_tree itself, so symbol_list is the same as for the tree as written. Atoms that simplified away stay
+in symbol_list, although the program no longer reads them.'''
+    simplifier = Simplifier()
+    try:
+        root = simplifier.add_tree(abstract_tree)
+    except ValueError:
+        return compile_tree(abstract_tree)
+    return compile_tree(simplifier.to_lexnode(root), simplifier.atoms)
+
+#Number of truth assignments packed into one python int when checking tautologies. Each block covers 2**TAUTOLOGY_BLOCK_BITS assignments.
+TAUTOLOGY_BLOCK_BITS = 16
+
+def compile_tree(abstract_tree, symbol_list=None):
+    '''Flattens a propositional AST into a postfix program so that it can be evaluated many times without walking the LexNode tree.
+The atoms are numbered in the order they are first found in a preorder walk of the tree, which is the same order they appear in the proposition string.
+
+    Keyword Arguments:
+    abstract_tree -- A LexNode that represents the root of the tree (or of a sub-tree).
+    symbol_list -- An optional list of atoms that are numbered first, in its order, such as the atoms of the tree a simplified tree came from.
+
+    Returns:
+    A tuple (program, symbol_list). program is a list of (opcode, argument) tuples in postfix order where opcode is 'atom', 'truth', 'NOT', 'AND', 'OR', 'IMPLIES' or 'EQUIV'
+and argument is the index of the atom in symbol_list for 'atom' instructions, the boolean value of a 'truth' constant, and None otherwise.
+symbol_list is the list of atoms with no duplicates.'''
+    program = list()
+    symbol_list = list() if symbol_list is None else list(symbol_list)
+    symbol_index = {symbol: index for index, symbol in enumerate(symbol_list)}
+    #Explicit stack of (node, children_done) pairs. A node is emitted after all of its children, giving postfix order.
+    stack = [(abstract_tree, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if node.non_term == 'start':
+            stack.append((node.children[0], False))
+        elif node.non_term == 'atom':
+            if not node.val in symbol_index:
+                symbol_index[node.val] = len(symbol_list)
+                symbol_list.append(node.val)
+            program.append(('atom', symbol_index[node.val]))
+        elif node.non_term == 'truth':
+            program.append(('truth', node.val == 't'))
+        elif children_done:
+            program.append((node.val, None))
+        else:
+            stack.append((node, True))
+            #Push the children in reverse so the leftmost child is compiled (and its atoms numbered) first
+            for child in reversed(node.children[:2] if node.non_term == 'binaryop' else node.children[:1]):
+                stack.append((child, False))
+    return program, symbol_list
+
+def run_program(program, atom_values, mask):
+    '''Evaluates a program produced by compile_tree over packed bit-vectors. Bit i of every value is one truth assignment, so a single
+call evaluates the proposition for every assignment covered by mask at once.
+
+    Keyword Arguments:
+    program -- The postfix program returned by compile_tree
+    atom_values -- A list of ints where atom_values[k] holds the truth values of the kth atom, one bit per assignment
+    mask -- An int with a 1 in every bit position that holds an assignment
+
+    Returns:
+    An int whose ith bit is the truth value of the proposition under the ith assignment.'''
+    stack = list()
+    push = stack.append
+    pop = stack.pop
+    for opcode, argument in program:
+        if opcode == 'atom':
+            push(atom_values[argument])
+        elif opcode == 'NOT':
+            push(mask ^ pop())
+        elif opcode == 'truth':
+            push(mask if argument else 0)
+        else:
+            right = pop()
+            left = pop()
+            if opcode == 'AND':
+                push(left & right)
+            elif opcode == 'OR':
+                push(left | right)
+            elif opcode == 'IMPLIES':
+                push((mask ^ left) | right)
+            else:
+                push(mask ^ (left ^ right))
+    return stack[0]
+
+def compile_proposition(wfp_s, hot=False):
+    '''Returns the (program, symbol_list) pair from compile_tree for a well-formed proposition, using parse_cache, simplified now if hot is true.
+Raises ValueError if the proposition is not well-formed.'''
+    compiled = parse_cache.compile(wfp_s, hot)
+    if compiled is None:
+        raise ValueError('Not a well-formed proposition: %s' % wfp_s)
+    return compiled
+
+def tautology_block_count(atom_count):
+    '''Returns the number of blocks search_blocks splits the assignments of atom_count atoms into.'''
+    return 1 << (atom_count - min(atom_count, TAUTOLOGY_BLOCK_BITS))
+
+def search_blocks(program, atom_count, first_block=0, end_block=None):
+    '''Evaluates a compiled proposition over the blocks of truth assignments from first_block up to (not including) end_block and returns
+the first assignment that makes it false. Each block holds 2**TAUTOLOGY_BLOCK_BITS assignments (fewer if there are not that many atoms), packed one per bit.
+
+    Keyword Arguments:
+    program -- The postfix program returned by compile_tree
+    atom_count -- The number of atoms in the proposition
+    first_block -- The first block to check
+    end_block -- The block to stop at. Defaults to tautology_block_count(atom_count), i.e. every assignment.
+
+    Returns:
+    The number of the first falsifying assignment, in which the jth atom is true when bit j is set, or None if there is none in these blocks.'''
+    block_bits = min(atom_count, TAUTOLOGY_BLOCK_BITS)
+    width = 1 << block_bits
+    mask = (1 << width) - 1
+    if end_block is None:
+        end_block = tautology_block_count(atom_count)
+
+    #The low block_bits atoms take every combination inside a block. Atom j is true at position i when bit j of i is set.
+    patterns = list()
+    for j in range(block_bits):
+        pattern = ((1 << (1 << j)) - 1) << (1 << j)
+        filled = 1 << (j + 1)
+        #Double the pattern until it covers the whole block
+        while filled < width:
+            pattern |= pattern << filled
+            filled <<= 1
+        patterns.append(pattern)
+
+    for block in range(first_block, end_block):
+        #The remaining atoms are constant across a block and come from the bits of the block number
+        atom_values = patterns + [mask if (block >> j) & 1 else 0 for j in range(atom_count - block_bits)]
+        result = run_program(program, atom_values, mask)
+        if result != mask:
+            missing = mask ^ result
+            return (block << block_bits) | ((missing & -missing).bit_length() - 1)
+    return None
+
+def find_counterexample(wfp_s):
+    '''Checks every truth assignment of a well-formed proposition, a whole block of assignments at a time, and returns the first one
+under which the proposition is false. Assignments are tried in the same order IsTautology has always used: in assignment i, the jth atom is true when bit j of i is set.
+
+    Keyword Arguments:
+    wfp_s -- A string that is a well-formed proposition.
+
+    Returns:
+    A dictionary mapping each atom to its truth value in the first falsifying assignment, or None if the proposition is a tautology.'''
+    program, symbol_list = compile_proposition(wfp_s)
+    if tautology_block_count(len(symbol_list)) > 1:
+        #The program will be run once per block, which makes simplifying it first worthwhile
+        program, symbol_list = compile_proposition(wfp_s, True)
+    index = search_blocks(program, len(symbol_list))
+    if index is None:
+        return None
+    return {symbol: ((index >> j) & 1) == 1 for j, symbol in enumerate(symbol_list)}
+
+def IsTautology(wfp_s, engine='bitvector'):
     '''Takes a string that is a well-formed proposition and evaluates it for all possible truth values to determine if it is a tautology (true under all circumstances) or not.
     
     Keyword Arguments:
     wfp_s -- A string that is a well-formed proposition.
+    engine -- 'bitvector' (the default) compiles the proposition once and checks blocks of assignments at a time with find_counterexample.
+'sat' searches for a falsifying assignment with the CDCL solver in prog3_sat, which scales to far more atoms.
+'parallel' splits the blocks of assignments into shards and checks them in a process pool with prog3_shards.
+'enumerate' evaluates the tree once per assignment with evaluate_tree, simplifying it after the first SIMPLIFY_AFTER assignments.
 
     Returns:
     't' if the well-formed proposition is a tautology, or 'nil' if it is not a tautology'''
 
+    if engine == 'bitvector':
+        if find_counterexample(wfp_s) is None:
+            return 't'
+        return 'nil'
+    elif engine == 'sat':
+        import prog3_sat
+        if prog3_sat.sat_counterexample(wfp_s) is None:
+            return 't'
+        return 'nil'
+    elif engine == 'parallel':
+        import prog3_shards
+        if prog3_shards.sharded_counterexample(wfp_s)[0] is None:
+            return 't'
+        return 'nil'
+    elif engine != 'enumerate':
+        raise ValueError('Unknown tautology engine: %s' % engine)
+
     tokenized_input = tokenize_string(wfp_s)
 
     #Creates a list of the atoms in the proposition with no duplicates
-    symbol_list = [token.val for token in tokenized_input if (token.non_term == 'atom' and (not token.val in symbol_list))]
+    symbol_list = list()
+    for token in tokenized_input:
+        if token.non_term == 'atom' and not token.val in symbol_list:
+            symbol_list.append(token.val)
 
     lex_tree = construct_parse_tree(tokenized_input)
 
     #Dictionary for mapping truth value to atoms
     val_dict = dict()
     for i in range(2 ** len(symbol_list)):
+        #Most propositions that are not tautologies are false under one of the first few assignments. The tree of one that gets past them
+        #will be evaluated many more times, so simplify it.
+        if i == SIMPLIFY_AFTER:
+            lex_tree = simplify_tree(lex_tree)
         for j in range(len(symbol_list)):
             #If the jth bit of i is a 1, set corresponding atom to true
             if ((i >> j) & 1) == 1:
@@ -398,29 +1674,97 @@ def IsTautology(wfp_s):
 
 def wfp_checkerFOL(input_s):
     '''Takes a string as input and determines whether it is a well-formed proposition using first order logic.
-This is done by tokenizing the input then constructing an abstract syntax tree. If part of this process returns None, the proposition is not well formed.
+This is done in a single scan of the input with check_well_formed, which accepts exactly what tokenizing the input and constructing an
+abstract syntax tree accepts.
 
     Keyword Arguments:
     input_s -- The input string to be checked for well formedness
     Returns:
     't' if the proposition is well-formed using first order logic, 'nil' if it is not well-formed.'''
-    tokenized_input = tokenize_string(input_s)
-    if tokenized_input:
-        #token deque is not null, attempt to construct AST
-        lex_tree = construct_parse_tree(tokenized_input, True)
-        if lex_tree:
-            #tree was properly generated, proposition is well-formed
-            return 't'
-        else:
-            return 'nil'
+    #An input with no tokens at all is not a FOL proposition, though wfp_checker has always accepted it
+    if not input_s or input_s.isspace():
+        return 'nil'
+    if check_well_formed(input_s, True):
+        #proposition is well-formed
+        return 't'
     return 'nil'
 
+#Used by iter_exps to find the parentheses in each chunk of input
+PAREN_PATTERN = re.compile('[()]')
+BYTES_PAREN_PATTERN = re.compile(b'[()]')
+BYTES_WHITESPACE = string.whitespace.encode('ascii')
+
+#Amount of input iter_exps reads at once from a file object or mmap
+EXPS_CHUNK_SIZE = 1 << 20
+
+def iter_exps(source, chunk_size=EXPS_CHUNK_SIZE):
+    '''A generator version of get_exps that finds the top-level lisp expressions in its input incrementally. Instead of a stack of
+characters it only keeps a count of the open parentheses, so each character is looked at once, and only the text of the expression currently
+being read is held in memory. Anything outside of an expression is skipped, exactly as get_exps does.
+
+    Keyword Arguments:
+    source -- The input. Either a str or bytes object, a file object opened in text or binary mode, or an mmap.
+    chunk_size -- How many characters (or bytes) to read at a time from a file object or mmap.
+
+    Returns:
+    Yields (offset, expression) tuples in the order the expressions appear. offset is where the expression starts: a character offset for
+text input and a byte offset for binary input (bytes, binary files and mmaps). Expressions from binary input are decoded as UTF-8.'''
+    if isinstance(source, (str, bytes)):
+        chunks = [source]
+    elif hasattr(source, 'read'):
+        chunks = iter(lambda: source.read(chunk_size), source.read(0))
+    else:
+        chunks = (source[i:i + chunk_size] for i in range(0, len(source), chunk_size))
+
+    depth = 0
+    #True when non-whitespace text outside of any expression has been seen since the last unmatched ')'
+    stray_text = False
+    pieces = list()
+    exp_start = 0
+    base = 0
+    for chunk in chunks:
+        is_bytes = isinstance(chunk, bytes)
+        whitespace = BYTES_WHITESPACE if is_bytes else string.whitespace
+        left = b'('[0] if is_bytes else '('
+        pos = 0
+        piece_start = 0
+        for match in (BYTES_PAREN_PATTERN if is_bytes else PAREN_PATTERN).finditer(chunk):
+            i = match.start()
+            if depth == 0:
+                if chunk[pos:i].strip(whitespace):
+                    stray_text = True
+                if chunk[i] == left:
+                    depth = 1
+                    exp_start = base + i
+                    piece_start = i
+                    pieces = list()
+                else:
+                    #A ')' with no matching '('. get_exps returns it as an expression of its own if there was stray text before it.
+                    if not stray_text:
+                        raise ValueError('Unmatched right parenthesis at offset %d' % (base + i))
+                    stray_text = False
+                    yield base + i, ')'
+            elif chunk[i] == left:
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    pieces.append(chunk[piece_start:i + 1])
+                    expression = chunk[:0].join(pieces)
+                    pieces = list()
+                    yield exp_start, expression.decode('utf-8') if is_bytes else expression
+            pos = i + 1
+        if depth == 0:
+            if chunk[pos:].strip(whitespace):
+                stray_text = True
+        else:
+            pieces.append(chunk[piece_start:])
+        base += len(chunk)
+
 def get_exps(string_to_parse):
-    '''Parses the string passed to it using a stack. The stack pushes chars 
-until it hits a right parenthesis, it then pops until it reads a left
-parenthesis. If there are no left parenthesis in the stack once popping is 
-finished, then the term was an expression, and that portion of the string is
-sliced and appended to the final list of expressions.
+    '''Splits the string passed to it into its top-level lisp expressions. A count of the open parentheses is kept as the string is read.
+When a left parenthesis is read at depth zero, an expression starts, and when the matching right parenthesis brings the depth back to zero
+that portion of the string is sliced and appended to the final list of expressions. See iter_exps for reading from files.
 
     Keyword Arguments:
     string_to_parse -- A string that has lisp-readable portions. Said portions are sliced and added to a list containing all the valid expressions found in the string
@@ -428,36 +1772,18 @@ sliced and appended to the final list of expressions.
     Returns:
     list_exps -- A list of strings containing all the valid lisp expressions found within the input string'''
 
-    paren_stack = list()
-    list_exps = list()
-    start_i = 0
-    end_i = 0
-    for index,character in enumerate(string_to_parse):
-        if not character in string.whitespace:
-            if not '(' in paren_stack:
-                start_i = index
-            #Found a right parenthesis, pop until you get a left parenthesis. If the stack is now empty, the right parenthesis was the end of a term.The next term will begin 1 spot later
-            if character == ')':
-                top = paren_stack.pop()
-                while(top != '(' and len(paren_stack) > 0):
-                    top = paren_stack.pop()
-                #if the stack has no left parenthesis in it, we've popped off a full term
-                if not '(' in paren_stack:
-                    end_i = index+1
-                    list_exps.append(string_to_parse[start_i:end_i])
-            #Not a right parenthesis or the beginning of a term. Append as usual.
-            else:
-                paren_stack.append(character)
-    return list_exps
+    return [expression for offset, expression in iter_exps(string_to_parse)]
 
 
-def wf_op_check(input_s):
+def wf_op_check(input_s, node_table=None, operators=None):
     '''Takes a string as input and determines whether it is a well-formed STRIPs-like operator. This is done by determining
 whether the label for the operator satisfies its requirements, then determining whether its preconditions, add list, and delete
 list are well-formed based on how they were defined in wfp_checkerFOL and wfp_checker.
 
     Keyword Arguments:
     input_s -- The input string to be checked for well-formedness.
+    node_table -- An optional NodeTable. When given, the operator's trees are stored in it and the StripsOp holds NodeRefs instead of LexNodes.
+    operators -- An optional dictionary to store the StripsOp in instead of the module's operator_dictionary.
     Returns:
     't' if the operator is well-formed, 'nil' if it is not.'''
 
@@ -485,26 +1811,33 @@ list are well-formed based on how they were defined in wfp_checkerFOL and wfp_ch
     list_of_changes = list()
     for item in list_of_props:
         logical_prop = get_exps(remove_outer_parenthesis(item))
-        if wfp_checkerFOL(logical_prop[0]) == 'nil':
-            return 'nil'
+        #Parsing as FOL both checks well-formedness (as wfp_checkerFOL does) and gives the tree, so each proposition is only parsed once
+        if node_table is None:
+            lex_tree = parse_cache.parse(logical_prop[0], True)
         else:
-            tokenized_s = tokenize_string(logical_prop[0])
-            lex_tree = construct_parse_tree(tokenized_s, True)
-            list_of_changes.append(lex_tree)
+            root = node_table.add_string(logical_prop[0], True)
+            lex_tree = None if root is None else node_table.node(root)
+        if lex_tree is None:
+            return 'nil'
+        list_of_changes.append(lex_tree)
         
     #The operator is well formed, create a StripsOp with it, add it to the dictionary and return t.
     new_op = StripsOp(operator_name, param_list, list_of_changes)
-    operator_dictionary[operator_name] = new_op
+    if operators is None:
+        operators = operator_dictionary
+    operators[operator_name] = new_op
 
     return 't'
 
-def demonstrate_plan():
+def demonstrate_plan(file_name = "prog3_plan_demo.in", operators = None, stop_at_goal = False):
     '''Reads from a text file which is lisp-readable, initializes the start
 and goal states, and shows a user defined plan. At each stage, from
 initialization to start, the input is tested for well-formedness.
 
     Keyword Arguments:
-    None
+    file_name -- The name of the lisp-readable file with the init, goal, actions and plan.
+    operators -- An optional dictionary to keep the operators in. By default they go in the module's operator_dictionary.
+    stop_at_goal -- If True, the rest of the plan is skipped once every goal holds.
 
     Returns:
     None'''
@@ -518,87 +1851,89 @@ initialization to start, the input is tested for well-formedness.
 #            |e| - right
 #            |j| - boat
 #IMPORTANT - In the original program specs |j| wasn't an acceptable value for FOL. I changed this so I could have one more constant.
-    input_file = ""
-    with open("prog3_plan_demo.in") as f:
-        input_file = f.read()
-
-    parsed_file = get_exps(input_file)
-    world_state = list()
-    goal_state = list()
-
-    init_is_wf = goal_is_wf = actions_are_wf = True
-    #If either the initial state, the goal state, or the actions are not well-formed, the rest of the file is processed, but the plan is not walked through, only tested for well-formedness
-
-    for expression in parsed_file:
-        if expression[1:5] == 'init':
-           print('Initialization states: ' + expression)
-           print('Determining well-formedness of initialization states...')
-           init_exps = get_exps(remove_outer_parenthesis(expression))
-           init_is_wf = are_exps_wf(init_exps, "Initialization")
-           world_state = init_exps
-           if init_is_wf:
-               print('Initialization states are well-formed.\n')
+    if operators is None:
+        operators = operator_dictionary
+    with open(file_name) as plan_file:
+        #Expressions are read from the file one at a time as the loop below asks for them
+        parsed_file = (expression for offset, expression in iter_exps(plan_file))
+        world_state = WorldState()
+        goal_state = list()
+
+        init_is_wf = goal_is_wf = actions_are_wf = True
+        #If either the initial state, the goal state, or the actions are not well-formed, the rest of the file is processed, but the plan is not walked through, only tested for well-formedness
+
+        for expression in parsed_file:
+            if expression[1:5] == 'init':
+               print('Initialization states: ' + expression)
+               print('Determining well-formedness of initialization states...')
+               init_exps = get_exps(remove_outer_parenthesis(expression))
+               init_is_wf = are_exps_wf(init_exps, "Initialization")
+               world_state = WorldState(init_exps)
+               if init_is_wf:
+                   print('Initialization states are well-formed.\n')
    
-        if expression[1:5] == 'goal':
-            print('Goal states: ' + expression)
-            print('Determining well-formedness of goal states...')
-            goal_exps = get_exps(remove_outer_parenthesis(expression))
-            goal_is_wf = are_exps_wf(goal_exps, "Goal")
-            goal_state = goal_exps
-            if goal_is_wf:
-                print('Goal states are well formed.\n')
+            if expression[1:5] == 'goal':
+                print('Goal states: ' + expression)
+                print('Determining well-formedness of goal states...')
+                goal_exps = get_exps(remove_outer_parenthesis(expression))
+                goal_is_wf = are_exps_wf(goal_exps, "Goal")
+                goal_state = goal_exps
+                if goal_is_wf:
+                    print('Goal states are well formed.\n')
  
 
-        if expression[1:8] == 'actions':
-            print('Determining well-formedness of STRIPS operators...')
-            for action in get_exps(remove_outer_parenthesis(expression)):
-                if wf_op_check(action) == 'nil':
-                    actions_are_wf = False
-                    print(action)
-                    print('\n')
-                    print('Operators are not well-formed.\n')
-            if(actions_are_wf):
-                print('Operators are well-formed.\n')
+            if expression[1:8] == 'actions':
+                print('Determining well-formedness of STRIPS operators...')
+                for action in get_exps(remove_outer_parenthesis(expression)):
+                    if wf_op_check(action, operators=operators) == 'nil':
+                        actions_are_wf = False
+                        print(action)
+                        print('\n')
+                        print('Operators are not well-formed.\n')
+                if(actions_are_wf):
+                    print('Operators are well-formed.\n')
                     
 
-        if expression[1:5] == 'plan':
-            if not (actions_are_wf or goal_is_wf or init_is_wf):
-                print('Cannot run through the plan because either the goals, initializations, or actions are not well-formed.')
-                break
+            if expression[1:5] == 'plan':
+                if not (actions_are_wf or goal_is_wf or init_is_wf):
+                    print('Cannot run through the plan because either the goals, initializations, or actions are not well-formed.')
+                    break
 
-            else:
-                print('Starting at a state of: ' + ",".join(world_state) + ' \nand a goal state of: ' + ",".join(goal_state) + "\n")
-                #Iterate through the actions in the plan, print them out
-                #and show the world state after each consecutive iteration
-                plan = get_exps(remove_outer_parenthesis(expression))
-                for action in plan:
-                    print(action)
-                    print('')
-                    match = re.match('\(' + "(" + "|".join([key for key in operator_dictionary.keys()]) + ")", action)
-                    op_name = match.group(0)[1:]
-                    #Find the key to a matching operator in our dictionary of operators, then call execute_op on it. 
-                    for key in operator_dictionary.keys():
-                        if op_name == key:
-                           strips_op = operator_dictionary[op_name]
-                           world_state = strips_op.execute_op(action, world_state)
-                    print('New world state: ' + ",".join(world_state) + "\n")
-
-                reached_goal = True
-                for goal in goal_state:
-                    if not goal in world_state:
-                        reached_goal = False
-                        break  
-                print("Did we reach the goal state?")
-                print("World State: ")
-                print(world_state)
-                print("Goal state: ")
-                print(goal_state)
-                if(reached_goal):
-                    print("Yes!")
                 else:
-                    print("No")
-
-                    
+                    print('Starting at a state of: ' + ",".join(world_state) + ' \nand a goal state of: ' + ",".join(goal_state) + "\n")
+                    #Iterate through the actions in the plan, print them out
+                    #and show the world state after each consecutive iteration
+                    plan = get_exps(remove_outer_parenthesis(expression))
+                    monitor = GoalMonitor(goal_state, world_state)
+                    for action in plan:
+                        if stop_at_goal and monitor.satisfied():
+                            break
+                        print(action)
+                        print('')
+                        op_name, arguments = parse_action(action)
+                        #Find the matching operator in our dictionary of operators, then apply the action with it. 
+                        if op_name in operators:
+                            strips_op = operators[op_name]
+                            #The step is still carried out so the rest of the plan can be shown, but it is reported
+                            if not strips_op.preconditions_hold(arguments, world_state):
+                                print('The preconditions of this action are not satisfied.\n')
+                            world_state = strips_op.apply_action(arguments, world_state, monitor=monitor)
+                        else:
+                            #An unknown action changes nothing, but it is still a step
+                            monitor.update(((), ()))
+                        print('New world state: ' + ",".join(world_state) + "\n")
+
+                    reached_goal = monitor.satisfied()
+                    print("Did we reach the goal state?")
+                    print("World State: ")
+                    print(world_state)
+                    print("Goal state: ")
+                    print(goal_state)
+                    if(reached_goal):
+                        print("Yes!")
+                        print("The goal state was first reached after step %d of %d." % (monitor.first_satisfied, len(plan)))
+                    else:
+                        print("No")
 
 def are_exps_wf(list_of_exps, exp_type_s):
     '''This function iterates over the list_of_exps and determines whether they are well-formed within the context of first order logic. If they are not, it prints to the console that they are not. This is similar to wfp_checkerFOL but is only meant to be used in demonstrate_plan to keep code readable
@@ -635,4 +1970,11 @@ and last position of the string. This occurs so often in this program that it wa
     return string_to_edit[1:-1]
 
 if __name__ == '__main__':
-    demonstrate_plan()
+    import prog3_profile
+    parser = argparse.ArgumentParser(description='Checks and walks through the plan in a lisp-readable file.')
+    parser.add_argument('plan_file', nargs='?', default='prog3_plan_demo.in')
+    prog3_profile.add_profile_arguments(parser)
+    args = parser.parse_args()
+    #prog3_profile instruments the prog3 module, which is a different module object from this __main__ one, so the plan is run through it
+    import prog3
+    prog3_profile.profiled_run(lambda: prog3.demonstrate_plan(args.plan_file), args)
@@ -0,0 +1,123 @@
+#!/usr/bin/python
+'''Bit-vector world states for prog3_planner. Every ground fact the search can meet is given a bit, a state is the Python int with the
+bits of its true facts set, and every ground action becomes a few masks, so checking and applying an action are a handful of int operations
+and a state hashes and compares as a single number.'''
+import prog3
+
+class StateEncoder(object):
+    '''Numbers ground facts and converts between containers of fact tuples and int states.'''
+
+    def __init__(self, facts=()):
+        #facts[k] is the fact with bit 1 << k
+        self.facts = list()
+        self.bits = dict()
+        for fact in facts:
+            self.bit(fact)
+
+    def bit(self, fact):
+        '''Returns the mask of a fact tuple, numbering it if it has not been seen before.'''
+        if not fact in self.bits:
+            self.bits[fact] = 1 << len(self.facts)
+            self.facts.append(fact)
+        return self.bits[fact]
+
+    def encode(self, facts):
+        '''Returns the int state for a container of fact tuples.'''
+        state = 0
+        for fact in facts:
+            state |= self.bit(fact)
+        return state
+
+    def decode(self, state):
+        '''Returns the list of fact tuples that are true in an int state, in bit order.'''
+        facts = self.facts
+        decoded = list()
+        while state:
+            low = state & -state
+            decoded.append(facts[low.bit_length() - 1])
+            state ^= low
+        return decoded
+
+class BitAction(object):
+    '''A GroundAction compiled into masks. The action is applicable in state s when (s & pre) == pre and s & neg == 0 and, if its
+preconditions are not a conjunction of facts and negated facts, when its precondition program also holds. Applying it gives (s & ~delete) | add,
+which removes the delete list before adding the add list just as WorldState.apply does.'''
+    __slots__ = ('action', 'pre', 'neg', 'add', 'delete', 'needs_program')
+
+    def __init__(self, action, encoder):
+        self.action = action
+        self.add = encoder.encode(action.add_facts)
+        self.delete = encoder.encode(action.delete_facts)
+        #The delete list has to be in the state for the action to be carried out
+        self.pre = self.delete
+        self.neg = 0
+        self.needs_program = False
+        #Symbolically evaluate the precondition program. A stack entry is (pre, neg, is_single_fact), or None once it is not a conjunction.
+        #Quantified preconditions have no program and are always model checked.
+        stack = [None] if action.op.precondition_program is None else list()
+        for opcode, argument in action.op.precondition_program or ():
+            if opcode == 'fact':
+                stack.append((encoder.bit(prog3.fill_template(argument, action.arguments)), 0, True))
+            elif opcode == 'NOT':
+                operand = stack.pop()
+                stack.append((0, operand[0], False) if operand is not None and operand[2] else None)
+            else:
+                b = stack.pop()
+                a = stack.pop()
+                if opcode == 'AND' and a is not None and b is not None:
+                    stack.append((a[0] | b[0], a[1] | b[1], False))
+                else:
+                    stack.append(None)
+        if stack[0] is None:
+            self.needs_program = True
+            self.pre |= encoder.encode(action.preconditions)
+        else:
+            self.pre |= stack[0][0]
+            self.neg = stack[0][1]
+
+class BitStateSpace(object):
+    '''The search space of prog3_planner.search with int states. Actions are indexed under the lowest bit of their pre mask, so generating
+the successors of a state only looks at actions with at least one required fact in the state.'''
+
+    def __init__(self, domain, actions):
+        self.encoder = StateEncoder(domain.init)
+        self.actions = [BitAction(action, self.encoder) for action in actions]
+        self.goal_mask = self.encoder.encode(domain.goals)
+        #lowest bit of pre -> actions, and the actions with an empty pre mask
+        self.watchers = dict()
+        self.unconditional = list()
+        for bit_action in self.actions:
+            if bit_action.pre:
+                self.watchers.setdefault(bit_action.pre & -bit_action.pre, list()).append(bit_action)
+            else:
+                self.unconditional.append(bit_action)
+        self.initial = self.encoder.encode(domain.init)
+
+    def is_goal(self, state):
+        return state & self.goal_mask == self.goal_mask
+
+    def facts(self, state):
+        return self.encoder.decode(state)
+
+    def successors(self, state):
+        '''Yields (GroundAction, successor state) for every action applicable in an int state.'''
+        watchers = self.watchers
+        candidates = list(self.unconditional)
+        remaining = state
+        while remaining:
+            low = remaining & -remaining
+            if low in watchers:
+                candidates.extend(watchers[low])
+            remaining ^= low
+        facts = None
+        for bit_action in candidates:
+            pre = bit_action.pre
+            if state & pre != pre or state & bit_action.neg:
+                continue
+            action = bit_action.action
+            if bit_action.needs_program:
+                if facts is None:
+                    facts = set(self.encoder.decode(state))
+                if not action.op.preconditions_hold(action.arguments, facts):
+                    continue
+            yield action, (state & ~bit_action.delete) | bit_action.add
@@ -0,0 +1,391 @@
+#!/usr/bin/python
+'''Compiled domain files. A planning problem in the lisp-readable format of prog3_plan_demo.in is parsed once and written out as a binary file
+of int32 arrays, which can be memory mapped and turned back into a prog3_planner.Domain without tokenizing or parsing anything.
+
+    python3 prog3_compiled.py SOURCE [COMPILED]
+
+The file starts with a fixed header, followed by a table of sections and then the sections themselves:
+
+    header    '<8sHH32sI'  magic b'P3DOMAIN', format version, 0, SHA-256 of the source file, number of sections
+    table     '<4sQQ'      one (tag, offset, length in bytes) per section
+    SYMS                   the UTF-8 text of every symbol (predicate, constant, variable or label), one after another
+    SOFF                   int32 offsets of the symbols in SYMS, with one more entry for the end of the last one
+    FACT                   every ground fact, each as its length followed by that many symbol ids
+    INIT GOAL              the fact ids of the initial state and of the goals
+    OPS                    the operators (see write_operator)
+    GACT                   the ground actions, each as the index of its operator, one symbol id per parameter and then the fact ids of its
+                           required preconditions, add list and delete list, each list preceded by its length
+
+A template part that is a parameter is stored as -(position + 1) and any other part as its symbol id. Quantified preconditions have no
+program, so their parse tree is stored instead, one node after another in preorder. No pickle is involved, so loading a
+file never runs code from it.'''
+import array
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+import prog3
+import prog3_planner
+
+MAGIC = b'P3DOMAIN'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<8sHH32sI')
+SECTION = struct.Struct('<4sQQ')
+OPCODES = ['fact', 'NOT', 'AND', 'OR', 'IMPLIES', 'EQUIV']
+OPCODE_NUMBERS = {opcode: number for number, opcode in enumerate(OPCODES)}
+
+class CompiledOp(object):
+    '''An operator read from a compiled file. It has the templates and precondition program of a StripsOp, and the precondition tree only
+when the preconditions are quantified, and borrows StripsOp's methods for grounding, checking preconditions and applying actions.'''
+
+    def __init__(self, label, variables, precondition_program, required_templates, add_templates, delete_templates, preconditions=None):
+        self.label = label
+        self.variables = variables
+        self.parameters = ['(%s)' % variable for variable in variables]
+        self.precondition_program = precondition_program
+        #The tree of quantified preconditions, which are model checked by prog3_fol
+        self.preconditions = preconditions
+        self.precondition_formula = None
+        self.required_templates = required_templates
+        self.add_templates = add_templates
+        self.delete_templates = delete_templates
+
+    def __repr__(self):
+        return "CompiledOp(%s,%s)" % (self.label, self.parameters)
+
+    ground = prog3.StripsOp.ground
+    preconditions_hold = prog3.StripsOp.preconditions_hold
+    execute_op = prog3.StripsOp.execute_op
+    apply_action = prog3.StripsOp.apply_action
+
+def source_digest(source_path):
+    '''Returns the SHA-256 digest of a source file.'''
+    with open(source_path, 'rb') as source_file:
+        return hashlib.sha256(source_file.read()).digest()
+
+class DomainWriter(object):
+    '''Collects the symbols and int32 sections of a compiled domain.'''
+
+    def __init__(self):
+        self.symbols = list()
+        self.symbol_ids = dict()
+        self.facts = list()
+        self.fact_ids = dict()
+
+    def symbol(self, text):
+        if not text in self.symbol_ids:
+            self.symbol_ids[text] = len(self.symbols)
+            self.symbols.append(text)
+        return self.symbol_ids[text]
+
+    def write_template(self, out, template):
+        out.append(len(template))
+        out.extend([-(part + 1) if part.__class__ is int else self.symbol(part) for part in template])
+
+    def write_templates(self, out, templates):
+        out.append(len(templates))
+        for template in templates:
+            self.write_template(out, template)
+
+    def write_tree(self, out, tree):
+        '''Appends a parse tree: the number of nodes, then for each node in preorder its kind (a position in prog3.NODE_KINDS), the symbol id of
+its value, its location and its number of children.'''
+        count_position = len(out)
+        out.append(0)
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            out.extend([prog3.KIND_CODES[node.non_term], self.symbol(node.val), node.loc, len(node.children)])
+            out[count_position] += 1
+            stack.extend(reversed(node.children))
+
+    def write_operator(self, out, op):
+        '''Appends an operator: its label, the number of parameters and their names, the length of its precondition program and its
+instructions (an opcode number, followed by a template for 'fact'), and then its required, add and delete templates. Quantified
+preconditions are written as a program length of -1 followed by their tree.'''
+        out.append(self.symbol(op.label))
+        out.append(len(op.variables))
+        out.extend([self.symbol(variable) for variable in op.variables])
+        if op.precondition_program is None:
+            out.append(-1)
+            self.write_tree(out, op.preconditions)
+        else:
+            out.append(len(op.precondition_program))
+            for opcode, argument in op.precondition_program:
+                out.append(OPCODE_NUMBERS[opcode])
+                if opcode == 'fact':
+                    self.write_template(out, argument)
+        self.write_templates(out, op.required_templates)
+        self.write_templates(out, op.add_templates)
+        self.write_templates(out, op.delete_templates)
+
+    def fact(self, fact):
+        if not fact in self.fact_ids:
+            self.fact_ids[fact] = len(self.facts)
+            self.facts.append(fact)
+        return self.fact_ids[fact]
+
+    def write_facts(self, out, facts):
+        out.append(len(facts))
+        out.extend([self.fact(fact) for fact in facts])
+
+    def facts_section(self):
+        out = array.array('i')
+        for fact in self.facts:
+            out.append(len(fact))
+            out.extend([self.symbol(part) for part in fact])
+        return out
+
+def int_bytes(values):
+    '''Returns the little-endian bytes of an array of int32.'''
+    if sys.byteorder == 'big':
+        values = array.array('i', values)
+        values.byteswap()
+    return values.tobytes()
+
+def compile_domain(source_path, compiled_path):
+    '''Parses a planning problem, grounds its actions and writes the compiled file.
+
+    Keyword Arguments:
+    source_path -- The lisp-readable file with init, goal and actions
+    compiled_path -- The file to write
+
+    Returns:
+    The prog3_planner.Domain that was compiled. Raises ValueError if the source is not well-formed.'''
+    digest = source_digest(source_path)
+    with open(source_path) as source_file:
+        domain = prog3_planner.load_domain(source_file)
+    ground_actions = prog3_planner.relaxed_actions(domain)
+    writer = DomainWriter()
+    op_list = list(domain.operators.values())
+    op_index = {op.label: index for index, op in enumerate(op_list)}
+    operators = array.array('i', [len(op_list)])
+    for op in op_list:
+        writer.write_operator(operators, op)
+    actions = array.array('i')
+    for action in ground_actions:
+        actions.append(op_index[action.op.label])
+        actions.extend([writer.symbol(argument) for argument in action.arguments])
+        writer.write_facts(actions, action.preconditions)
+        writer.write_facts(actions, action.add_facts)
+        writer.write_facts(actions, action.delete_facts)
+    init = array.array('i', [writer.fact(fact) for fact in domain.init])
+    goals = array.array('i', [writer.fact(fact) for fact in domain.goals])
+    sections = [(b'FACT', int_bytes(writer.facts_section())), (b'INIT', int_bytes(init)), (b'GOAL', int_bytes(goals)),
+                (b'OPS ', int_bytes(operators)), (b'GACT', int_bytes(actions))]
+    encoded = [symbol.encode('utf-8') for symbol in writer.symbols]
+    offsets = array.array('i', [0])
+    for text in encoded:
+        offsets.append(offsets[-1] + len(text))
+    sections = [(b'SYMS', b''.join(encoded)), (b'SOFF', int_bytes(offsets))] + sections
+    offset = HEADER.size + SECTION.size * len(sections)
+    table = list()
+    for tag, data in sections:
+        #Keep every section 8 byte aligned so a reader can use it in place
+        offset += -offset % 8
+        table.append((tag, offset, len(data)))
+        offset += len(data)
+    #Written next to the target and renamed over it, so a reader never maps a half written file
+    with open(compiled_path + '.tmp', 'wb') as compiled_file:
+        compiled_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, digest, len(sections)))
+        for entry in table:
+            compiled_file.write(SECTION.pack(*entry))
+        for (tag, section_offset, length), (section_tag, data) in zip(table, sections):
+            compiled_file.write(b'\0' * (section_offset - compiled_file.tell()))
+            compiled_file.write(data)
+    os.replace(compiled_path + '.tmp', compiled_path)
+    return domain
+
+class IntReader(object):
+    '''Reads an int32 section front to back.'''
+
+    def __init__(self, values):
+        self.values = values
+        self.position = 0
+
+    def next(self):
+        value = self.values[self.position]
+        self.position += 1
+        return value
+
+    def take(self, count):
+        values = self.values[self.position:self.position + count]
+        self.position += count
+        return values
+
+    def template(self, symbols):
+        return tuple([symbols[part] if part >= 0 else -part - 1 for part in self.take(self.next())])
+
+    def templates(self, symbols):
+        return [self.template(symbols) for count in range(self.next())]
+
+    def tree(self, symbols):
+        '''Reads a parse tree written by DomainWriter.write_tree and rebuilds it as LexNodes.'''
+        root = None
+        #Each entry is a node that still has children to read and how many
+        open_nodes = list()
+        for count in range(self.next()):
+            kind, value, loc, child_count = self.take(4)
+            parent = open_nodes[-1][0] if open_nodes else None
+            node = prog3.LexNode(prog3.PToken(prog3.NODE_KINDS[kind], symbols[value], loc), parent)
+            if parent is None:
+                root = node
+            else:
+                parent.children.append(node)
+                open_nodes[-1][1] -= 1
+                if open_nodes[-1][1] == 0:
+                    open_nodes.pop()
+            if child_count:
+                open_nodes.append([node, child_count])
+        return root
+
+def read_sections(data):
+    '''Checks the header of a compiled file and returns (digest, {tag: bytes of the section}). Raises ValueError if it is not a compiled
+domain of this version.'''
+    if len(data) < HEADER.size:
+        raise ValueError('Not a compiled domain file')
+    magic, version, flags, digest, section_count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError('Not a compiled domain file')
+    if version != FORMAT_VERSION:
+        raise ValueError('Compiled domain format version %d is not supported' % version)
+    sections = dict()
+    for index in range(section_count):
+        tag, offset, length = SECTION.unpack_from(data, HEADER.size + index * SECTION.size)
+        if offset + length > len(data):
+            raise ValueError('Compiled domain file is truncated')
+        sections[tag] = data[offset:offset + length]
+    return digest, sections
+
+def int_section(data):
+    '''Returns an int32 section as an array.'''
+    values = array.array('i')
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+def load_compiled(compiled_path, source_path=None):
+    '''Reads a compiled file into a CompiledDomain.
+
+    Keyword Arguments:
+    compiled_path -- The compiled file
+    source_path -- If given, the file's recorded hash must match this source file, or ValueError is raised because the file is stale.
+
+    Returns:
+    A CompiledDomain, whose operators are CompiledOps.'''
+    with open(compiled_path, 'rb') as compiled_file:
+        with mmap.mmap(compiled_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            digest, sections = read_sections(data)
+    if source_path is not None and digest != source_digest(source_path):
+        raise ValueError('%s is stale, %s has changed since it was compiled' % (compiled_path, source_path))
+    return build_domain(sections)
+
+class CompiledDomain(prog3_planner.Domain):
+    '''A Domain read from a compiled file. Its ground actions are only decoded the first time they are asked for, so validating plans
+never pays for them.'''
+
+    def __init__(self, init, goals, operators, op_list, symbols, facts, action_data):
+        self.op_list = op_list
+        self.symbols = symbols
+        self.fact_table = facts
+        self.action_data = action_data
+        self.decoded_actions = None
+        prog3_planner.Domain.__init__(self, init, goals, operators)
+
+    @property
+    def ground_actions(self):
+        if self.decoded_actions is None and self.action_data is not None:
+            self.decoded_actions = self.decode_actions()
+        return self.decoded_actions
+
+    @ground_actions.setter
+    def ground_actions(self, actions):
+        self.decoded_actions = actions
+        if actions is None:
+            return
+        self.action_data = None
+
+    def decode_actions(self):
+        '''Builds the GroundActions from the GACT section.'''
+        #Read with a local position rather than an IntReader, since this loop runs once per ground action
+        values = self.action_data.tolist()
+        symbols = self.symbols
+        facts = self.fact_table
+        op_list = self.op_list
+        ground_action = prog3_planner.GroundAction
+        actions = list()
+        position = 0
+        end = len(values)
+        while position < end:
+            op = op_list[values[position]]
+            position += 1
+            parameter_end = position + len(op.variables)
+            arguments = tuple([symbols[part] for part in values[position:parameter_end]])
+            position = parameter_end + 1
+            lists = list()
+            for count in range(3):
+                list_end = position + values[position - 1]
+                lists.append([facts[part] for part in values[position:list_end]])
+                position = list_end + 1
+            position -= 1
+            actions.append(ground_action(op, arguments, lists[0], lists[1], lists[2]))
+        return actions
+
+def build_domain(sections):
+    '''Builds the Domain from the sections of a compiled file.'''
+    offsets = int_section(sections[b'SOFF'])
+    text = sections[b'SYMS']
+    symbols = [sys.intern(text[offsets[index]:offsets[index + 1]].decode('utf-8')) for index in range(len(offsets) - 1)]
+    reader = IntReader(int_section(sections[b'FACT']))
+    facts = list()
+    while reader.position < len(reader.values):
+        facts.append(tuple([symbols[part] for part in reader.take(reader.next())]))
+    init = [facts[part] for part in int_section(sections[b'INIT'])]
+    goals = [facts[part] for part in int_section(sections[b'GOAL'])]
+    reader = IntReader(int_section(sections[b'OPS ']))
+    op_list = list()
+    for count in range(reader.next()):
+        label = symbols[reader.next()]
+        variables = [symbols[part] for part in reader.take(reader.next())]
+        program_length = reader.next()
+        program = None
+        preconditions = None
+        if program_length < 0:
+            preconditions = reader.tree(symbols)
+        else:
+            program = list()
+            for instruction in range(program_length):
+                opcode = OPCODES[reader.next()]
+                program.append((opcode, reader.template(symbols) if opcode == 'fact' else None))
+        required = reader.templates(symbols)
+        add_templates = reader.templates(symbols)
+        delete_templates = reader.templates(symbols)
+        op_list.append(CompiledOp(label, variables, program, required, add_templates, delete_templates, preconditions))
+    return CompiledDomain(init, goals, {op.label: op for op in op_list}, op_list, symbols, facts, int_section(sections[b'GACT']))
+
+def load_domain(source_path, compiled_path=None):
+    '''Loads a planning problem from its compiled file if that is up to date, and otherwise parses the source and writes the compiled file.
+
+    Keyword Arguments:
+    source_path -- The lisp-readable file with init, goal and actions
+    compiled_path -- The compiled file. By default it is the source path with .p3d added.
+
+    Returns:
+    A prog3_planner.Domain'''
+    if compiled_path is None:
+        compiled_path = source_path + '.p3d'
+    try:
+        return load_compiled(compiled_path, source_path)
+    except (OSError, ValueError):
+        return compile_domain(source_path, compiled_path)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('Usage: python3 prog3_compiled.py SOURCE [COMPILED]')
+        sys.exit(2)
+    compiled_path = sys.argv[2] if len(sys.argv) > 2 else sys.argv[1] + '.p3d'
+    domain = compile_domain(sys.argv[1], compiled_path)
+    print('Compiled {} operators, {} ground actions and {} initial facts into {}.'.format(len(domain.operators), len(domain.ground_actions), len(domain.init), compiled_path))
@@ -0,0 +1,302 @@
+#!/usr/bin/python
+'''Model checking of FOL formulas over a finite structure. The structure is a set of ground facts, such as a world state, together with the
+constants the quantifiers range over. A formula is true when evaluating it in the structure gives true, with ALL and EXISTS ranging over the
+constants.
+
+Formulas are compiled once into a tree of FOLNodes that records the free variables of every subformula. A subformula's value only depends on
+its free variables, so results are memoized per binding of those variables, and a quantifier whose body is guarded by an atom (EXISTS x (AND
+(P x) ...) or ALL x (IMPLIES (P x) ...)) only tries the constants that the facts matching the atom allow, which it finds through the indexes of
+the WorldState.'''
+import functools
+import itertools
+
+import prog3
+
+QUANTIFIERS = ('ALL', 'EXISTS')
+
+#Numbers every FOLNode ever compiled, so that no two subformulas share a memo key in a ModelChecker, even when they come from different formulas
+node_numbers = itertools.count()
+
+class FOLNode(object):
+    '''A node of a compiled formula. kind is 'atom', 'NOT', one of the binary operators, 'ALL' or 'EXISTS'. For an atom, value is the
+predicate and terms the tuple of its terms, where a term is ('const', name), ('var', name) or ('function', name, terms). For a quantifier,
+value is the bound variable. free is the sorted tuple of the free variables of the subformula.'''
+    __slots__ = ('kind', 'value', 'terms', 'children', 'free', 'number')
+
+    def __init__(self, kind, value, terms, children, free, number):
+        self.kind = kind
+        self.value = value
+        self.terms = terms
+        self.children = children
+        self.free = free
+        self.number = number
+
+    def __repr__(self):
+        return "FOLNode(%s,%s,%s)" % (self.kind, self.value, self.free)
+
+def term_variables(term, variables):
+    if term[0] == 'var':
+        variables.add(term[1])
+    elif term[0] == 'function':
+        for argument in term[2]:
+            term_variables(argument, variables)
+
+def compile_term(node):
+    '''Turns a const, variable or function LexNode (or NodeRef) into a term tuple.'''
+    if node.non_term == 'const':
+        return ('const', node.val)
+    if node.non_term == 'variable':
+        return ('var', node.val)
+    if node.non_term == 'function':
+        #Function terms are shallow in practice, so they are compiled recursively
+        return ('function', node.val, tuple([compile_term(child) for child in node.children]))
+    raise ValueError('%s is not a term' % node.val)
+
+@functools.lru_cache(maxsize=1024)
+def compile_formula(wfp_s):
+    '''Compiles a well-formed FOL formula into a tree of FOLNodes. A quantifier over several variables, (ALL |x| |y| ...), becomes one
+quantifier node per variable.
+
+    Keyword Arguments:
+    wfp_s -- A string holding the formula
+
+    Returns:
+    The root FOLNode. Raises ValueError if the formula is not well-formed.'''
+    tree = prog3.parse_cache.parse(wfp_s, True)
+    if tree is None:
+        raise ValueError('%s is not a well-formed formula' % wfp_s)
+    return compile_tree(tree)
+
+def compile_tree(tree):
+    '''Compiles a FOL parse tree (from construct_parse_tree(..., True) or the parse cache) into a tree of FOLNodes.'''
+    numbers = node_numbers
+    results = list()
+    #Explicit stack of (node, children_done) pairs, so deeply nested formulas do not hit the recursion limit
+    stack = [(tree.children[0] if tree.non_term == 'start' else tree, False)]
+    while stack:
+        node, children_done = stack.pop()
+        kind = node.non_term
+        if kind == 'atom':
+            terms = tuple([compile_term(child) for child in node.children])
+            variables = set()
+            for term in terms:
+                term_variables(term, variables)
+            results.append(FOLNode('atom', node.val, terms, (), tuple(sorted(variables)), next(numbers)))
+        elif kind == 'unaryop' and len(node.children) == 1 or kind == 'binaryop' and len(node.children) == 2:
+            if not children_done:
+                stack.append((node, True))
+                stack.extend([(child, False) for child in reversed(node.children)])
+            else:
+                children = results[-len(node.children):]
+                del results[-len(node.children):]
+                free = set()
+                for child in children:
+                    free.update(child.free)
+                results.append(FOLNode(node.val, None, (), tuple(children), tuple(sorted(free)), next(numbers)))
+        elif kind == 'quantifier' and len(node.children) >= 2:
+            if not children_done:
+                stack.append((node, True))
+                stack.append((node.children[-1], False))
+            else:
+                body = results.pop()
+                for variable in reversed(node.children[:-1]):
+                    if variable.non_term != 'variable':
+                        raise ValueError('%s quantifies over %s, which is not a variable' % (node.val, variable.val))
+                    free = tuple([name for name in body.free if name != variable.val])
+                    body = FOLNode(node.val, variable.val, (), (body,), free, next(numbers))
+                results.append(body)
+        else:
+            raise ValueError('Can not evaluate a %s node' % kind)
+    return results[0]
+
+class Structure(object):
+    '''A finite structure: the ground facts that are true, the constants quantifiers range over and an interpretation of function symbols.
+
+    Keyword Arguments:
+    facts -- A WorldState, or an iterable of fact strings or tuples
+    constants -- The constants the quantifiers range over. By default, every constant that appears in a fact.
+    functions -- An optional dictionary from (function, argument tuple) to a constant. A function application that is not in it is its own
+value, written the way parse_fact writes it, such as '(|f| |a|)'.'''
+
+    def __init__(self, facts, constants=None, functions=None):
+        self.world_state = facts if facts.__class__ is prog3.WorldState else prog3.WorldState(facts)
+        if constants is None:
+            found = set()
+            for fact in self.world_state.facts:
+                #Function applications such as '(|f| |a|)' are values, not constants to quantify over
+                found.update([part for part in fact[1:] if not part.startswith('(')])
+            constants = sorted(found)
+        self.constants = list(constants)
+        self.constant_set = set(self.constants)
+        self.functions = dict() if functions is None else functions
+
+    def term_value(self, term, binding):
+        '''Returns the constant a term denotes under a binding of its variables. Raises ValueError for an unbound variable.'''
+        if term[0] == 'const':
+            return term[1]
+        if term[0] == 'var':
+            if not term[1] in binding:
+                raise ValueError('%s is free and has no value' % term[1])
+            return binding[term[1]]
+        arguments = tuple([self.term_value(argument, binding) for argument in term[2]])
+        return self.functions.get((term[1], arguments), '(%s)' % ' '.join((term[1],) + arguments))
+
+class ModelChecker(object):
+    '''Evaluates formulas in a Structure. Subformula results are memoized per binding of their free variables for as long as the checker
+lives, so a checker should be thrown away (or cleared) when the facts of its structure change.'''
+
+    def __init__(self, structure):
+        self.structure = structure
+        self.memo = dict()
+        self.memo_hits = 0
+        self.lookups = 0
+
+    def clear(self):
+        self.memo.clear()
+
+    def holds(self, formula, binding=None):
+        '''Returns True if a formula is true in the structure.
+
+    Keyword Arguments:
+    formula -- A formula string or a compiled FOLNode
+    binding -- An optional dictionary giving the values of the free variables of the formula
+
+    Returns:
+    True or False. Raises ValueError if the formula is not well-formed or a free variable has no value.'''
+        root = compile_formula(formula) if formula.__class__ is str else formula
+        binding = dict() if binding is None else binding
+        memo = self.memo
+        facts = self.structure.world_state.facts
+        term_value = self.structure.term_value
+        result = None
+        #Frames are [node, binding, memo key, phase, state], where state is the candidate iterator of a quantifier or the left value of a
+        #binary operator. A frame that finishes leaves its value in result for the frame below it.
+        stack = list()
+        pending = (root, binding)
+        while True:
+            if pending is not None:
+                node, node_binding = pending
+                pending = None
+                if node.kind == 'atom':
+                    #An atom is a single hash lookup, which is cheaper than memoizing it
+                    self.lookups += 1
+                    fact = (node.value,) + tuple([term_value(term, node_binding) for term in node.terms])
+                    result = fact in facts
+                else:
+                    key = (node.number, tuple([node_binding.get(name) for name in node.free]))
+                    if key in memo:
+                        self.memo_hits += 1
+                        result = memo[key]
+                    else:
+                        stack.append([node, node_binding, key, 0, None])
+            if not stack:
+                return result
+            frame = stack[-1]
+            node, node_binding, key, phase = frame[:4]
+            kind = node.kind
+            value = None
+            if kind in QUANTIFIERS:
+                if phase == 0:
+                    frame[4] = iter(self.candidates(node, node_binding))
+                    frame[3] = 1
+                elif (kind == 'EXISTS') == result:
+                    #A witness for EXISTS or a counterexample for ALL decides the quantifier
+                    value = result
+                for constant in ([] if value is not None else frame[4]):
+                    extended = dict(node_binding)
+                    extended[node.value] = constant
+                    pending = (node.children[0], extended)
+                    break
+                else:
+                    if value is None:
+                        value = kind == 'ALL'
+            elif phase == 0:
+                frame[3] = 1
+                pending = (node.children[0], node_binding)
+            elif kind == 'NOT':
+                value = not result
+            elif phase == 1:
+                if kind == 'AND' and not result:
+                    value = False
+                elif kind == 'OR' and result:
+                    value = True
+                elif kind == 'IMPLIES' and not result:
+                    value = True
+                else:
+                    frame[3] = 2
+                    frame[4] = result
+                    pending = (node.children[1], node_binding)
+            else:
+                value = frame[4] == result if kind == 'EQUIV' else result
+            if pending is None:
+                stack.pop()
+                memo[key] = value
+                result = value
+
+    def candidates(self, node, binding):
+        '''Returns an iterable of the constants worth trying for the variable of a quantifier node. If the body has a guard atom that mentions the variable
+directly, only the constants of the facts that match the guard can make the body true (EXISTS) or false (ALL); otherwise every constant is tried.'''
+        variable = node.value
+        body = node.children[0]
+        if node.kind == 'EXISTS':
+            guards = body
+        elif body.kind == 'IMPLIES':
+            guards = body.children[0]
+        else:
+            return self.structure.constants
+        #The guard is any positive atom among the conjuncts
+        conjuncts = [guards]
+        while conjuncts:
+            conjunct = conjuncts.pop()
+            if conjunct.kind == 'AND':
+                conjuncts.extend(conjunct.children)
+            elif conjunct.kind == 'atom' and ('var', variable) in conjunct.terms:
+                return self.guard_values(conjunct, variable, binding)
+        return self.structure.constants
+
+    def guard_values(self, atom, variable, binding):
+        '''Yields the values of variable in the facts that match an atom under a binding, found through the most specific index.'''
+        structure = self.structure
+        world_state = structure.world_state
+        #The parts of the atom that are known: a constant, a bound variable, or a function whose variables are all bound
+        known = list()
+        for position, term in enumerate(atom.terms, 1):
+            if term == ('var', variable):
+                continue
+            variables = set()
+            term_variables(term, variables)
+            if variables.issubset(binding):
+                known.append((position, structure.term_value(term, binding)))
+        self.lookups += 1
+        if known:
+            facts = world_state.by_argument.get((atom.value, known[0][0], known[0][1]), ())
+        else:
+            facts = world_state.by_predicate.get(atom.value, ())
+        positions = [position for position, term in enumerate(atom.terms, 1) if term == ('var', variable)]
+        seen = set()
+        length = len(atom.terms) + 1
+        #A generator, so a quantifier that is decided early does not pay for the rest of the facts
+        for fact in facts:
+            if len(fact) != length:
+                continue
+            value = fact[positions[0]]
+            if value in seen or not value in structure.constant_set:
+                continue
+            if all([fact[position] == value for position in positions]) and all([fact[position] == known_value for position, known_value in known]):
+                seen.add(value)
+                yield value
+
+def evaluate_fol(wfp_s, facts, binding=None, constants=None):
+    '''Evaluates a FOL formula in the structure given by a set of facts.
+
+    Keyword Arguments:
+    wfp_s -- A string holding a well-formed formula
+    facts -- A WorldState, or an iterable of fact strings or tuples
+    binding -- An optional dictionary giving the values of free variables
+    constants -- The constants quantifiers range over. By default every constant in the facts.
+
+    Returns:
+    't' if the formula is true and 'nil' if it is false. Raises ValueError if it is not well-formed or a free variable has no value.'''
+    if ModelChecker(Structure(facts, constants)).holds(wfp_s, binding):
+        return 't'
+    return 'nil'
@@ -0,0 +1,501 @@
+#!/usr/bin/python
+'''Forward state-space planning over prog3's STRIPS operators. Starting from the init facts, operators are grounded against each state
+that is expanded, and the states are searched with A* or greedy best-first search guided by the h_max or h_add heuristic.'''
+import argparse
+import heapq
+import itertools
+import sys
+import time
+
+import prog3
+import prog3_bitstate
+import prog3_relaxed
+
+class Domain(object):
+    '''A planning problem: the init facts, the goal facts, the operators and the constants (objects) they can be grounded with.'''
+
+    def __init__(self, init, goals, operators):
+        self.init = [prog3.parse_fact(fact) if fact.__class__ is str else fact for fact in init]
+        self.goals = [prog3.parse_fact(fact) if fact.__class__ is str else fact for fact in goals]
+        self.operators = operators
+        constants = set()
+        for fact in self.init + self.goals:
+            constants.update(fact[1:])
+        for op in operators.values():
+            for template in op.add_templates + op.delete_templates + [part[1] for part in (op.precondition_program or ()) if part[0] == 'fact']:
+                constants.update([part for part in template[1:] if part.__class__ is str])
+        self.constants = sorted(constants)
+        #Set by relaxed_actions the first time it is asked, or by prog3_compiled when the domain is loaded
+        self.ground_actions = None
+
+def load_domain(source, node_table=None):
+    '''Reads the init, goal and actions expressions of a planning problem in the format of prog3_plan_demo.in. Any plan in the input is ignored.
+
+    Keyword Arguments:
+    source -- The lisp-readable input string, or an open file object.
+    node_table -- An optional NodeTable to parse the operators into, as wf_op_check takes. By default they are parsed through prog3.parse_cache.
+
+    Returns:
+    A Domain. Raises ValueError if a fact or an operator is not well-formed.'''
+    init = list()
+    goals = list()
+    operators = dict()
+    for offset, expression in prog3.iter_exps(source):
+        if expression[1:5] == 'init' or expression[1:5] == 'goal':
+            facts = [exp for exp in prog3.get_exps(prog3.remove_outer_parenthesis(expression)) if exp.startswith('(')]
+            for fact in facts:
+                if prog3.wfp_checkerFOL(fact) != 't':
+                    raise ValueError('%s is not a well-formed fact' % fact)
+            (init if expression[1:5] == 'init' else goals).extend(facts)
+        elif expression[1:8] == 'actions':
+            for action in prog3.get_exps(prog3.remove_outer_parenthesis(expression)):
+                if action.startswith('(') and prog3.wf_op_check(action, node_table, operators) != 't':
+                    raise ValueError('%s is not a well-formed operator' % action)
+    return Domain(init, goals, operators)
+
+class GroundAction(object):
+    '''One operator with all of its parameters bound to constants.'''
+    __slots__ = ('op', 'arguments', 'preconditions', 'add_facts', 'delete_facts')
+
+    def __init__(self, op, arguments, preconditions=None, add_facts=None, delete_facts=None):
+        '''The precondition, add and delete facts are found by grounding op unless they are given.'''
+        self.op = op
+        self.arguments = arguments
+        if preconditions is None:
+            preconditions = [prog3.fill_template(template, arguments) for template in op.required_templates]
+            add_facts, delete_facts = op.ground(arguments)
+        self.preconditions = preconditions
+        self.add_facts = add_facts
+        self.delete_facts = delete_facts
+
+    def __str__(self):
+        '''The action in the format of a (plan ...) step, such as (MoveBoat (|d|)(|e|)(|j|))'''
+        return '(%s %s)' % (self.op.label, ''.join(['(%s)' % argument for argument in self.arguments]))
+
+def match_template(template, fact, binding):
+    '''Matches a fact against a template under a partial binding of the parameters.
+
+    Returns:
+    A list of the parameter positions bound by the match, or None if the fact does not match. The binding is only changed if it matches.'''
+    if len(template) != len(fact):
+        return None
+    bound = list()
+    for position in range(1, len(template)):
+        part = template[position]
+        if part.__class__ is int:
+            if binding[part] is None:
+                binding[part] = fact[position]
+                bound.append(part)
+            elif binding[part] != fact[position]:
+                break
+        elif part != fact[position]:
+            break
+    else:
+        return bound
+    for part in bound:
+        binding[part] = None
+    return None
+
+def template_candidates(template, binding, world_state):
+    '''Returns the facts of the world state that could match a template, using the most specific index for the parts that are already known.'''
+    predicate = template[0]
+    for position in range(1, len(template)):
+        part = template[position]
+        if part.__class__ is int:
+            part = binding[part]
+        if part is not None:
+            return world_state.by_argument.get((predicate, position, part), ())
+    return world_state.by_predicate.get(predicate, ())
+
+def ground_operator(op, world_state, constants, check_preconditions=True):
+    '''Finds the arguments under which an operator is applicable in a world state. The required precondition facts are joined against the
+state's indexes, so only parameters that appear in no required fact are tried with every constant.
+
+    Keyword Arguments:
+    op -- A StripsOp
+    world_state -- The WorldState to ground against
+    constants -- The constants a parameter may be bound to
+    check_preconditions -- If False, only the required facts are matched and the rest of the preconditions (NOT, OR...) are ignored.
+
+    Returns:
+    A generator of argument tuples in a fixed order.'''
+    templates = op.required_templates
+    binding = [None] * len(op.variables)
+    #Explicit stack of [candidate iterator, parameter positions bound by the current candidate] frames, one per matched template
+    stack = list()
+    depth = 0
+    while True:
+        if depth == len(templates):
+            free = [position for position, value in enumerate(binding) if value is None]
+            for values in itertools.product(constants, repeat=len(free)):
+                for position, value in zip(free, values):
+                    binding[position] = value
+                arguments = tuple(binding)
+                if not check_preconditions or op.preconditions_hold(arguments, world_state):
+                    yield arguments
+            for position in free:
+                binding[position] = None
+            depth -= 1
+        else:
+            stack.append([iter(template_candidates(templates[depth], binding, world_state)), None])
+        #Advance the deepest template to its next matching fact, backtracking when it runs out
+        while depth >= 0:
+            frame = stack[depth]
+            if frame[1] is not None:
+                for position in frame[1]:
+                    binding[position] = None
+                frame[1] = None
+            for fact in frame[0]:
+                bound = match_template(templates[depth], fact, binding)
+                if bound is not None:
+                    frame[1] = bound
+                    break
+            if frame[1] is not None:
+                depth += 1
+                break
+            stack.pop()
+            depth -= 1
+        if depth < 0:
+            return
+
+def applicable_actions(domain, world_state, check_preconditions=True):
+    '''Yields a GroundAction for every applicable action in a world state, operator by operator. An action whose delete list has a fact that
+is not in the state is skipped, since executing it would fail.'''
+    facts = world_state.facts
+    for op in domain.operators.values():
+        for arguments in ground_operator(op, world_state, domain.constants, check_preconditions):
+            action = GroundAction(op, arguments)
+            if not check_preconditions or all([fact in facts for fact in action.delete_facts]):
+                yield action
+
+class ApplicableActions(object):
+    '''The set of ground actions that are applicable in a world state, kept up to date as the state changes. Every action is indexed under each
+fact its preconditions or delete list mention, so after a change only the actions indexed under the facts that changed are checked again.
+An action with quantified preconditions can depend on any fact, so it is checked again after every change.'''
+
+    def __init__(self, actions, facts=()):
+        self.actions = actions
+        self.world_state = prog3.WorldState(facts)
+        #fact -> indexes of the actions whose applicability depends on it
+        self.watchers = dict()
+        #indexes of the actions with quantified preconditions
+        self.unwatched = list()
+        for index, action in enumerate(actions):
+            mentioned = set(action.delete_facts)
+            if action.op.precondition_program is None:
+                self.unwatched.append(index)
+            else:
+                for opcode, template in action.op.precondition_program:
+                    if opcode == 'fact':
+                        mentioned.add(prog3.fill_template(template, action.arguments))
+            for fact in mentioned:
+                self.watchers.setdefault(fact, list()).append(index)
+        self.applicable = set([index for index in range(len(actions)) if self.check(index)])
+        self.rechecks = 0
+
+    def check(self, index):
+        '''Returns True if the action at index is applicable in the current world state.'''
+        action = self.actions[index]
+        facts = self.world_state.facts
+        for fact in action.delete_facts:
+            if not fact in facts:
+                return False
+        return action.op.preconditions_hold(action.arguments, self.world_state)
+
+    def update(self, changed_facts):
+        '''Checks again every action that depends on one of the changed facts.'''
+        affected = set(self.unwatched) if changed_facts else set()
+        watchers = self.watchers
+        for fact in changed_facts:
+            if fact in watchers:
+                affected.update(watchers[fact])
+        self.rechecks += len(affected)
+        applicable = self.applicable
+        for index in affected:
+            if self.check(index):
+                applicable.add(index)
+            else:
+                applicable.discard(index)
+
+    def apply(self, action):
+        '''Applies a GroundAction to the world state. Returns the undo record from WorldState.apply.'''
+        record = self.world_state.apply(action.add_facts, action.delete_facts)
+        self.update(record[0] + record[1])
+        return record
+
+    def undo(self, record):
+        self.world_state.undo(record)
+        self.update(record[0] + record[1])
+
+    def move_to(self, facts):
+        '''Changes the world state to exactly the given set of fact tuples, touching only the facts that differ.'''
+        current = self.world_state.facts
+        removed = [fact for fact in current if not fact in facts]
+        added = [fact for fact in facts if not fact in current]
+        self.world_state.apply(added, removed)
+        self.update(added + removed)
+
+    def __contains__(self, action):
+        return action in self.applicable
+
+    def __iter__(self):
+        '''Yields the applicable GroundActions in the order they were given.'''
+        actions = self.actions
+        for index in sorted(self.applicable):
+            yield actions[index]
+
+class SetStateSpace(object):
+    '''The search space of search with states as frozensets of fact tuples. Successors come from one ApplicableActions index that is moved
+from each expanded state to the next.'''
+
+    def __init__(self, domain, actions):
+        self.applicable = ApplicableActions(actions, domain.init)
+        self.goals = frozenset(domain.goals)
+        self.initial = frozenset(domain.init)
+
+    def is_goal(self, state):
+        return self.goals <= state
+
+    def facts(self, state):
+        return state
+
+    def successors(self, state):
+        '''Yields (GroundAction, successor state) for every action applicable in a state.'''
+        self.applicable.move_to(state)
+        for action in self.applicable:
+            yield action, state.difference(action.delete_facts).union(action.add_facts)
+
+def validate_plan(domain, plan, monitor=None):
+    '''Walks a plan from the init facts, checking the preconditions and delete list of every step before applying it.
+
+    Keyword Arguments:
+    domain -- A Domain
+    plan -- A list of action strings such as '(MoveBoat (|d|)(|e|)(|j|))'
+    monitor -- An optional prog3.GoalMonitor, started from the init facts, that is updated after every step that is applied
+
+    Returns:
+    A tuple (step, world_state). step is the index of the first step that can not be applied (or None if every step can be), and
+world_state is the WorldState after the steps that were applied.'''
+    world_state = prog3.WorldState(domain.init)
+    for step, action_s in enumerate(plan):
+        label, arguments = prog3.parse_action(action_s)
+        op = domain.operators.get(label)
+        if op is None or len(arguments) != len(op.variables):
+            return step, world_state
+        add_facts, delete_facts = op.ground(arguments)
+        if not all([fact in world_state.facts for fact in delete_facts]) or not op.preconditions_hold(arguments, world_state):
+            return step, world_state
+        record = world_state.apply(add_facts, delete_facts)
+        if monitor is not None:
+            monitor.update(record)
+    return None, world_state
+
+def relaxed_actions(domain):
+    '''Grounds every action that is reachable from the init facts when delete lists and all but the required preconditions are ignored.
+These are the actions the heuristics are computed over.
+
+    Returns:
+    A list of GroundActions. The list is kept on the domain, so the actions are only grounded once.'''
+    if domain.ground_actions is not None:
+        return domain.ground_actions
+    reached = prog3.WorldState(domain.init)
+    actions = list()
+    seen = set()
+    changed = True
+    while changed:
+        changed = False
+        for action in list(applicable_actions(domain, reached, False)):
+            key = (action.op.label, action.arguments)
+            if key in seen:
+                continue
+            seen.add(key)
+            actions.append(action)
+            for fact in action.add_facts:
+                changed = reached.add(fact) or changed
+    domain.ground_actions = actions
+    return actions
+
+class RelaxedCosts(object):
+    '''Computes h_max or h_add for a state over a fixed list of relaxed ground actions. Costs are found with a generalized Dijkstra search in
+which every action keeps a counter of its preconditions that have not been reached yet, so each action is looked at once per precondition.
+Static facts, which hold in every state, are left out of the preconditions, and actions that are then the same are only kept once.'''
+
+    def __init__(self, actions, goals, combine='hmax', static_facts=()):
+        if not combine in ('hmax', 'hadd'):
+            raise ValueError('Unknown heuristic %s' % combine)
+        static_facts = set(static_facts)
+        self.goals = list(set(goals))
+        self.use_max = combine == 'hmax'
+        self.effects = list()
+        self.precondition_counts = list()
+        self.consumers = dict()
+        seen = set()
+        for action in actions:
+            preconditions = frozenset(action.preconditions).difference(static_facts)
+            effects = tuple(sorted(set(action.add_facts)))
+            if (preconditions, effects) in seen:
+                continue
+            seen.add((preconditions, effects))
+            for fact in preconditions:
+                self.consumers.setdefault(fact, list()).append(len(self.effects))
+            self.effects.append(effects)
+            self.precondition_counts.append(len(preconditions))
+        self.free_actions = [index for index, count in enumerate(self.precondition_counts) if count == 0]
+        self.calls = 0
+
+    def __call__(self, state_facts):
+        '''Returns the heuristic value of a state given as a container of fact tuples, or None if a goal can not be reached from it.'''
+        self.calls += 1
+        use_max = self.use_max
+        effects = self.effects
+        consumers = self.consumers
+        remaining = list(self.precondition_counts)
+        accumulated = [0] * len(effects)
+        cost = dict()
+        heap = list()
+        for fact in state_facts:
+            cost[fact] = 0
+            heap.append((0, fact))
+        for index in self.free_actions:
+            for fact in effects[index]:
+                if cost.get(fact, 2) > 1:
+                    cost[fact] = 1
+                    heap.append((1, fact))
+        heapq.heapify(heap)
+        goals_left = len(self.goals)
+        goal_set = set(self.goals)
+        done = set()
+        while heap and goals_left:
+            fact_cost, fact = heapq.heappop(heap)
+            if fact in done:
+                continue
+            done.add(fact)
+            if fact in goal_set:
+                goals_left -= 1
+            for index in consumers.get(fact, ()):
+                if use_max:
+                    if fact_cost > accumulated[index]:
+                        accumulated[index] = fact_cost
+                else:
+                    accumulated[index] += fact_cost
+                remaining[index] -= 1
+                if remaining[index] == 0:
+                    action_cost = accumulated[index] + 1
+                    for added in effects[index]:
+                        if action_cost < cost.get(added, action_cost + 1):
+                            cost[added] = action_cost
+                            heapq.heappush(heap, (action_cost, added))
+        if goals_left:
+            return None
+        if use_max:
+            return max([cost[goal] for goal in self.goals] or [0])
+        return sum([cost[goal] for goal in self.goals])
+
+class SearchResult(object):
+    '''The plan found by a search and the metrics of the search.'''
+
+    def __init__(self, plan, expanded, generated, duplicates, evaluations, seconds):
+        #A list of GroundActions, or None if there is no plan
+        self.plan = plan
+        self.expanded = expanded
+        self.generated = generated
+        self.duplicates = duplicates
+        self.evaluations = evaluations
+        self.seconds = seconds
+
+    def plan_text(self):
+        '''Returns the plan as a (plan ...) expression that demonstrate_plan can replay.'''
+        return '(plan\n%s)' % '\n'.join([str(action) for action in self.plan])
+
+    def metrics(self):
+        return {'plan_length': None if self.plan is None else len(self.plan), 'expanded': self.expanded, 'generated': self.generated,
+                'duplicates': self.duplicates, 'evaluations': self.evaluations, 'seconds': self.seconds}
+
+def search(domain, algorithm='astar', heuristic='hmax', max_expansions=None, states='bits'):
+    '''Searches forward from the init facts for a plan that reaches every goal. A state is expanded at most once thanks to a hashed closed set.
+A* with h_max finds a shortest plan; h_add and h_ff are not admissible but are usually much better informed.
+
+    Keyword Arguments:
+    domain -- A Domain
+    algorithm -- 'astar' or 'gbfs' (greedy best-first search, which orders states by the heuristic alone)
+    heuristic -- 'hmax', 'hadd' or 'hff' (the length of the relaxed plan from prog3_relaxed)
+    max_expansions -- The search gives up after expanding this many states. None means no limit.
+    states -- 'bits' to keep states as ints from prog3_bitstate, or 'sets' to keep them as frozensets of fact tuples.
+
+    Returns:
+    A SearchResult.'''
+    if not algorithm in ('astar', 'gbfs'):
+        raise ValueError('Unknown search algorithm %s' % algorithm)
+    if not states in ('bits', 'sets'):
+        raise ValueError('Unknown state representation %s' % states)
+    start_time = time.perf_counter()
+    actions = relaxed_actions(domain)
+    #An init fact that no action deletes is true in every reachable state
+    static_facts = set(domain.init).difference([fact for action in actions for fact in action.delete_facts])
+    if heuristic == 'hff':
+        estimate = prog3_relaxed.RelaxedPlanningGraph(actions, domain.goals, static_facts)
+    else:
+        estimate = RelaxedCosts(actions, domain.goals, heuristic, static_facts)
+    #Every action that is applicable in a reachable state is one of the relaxed actions. Those whose preconditions are quantified are
+    #model checked by StripsOp.preconditions_hold.
+    if states == 'bits':
+        space = prog3_bitstate.BitStateSpace(domain, actions)
+    else:
+        space = SetStateSpace(domain, actions)
+    greedy = algorithm == 'gbfs'
+    init_key = space.initial
+    #state -> (parent state, action that reached it)
+    parents = {init_key: (None, None)}
+    best_g = {init_key: 0}
+    closed = set()
+    counter = itertools.count()
+    expanded = generated = duplicates = 0
+    plan = None
+    h = estimate(space.facts(init_key))
+    heap = [] if h is None else [(h, h, next(counter), 0, init_key)]
+    while heap:
+        priority, h, tie, g, key = heapq.heappop(heap)
+        if key in closed:
+            continue
+        closed.add(key)
+        if space.is_goal(key):
+            plan = list()
+            while parents[key][0] is not None:
+                key, action = parents[key]
+                plan.append(action)
+            plan.reverse()
+            break
+        if max_expansions is not None and expanded >= max_expansions:
+            break
+        expanded += 1
+        for action, new_key in space.successors(key):
+            generated += 1
+            if new_key in closed or best_g.get(new_key, g + 2) <= g + 1:
+                duplicates += 1
+                continue
+            new_h = estimate(space.facts(new_key))
+            if new_h is None:
+                continue
+            best_g[new_key] = g + 1
+            parents[new_key] = (key, action)
+            heapq.heappush(heap, (new_h if greedy else g + 1 + new_h, new_h, next(counter), g + 1, new_key))
+    return SearchResult(plan, expanded, generated, duplicates, estimate.calls, time.perf_counter() - start_time)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Searches for a plan for the init, goal and actions in a lisp-readable planning problem.')
+    parser.add_argument('input_file', nargs='?', default='prog3_plan_demo.in')
+    parser.add_argument('--algorithm', choices=['astar', 'gbfs'], default='astar')
+    parser.add_argument('--heuristic', choices=['hmax', 'hadd', 'hff'], default='hmax')
+    parser.add_argument('--max-expansions', type=int, default=None)
+    parser.add_argument('--states', choices=['bits', 'sets'], default='bits', help='how states are represented during the search')
+    args = parser.parse_args()
+    with open(args.input_file) as input_file:
+        domain = load_domain(input_file)
+    result = search(domain, args.algorithm, args.heuristic, args.max_expansions, args.states)
+    if result.plan is None:
+        print('No plan found.')
+    else:
+        print(result.plan_text())
+    metrics = result.metrics()
+    print('; ' + ' '.join(['{}={}'.format(name, metrics[name]) for name in sorted(metrics)]))
+    sys.exit(0 if result.plan is not None else 1)
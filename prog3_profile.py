@@ -0,0 +1,255 @@
+#!/usr/bin/python
+'''Opt-in instrumentation of the hot paths of prog3: the tokenizer, the parsers, the parse cache, the evaluators, get_exps and iter_exps
+and the STRIPS operators.
+
+Nothing in prog3 checks whether instrumentation is on. Instead, enabling an Instrumentation replaces the instrumented functions and methods
+with timed wrappers, and disabling it puts the originals back, so a run without it executes exactly the code it always did. Only calls made
+in this process are counted; the worker processes of mp3_demo.py --jobs are not.
+
+    stats = prog3_profile.Instrumentation()
+    with stats:
+        prog3.demonstrate_plan()
+    print(json.dumps(stats.report()))'''
+import cProfile
+import inspect
+import io
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+
+import prog3
+
+def token_count(arguments, result, before):
+    return 0 if result is None else len(result)
+
+def tree_size(arguments, result, before):
+    '''Counts the nodes of a LexNode tree, leaving out the start node.'''
+    if result is None:
+        return 0
+    size = 0
+    stack = list(result.children)
+    while stack:
+        node = stack.pop()
+        size += 1
+        stack.extend(node.children)
+    return size
+
+def one_item(arguments, result, before):
+    return 1
+
+def table_size(arguments):
+    return len(arguments[0])
+
+def added_nodes(arguments, result, before):
+    return len(arguments[0]) - before
+
+#(stage, owner, attribute, counted unit, function called before with the arguments, function giving the count). For a generator the count
+#is taken for every item it yields.
+HOT_PATHS = [
+    ('scan_tokens', prog3, 'scan_tokens', 'tokens', None, token_count),
+    ('tokenize_string', prog3, 'tokenize_string', 'tokens', None, token_count),
+    ('construct_parse_tree', prog3, 'construct_parse_tree', 'nodes', None, tree_size),
+    ('parse_into_table', prog3.NodeTable, 'add_string', 'nodes', table_size, added_nodes),
+    ('simplify_tree', prog3, 'simplify_tree', 'nodes', None, tree_size),
+    ('evaluate_tree', prog3, 'evaluate_tree', None, None, None),
+    ('evaluate_postorder', prog3, 'evaluate_postorder', None, None, None),
+    ('run_program', prog3, 'run_program', None, None, None),
+    ('get_exps', prog3, 'get_exps', 'expressions', None, token_count),
+    ('iter_exps', prog3, 'iter_exps', 'expressions', None, one_item),
+    ('parse_cache_lookup', prog3.ParseCache, 'lookup', None, None, None),
+    ('execute_op', prog3.StripsOp, 'execute_op', None, None, None),
+    ('apply_action', prog3.StripsOp, 'apply_action', None, None, None),
+    ('check_well_formed', prog3, 'check_well_formed', None, None, None),
+    ('wfp_checker', prog3, 'wfp_checker', None, None, None),
+    ('wfp_checkerFOL', prog3, 'wfp_checkerFOL', None, None, None),
+    ('TruthValue', prog3, 'TruthValue', None, None, None),
+    ('IsTautology', prog3, 'IsTautology', None, None, None),
+]
+
+class Stage(object):
+    '''The counters of one instrumented function. seconds only counts the outermost call when a stage calls itself, so time is not
+counted twice, and it includes the time of any other stage called from inside it.'''
+    __slots__ = ('calls', 'seconds', 'unit', 'items', 'depth')
+
+    def __init__(self, unit):
+        self.calls = 0
+        self.seconds = 0.0
+        self.unit = unit
+        self.items = 0
+        self.depth = 0
+
+    def summary(self):
+        summary = {'calls': self.calls, 'seconds': self.seconds, 'mean_us': self.seconds / self.calls * 1e6 if self.calls else 0.0}
+        if self.unit is not None:
+            summary[self.unit] = self.items
+        return summary
+
+def timed(function, stage, before, count):
+    '''Returns a wrapper around function that counts its calls, time and (if count is given) items into stage.'''
+    if inspect.isgeneratorfunction(function):
+        return timed_generator(function, stage, before, count)
+    clock = time.perf_counter
+
+    def wrapper(*arguments, **keywords):
+        stage.calls += 1
+        if stage.depth:
+            return function(*arguments, **keywords)
+        before_value = None if before is None else before(arguments)
+        stage.depth += 1
+        start = clock()
+        try:
+            result = function(*arguments, **keywords)
+        finally:
+            stage.seconds += clock() - start
+            stage.depth -= 1
+        if count is not None:
+            stage.items += count(arguments, result, before_value)
+        return result
+    wrapper.__wrapped__ = function
+    wrapper.__name__ = function.__name__
+    wrapper.__doc__ = function.__doc__
+    return wrapper
+
+def timed_generator(function, stage, before, count):
+    '''The same as timed, for a generator function. Calling one only creates the generator, so the time counted is the time spent getting
+each item from it.'''
+    clock = time.perf_counter
+
+    def wrapper(*arguments, **keywords):
+        stage.calls += 1
+        before_value = None if before is None else before(arguments)
+        generator = function(*arguments, **keywords)
+        while True:
+            outermost = not stage.depth
+            stage.depth += 1
+            start = clock()
+            try:
+                item = next(generator)
+            except StopIteration:
+                return
+            finally:
+                stage.depth -= 1
+                if outermost:
+                    stage.seconds += clock() - start
+            if count is not None:
+                stage.items += count(arguments, item, before_value)
+            yield item
+    wrapper.__wrapped__ = function
+    wrapper.__name__ = function.__name__
+    wrapper.__doc__ = function.__doc__
+    return wrapper
+
+class Instrumentation(object):
+    '''Per stage counters for the functions in HOT_PATHS. It can be used as a context manager, and enabled and disabled any number of
+times; the counters keep adding up until reset is called.'''
+
+    def __init__(self, hot_paths=HOT_PATHS):
+        self.hot_paths = hot_paths
+        self.stages = {stage: Stage(unit) for stage, owner, attribute, unit, before, count in hot_paths}
+        #(owner, attribute, original) for every wrapper currently installed
+        self.installed = list()
+        self.seconds = 0.0
+        self.started = None
+
+    def enable(self):
+        if self.installed:
+            return
+        for stage, owner, attribute, unit, before, count in self.hot_paths:
+            original = getattr(owner, attribute)
+            self.installed.append((owner, attribute, original))
+            setattr(owner, attribute, timed(original, self.stages[stage], before, count))
+        self.started = time.perf_counter()
+
+    def disable(self):
+        for owner, attribute, original in reversed(self.installed):
+            setattr(owner, attribute, original)
+        self.installed = list()
+        if self.started is not None:
+            self.seconds += time.perf_counter() - self.started
+            self.started = None
+
+    def reset(self):
+        for stage in self.stages.values():
+            stage.calls = 0
+            stage.seconds = 0.0
+            stage.items = 0
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        self.disable()
+
+    def report(self):
+        '''Returns a dictionary of the counters of every stage that was called, the time spent enabled and the parse cache statistics.'''
+        stages = {name: stage.summary() for name, stage in sorted(self.stages.items()) if stage.calls}
+        return {'seconds': self.seconds, 'stages': stages, 'parse_cache': prog3.parse_cache.stats()}
+
+def add_profile_arguments(parser):
+    '''Adds the --profile, --cprofile and --tracemalloc options to an argparse parser.'''
+    parser.add_argument('--profile', nargs='?', const='', metavar='FILE',
+                        help='write a JSON report of time spent per stage to FILE, or to stderr if no FILE is given')
+    parser.add_argument('--cprofile', action='store_true', help='with --profile, also run under cProfile and report the slowest functions')
+    parser.add_argument('--tracemalloc', action='store_true', help='with --profile, also trace memory allocations and report the largest')
+
+def profiled_run(function, args, top=20):
+    '''Calls function(), instrumented if args.profile is set, and writes the report where args.profile says.
+
+    Keyword Arguments:
+    function -- The function to run, with no arguments
+    args -- The parsed arguments from a parser given add_profile_arguments
+    top -- The number of functions and allocation sites listed by --cprofile and --tracemalloc
+
+    Returns:
+    What function returns.'''
+    if args.profile is None:
+        return function()
+    stats = Instrumentation()
+    profiler = cProfile.Profile() if args.cprofile else None
+    if args.tracemalloc:
+        tracemalloc.start()
+    stats.enable()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        result = function()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        stats.disable()
+        report = stats.report()
+        if profiler is not None:
+            report['cprofile'] = cprofile_summary(profiler, top)
+        if args.tracemalloc:
+            report['tracemalloc'] = tracemalloc_summary(top)
+            tracemalloc.stop()
+        write_report(report, args.profile)
+    return result
+
+def cprofile_summary(profiler, top):
+    '''Returns the top functions of a cProfile run by cumulative time, as dictionaries.'''
+    profile_stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = list()
+    for (file_name, line, name), (primitive_calls, calls, own_time, cumulative_time, callers) in profile_stats.stats.items():
+        rows.append({'function': '%s:%d(%s)' % (file_name, line, name), 'calls': calls, 'own_seconds': own_time, 'cumulative_seconds': cumulative_time})
+    rows.sort(key=lambda row: row['cumulative_seconds'], reverse=True)
+    return rows[:top]
+
+def tracemalloc_summary(top):
+    '''Returns the current and peak traced memory and the lines that allocated the most of what is still allocated.'''
+    current, peak = tracemalloc.get_traced_memory()
+    statistics = tracemalloc.take_snapshot().statistics('lineno')[:top]
+    return {'current_bytes': current, 'peak_bytes': peak,
+            'top': [{'line': str(statistic.traceback[0]), 'bytes': statistic.size, 'blocks': statistic.count} for statistic in statistics]}
+
+def write_report(report, file_name):
+    if file_name:
+        with open(file_name, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+            report_file.write('\n')
+    else:
+        sys.stderr.write(json.dumps(report, indent=2) + '\n')
@@ -0,0 +1,140 @@
+#!/usr/bin/python
+'''The delete relaxation planning graph for prog3_planner. Fact and action layers are built from a state with a counter of unreached
+preconditions per action, and h_FF is the length of a relaxed plan extracted backwards through the layers.'''
+
+class RelaxedPlanningGraph(object):
+    '''A planning graph over a fixed list of ground actions with their delete lists ignored. The graph is built once per state by build and
+can then be asked for its h_FF value and relaxed plan.
+
+The per action arrays are allocated once and reused for every state. Each build gets a new epoch number and an array entry only counts if it
+was written during the current epoch, so a build only touches the actions it reaches rather than resetting all of them. Static facts, which
+hold in every state, are left out of the preconditions, and actions that are then the same are only kept once.'''
+
+    def __init__(self, actions, goals, static_facts=()):
+        static_facts = set(static_facts)
+        self.goals = list(set(goals))
+        self.goal_set = set(self.goals)
+        #For each kept action: the GroundAction, its preconditions and its add effects
+        self.actions = list()
+        self.preconditions = list()
+        self.effects = list()
+        #fact -> indexes of the actions it is a precondition of
+        self.consumers = dict()
+        seen = set()
+        for action in actions:
+            preconditions = frozenset(action.preconditions).difference(static_facts)
+            effects = tuple(sorted(set(action.add_facts)))
+            if (preconditions, effects) in seen:
+                continue
+            seen.add((preconditions, effects))
+            for fact in preconditions:
+                self.consumers.setdefault(fact, list()).append(len(self.actions))
+            self.actions.append(action)
+            self.preconditions.append(tuple(preconditions))
+            self.effects.append(effects)
+        self.precondition_counts = [len(preconditions) for preconditions in self.preconditions]
+        self.free_actions = [index for index, count in enumerate(self.precondition_counts) if count == 0]
+        self.remaining = [0] * len(self.actions)
+        self.action_epoch = [0] * len(self.actions)
+        self.action_level = [0] * len(self.actions)
+        self.epoch = 0
+        #fact -> level, and fact -> index of the first action that reached it, for the last build
+        self.fact_level = dict()
+        self.achievers = dict()
+        self.goal_level = None
+        self.calls = 0
+
+    def build(self, state_facts):
+        '''Builds the layers of the graph for a state until every goal is reached or no new fact can be reached.
+
+    Keyword Arguments:
+    state_facts -- A container of the fact tuples that are true in the state
+
+    Returns:
+    The level of the last goal to be reached, or None if some goal can not be reached.'''
+        self.epoch += 1
+        self.calls += 1
+        epoch = self.epoch
+        remaining = self.remaining
+        action_epoch = self.action_epoch
+        action_level = self.action_level
+        counts = self.precondition_counts
+        consumers = self.consumers
+        effects = self.effects
+        fact_level = dict.fromkeys(state_facts, 0)
+        achievers = dict()
+        goal_set = self.goal_set
+        goals_left = len([goal for goal in self.goals if not goal in fact_level])
+        frontier = list(fact_level)
+        ready = list(self.free_actions)
+        level = 0
+        while goals_left:
+            #The actions whose last precondition was reached in fact layer level form action layer level
+            for fact in frontier:
+                for index in consumers.get(fact, ()):
+                    if action_epoch[index] != epoch:
+                        action_epoch[index] = epoch
+                        remaining[index] = counts[index]
+                    remaining[index] -= 1
+                    if remaining[index] == 0:
+                        ready.append(index)
+            if not ready:
+                break
+            level += 1
+            frontier = list()
+            for index in ready:
+                action_level[index] = level - 1
+                for fact in effects[index]:
+                    if not fact in fact_level:
+                        fact_level[fact] = level
+                        achievers[fact] = index
+                        frontier.append(fact)
+            ready = list()
+            for fact in frontier:
+                if fact in goal_set:
+                    goals_left -= 1
+        self.fact_level = fact_level
+        self.achievers = achievers
+        self.goal_level = None if goals_left else level
+        return self.goal_level
+
+    def relaxed_plan(self):
+        '''Extracts a relaxed plan from the last build, working back from the goals one layer at a time. An open fact on level i is achieved by
+the action that first reached it, on action layer i-1. That action's effects are marked true at levels i and i-1, and its preconditions are
+opened on their own levels unless they are already marked true at level i-1.
+
+    Returns:
+    A list of the GroundActions of the relaxed plan in layer order, or None if the last build did not reach every goal.'''
+        if self.goal_level is None:
+            return None
+        fact_level = self.fact_level
+        achievers = self.achievers
+        open_facts = [list() for level in range(self.goal_level + 1)]
+        for goal in self.goals:
+            open_facts[fact_level[goal]].append(goal)
+        true_at = set()
+        steps = list()
+        for level in range(self.goal_level, 0, -1):
+            for fact in open_facts[level]:
+                if (fact, level) in true_at:
+                    continue
+                index = achievers[fact]
+                steps.append((self.action_level[index], index))
+                for added in self.effects[index]:
+                    true_at.add((added, level))
+                    true_at.add((added, level - 1))
+                for precondition in self.preconditions[index]:
+                    precondition_level = fact_level[precondition]
+                    if precondition_level > 0 and not (precondition, level - 1) in true_at:
+                        open_facts[precondition_level].append(precondition)
+        steps.sort()
+        return [self.actions[index] for layer, index in steps]
+
+    def h_ff(self, state_facts):
+        '''Returns the number of actions in the relaxed plan for a state, or None if some goal can not be reached from it.'''
+        if self.build(state_facts) is None:
+            return None
+        return len(self.relaxed_plan())
+
+    def __call__(self, state_facts):
+        return self.h_ff(state_facts)
@@ -0,0 +1,267 @@
+#!/usr/bin/python
+'''SAT based tautology checking for prog3. A proposition is a tautology exactly when its negation is unsatisfiable, so the
+negation is turned into CNF with a Tseitin encoding and handed to a small CDCL solver.'''
+import heapq
+
+import prog3
+
+def tseitin_cnf(program, atom_count):
+    '''Converts the negation of a compiled proposition into an equisatisfiable set of CNF clauses using the Tseitin encoding.
+Every binary operator gets a fresh variable that is constrained to be equivalent to its operands. NOT needs no variable, the literal is simply negated.
+
+    Keyword Arguments:
+    program -- A postfix program returned by prog3.compile_tree
+    atom_count -- The number of atoms in the proposition. Atom k of the program is CNF variable k+1.
+
+    Returns:
+    A tuple (var_count, clauses) where clauses is a list of lists of non-zero ints. A positive int is a variable, a negative int its negation.'''
+    clauses = list()
+    stack = list()
+    var_count = atom_count
+    for opcode, argument in program:
+        if opcode == 'atom':
+            stack.append(argument + 1)
+        elif opcode == 'NOT':
+            stack.append(-stack.pop())
+        elif opcode == 'truth':
+            #A proposition that simplified to a constant. Its variable is fixed by a unit clause.
+            var_count += 1
+            clauses.append([var_count] if argument else [-var_count])
+            stack.append(var_count)
+        else:
+            b = stack.pop()
+            a = stack.pop()
+            var_count += 1
+            g = var_count
+            if opcode == 'AND':
+                clauses += [[-g, a], [-g, b], [g, -a, -b]]
+            elif opcode == 'OR':
+                clauses += [[g, -a], [g, -b], [-g, a, b]]
+            elif opcode == 'IMPLIES':
+                clauses += [[g, a], [g, -b], [-g, -a, b]]
+            else:
+                clauses += [[-g, -a, b], [-g, a, -b], [g, a, b], [g, -a, -b]]
+            stack.append(g)
+    #Assert the negation of the whole proposition
+    clauses.append([-stack[0]])
+    return var_count, clauses
+
+class Solver(object):
+    '''A conflict driven clause learning SAT solver. Clauses are watched on two literals, conflicts are analyzed to the first unique
+implication point, and decisions follow variable activity with phase saving and geometric restarts.'''
+
+    def __init__(self, var_count, clauses):
+        self.var_count = var_count
+        #assigns[v] is 1 if v is true, -1 if v is false and 0 if it is unassigned
+        self.assigns = [0] * (var_count + 1)
+        self.level = [0] * (var_count + 1)
+        self.reason = [None] * (var_count + 1)
+        self.phase = [-1] * (var_count + 1)
+        self.activity = [0.0] * (var_count + 1)
+        self.var_inc = 1.0
+        self.order = [(0.0, v) for v in range(1, var_count + 1)]
+        self.watches = {lit: list() for v in range(1, var_count + 1) for lit in (v, -v)}
+        self.trail = list()
+        self.trail_lim = list()
+        self.qhead = 0
+        self.conflicts = 0
+        self.decisions = 0
+        self.ok = True
+        for clause in clauses:
+            if not self.add_clause(clause):
+                self.ok = False
+                break
+
+    def value(self, lit):
+        '''Returns 1 if lit is true, -1 if it is false and 0 if its variable is unassigned.'''
+        if lit > 0:
+            return self.assigns[lit]
+        return -self.assigns[-lit]
+
+    def add_clause(self, clause):
+        '''Adds an input clause at decision level 0. Returns False if the clause makes the problem unsatisfiable.'''
+        lits = list()
+        for lit in clause:
+            #A tautological clause, or one already satisfied at level 0, can never become unit
+            if -lit in lits or self.value(lit) == 1:
+                return True
+            #Literals falsified at level 0 stay false, so they are dropped and never watched
+            if not lit in lits and self.value(lit) == 0:
+                lits.append(lit)
+        if not lits:
+            return False
+        if len(lits) == 1:
+            self.enqueue(lits[0], None)
+            return self.propagate() is None
+        self.watches[lits[0]].append(lits)
+        self.watches[lits[1]].append(lits)
+        return True
+
+    def enqueue(self, lit, reason):
+        v = abs(lit)
+        self.assigns[v] = 1 if lit > 0 else -1
+        self.level[v] = len(self.trail_lim)
+        self.reason[v] = reason
+        self.trail.append(lit)
+
+    def propagate(self):
+        '''Performs unit propagation over the watched literals. Returns the conflicting clause, or None if there was no conflict.'''
+        assigns = self.assigns
+        while self.qhead < len(self.trail):
+            false_lit = -self.trail[self.qhead]
+            self.qhead += 1
+            watchers = self.watches[false_lit]
+            kept = list()
+            i = 0
+            count = len(watchers)
+            while i < count:
+                clause = watchers[i]
+                i += 1
+                #Keep the false literal in position 1 so that position 0 is the other watch
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], clause[0]
+                first = clause[0]
+                first_value = assigns[first] if first > 0 else -assigns[-first]
+                if first_value == 1:
+                    kept.append(clause)
+                    continue
+                for k in range(2, len(clause)):
+                    lit = clause[k]
+                    if (assigns[lit] if lit > 0 else -assigns[-lit]) != -1:
+                        clause[1], clause[k] = lit, false_lit
+                        self.watches[lit].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if first_value == -1:
+                        kept.extend(watchers[i:])
+                        self.watches[false_lit] = kept
+                        return clause
+                    self.enqueue(first, clause)
+            self.watches[false_lit] = kept
+        return None
+
+    def bump(self, v):
+        self.activity[v] += self.var_inc
+        if self.activity[v] > 1e100:
+            for u in range(1, self.var_count + 1):
+                self.activity[u] *= 1e-100
+            self.var_inc *= 1e-100
+            self.order = [(-self.activity[u], u) for u in range(1, self.var_count + 1) if self.assigns[u] == 0]
+            heapq.heapify(self.order)
+        else:
+            heapq.heappush(self.order, (-self.activity[v], v))
+
+    def analyze(self, conflict):
+        '''Walks back along the trail from a conflict to the first unique implication point.
+
+        Returns:
+        A tuple (learnt_clause, backjump_level). The asserting literal is learnt_clause[0].'''
+        seen = set()
+        learnt = [None]
+        current_level = len(self.trail_lim)
+        counter = 0
+        p = None
+        clause = conflict
+        index = len(self.trail) - 1
+        while True:
+            for q in (clause if p is None else clause[1:]):
+                v = abs(q)
+                if not v in seen and self.level[v] > 0:
+                    seen.add(v)
+                    self.bump(v)
+                    if self.level[v] == current_level:
+                        counter += 1
+                    else:
+                        learnt.append(q)
+            while not abs(self.trail[index]) in seen:
+                index -= 1
+            p = self.trail[index]
+            index -= 1
+            clause = self.reason[abs(p)]
+            seen.discard(abs(p))
+            counter -= 1
+            if counter == 0:
+                break
+        learnt[0] = -p
+        backjump_level = 0
+        if len(learnt) > 1:
+            #Put the literal from the highest remaining level in the second watch position
+            highest = max(range(1, len(learnt)), key=lambda k: self.level[abs(learnt[k])])
+            learnt[1], learnt[highest] = learnt[highest], learnt[1]
+            backjump_level = self.level[abs(learnt[1])]
+        self.var_inc /= 0.95
+        return learnt, backjump_level
+
+    def cancel_until(self, level):
+        if len(self.trail_lim) <= level:
+            return
+        for lit in self.trail[self.trail_lim[level]:]:
+            v = abs(lit)
+            self.phase[v] = 1 if lit > 0 else -1
+            self.assigns[v] = 0
+            self.reason[v] = None
+            heapq.heappush(self.order, (-self.activity[v], v))
+        del self.trail[self.trail_lim[level]:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+
+    def pick_branch_var(self):
+        while self.order:
+            v = heapq.heappop(self.order)[1]
+            if self.assigns[v] == 0:
+                return v
+        return 0
+
+    def solve(self):
+        '''Searches for a satisfying assignment.
+
+        Returns:
+        A list model where model[v] is True or False for every variable v (model[0] is unused), or None if the clauses are unsatisfiable.'''
+        if not self.ok:
+            return None
+        restart_limit = 100
+        conflicts_since_restart = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts_since_restart += 1
+                if not self.trail_lim:
+                    return None
+                learnt, backjump_level = self.analyze(conflict)
+                self.cancel_until(backjump_level)
+                if len(learnt) == 1:
+                    self.enqueue(learnt[0], None)
+                else:
+                    self.watches[learnt[0]].append(learnt)
+                    self.watches[learnt[1]].append(learnt)
+                    self.enqueue(learnt[0], learnt)
+            else:
+                if conflicts_since_restart >= restart_limit:
+                    conflicts_since_restart = 0
+                    restart_limit = int(restart_limit * 1.5)
+                    self.cancel_until(0)
+                    continue
+                v = self.pick_branch_var()
+                if v == 0:
+                    return [None] + [self.assigns[u] == 1 for u in range(1, self.var_count + 1)]
+                self.decisions += 1
+                self.trail_lim.append(len(self.trail))
+                self.enqueue(v * self.phase[v], None)
+
+def sat_counterexample(wfp_s):
+    '''Finds a truth assignment under which a well-formed proposition is false by solving the CNF of its negation.
+
+    Keyword Arguments:
+    wfp_s -- A string that is a well-formed proposition.
+
+    Returns:
+    A dictionary mapping each atom to its truth value in a falsifying assignment, or None if the proposition is a tautology.'''
+    #The solver's work grows with the number of clauses, so the program is simplified first
+    program, symbol_list = prog3.compile_proposition(wfp_s, True)
+    var_count, clauses = tseitin_cnf(program, len(symbol_list))
+    model = Solver(var_count, clauses).solve()
+    if model is None:
+        return None
+    return {symbol: model[k + 1] for k, symbol in enumerate(symbol_list)}
@@ -0,0 +1,211 @@
+#!/usr/bin/python
+'''A long-running plan validation service. Domains (init, goal and actions) are parsed once into a registry, and plans are then validated
+against them one request at a time. Requests and responses are single lines of JSON, read from stdin or from the clients of a Unix socket.
+
+    python3 prog3_service.py [--socket PATH] [--load NAME=FILE ...]
+
+Requests:
+    {"op": "load", "domain": "river", "path": "prog3_plan_demo.in"}     (or "text" with the lisp-readable input itself)
+    {"op": "validate", "domain": "river", "plan": "(plan (MoveBoat (|d|)(|e|)(|a|)))", "goal": "(goal (Q |e| |a|))"}
+    {"op": "unload", "domain": "river"}
+    {"op": "domains"}
+    {"op": "stats"}
+
+Every response has "ok", and "error" when ok is false. A validate response has "valid" (every step could be applied), "failed_step" (the
+index of the first step that could not be, or null), "goal_reached", "goal_step" (the number of steps after which every goal first
+held, or null) and, if "state" is true in the request, the final facts as "state".'''
+import argparse
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+
+import prog3
+import prog3_planner
+
+class LatencyHistogram(object):
+    '''Counts request latencies in power of two buckets of microseconds: bucket k holds latencies below 2**k us that are not in bucket k-1.'''
+
+    def __init__(self):
+        self.buckets = dict()
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def record(self, seconds):
+        microseconds = seconds * 1e6
+        bucket = int(microseconds).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += microseconds
+        if microseconds > self.maximum:
+            self.maximum = microseconds
+
+    def percentile(self, fraction):
+        '''Returns the upper bound in microseconds of the bucket that holds the given fraction of the latencies.'''
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= fraction * self.count:
+                return 1 << bucket
+        return 0
+
+    def summary(self):
+        return {'count': self.count, 'mean_us': self.total / self.count if self.count else 0.0, 'max_us': self.maximum,
+                'p50_us': self.percentile(0.5), 'p95_us': self.percentile(0.95), 'p99_us': self.percentile(0.99),
+                'buckets_us': {'<%d' % (1 << bucket): self.buckets[bucket] for bucket in sorted(self.buckets)}}
+
+class DomainRegistry(object):
+    '''Named domains, each parsed into its own prog3_planner.Domain with its own operator dictionary and its own NodeTable, so any number of
+domains can be loaded at once, from any number of threads, without sharing prog3.operator_dictionary or prog3.parse_cache, which are not locked.'''
+
+    def __init__(self):
+        self.domains = dict()
+        self.lock = threading.Lock()
+
+    def load(self, name, source):
+        '''Parses a domain from a string or an open file object and registers it under name, replacing any domain with that name.
+Raises ValueError if the domain is not well-formed.'''
+        #A table of its own, since concurrent loads parsing into the shared parse cache could corrupt its table
+        domain = prog3_planner.load_domain(source, prog3.NodeTable(hash_cons=True))
+        with self.lock:
+            self.domains[name] = domain
+        return domain
+
+    def unload(self, name):
+        with self.lock:
+            if self.domains.pop(name, None) is None:
+                raise KeyError(name)
+
+    def get(self, name):
+        '''Returns the domain registered under name. Raises KeyError if there is none.'''
+        return self.domains[name]
+
+    def names(self):
+        return sorted(self.domains)
+
+def parse_goals(goal_s):
+    '''Returns the fact tuples of a (goal ...) expression. Raises ValueError if a goal is not well-formed.'''
+    goals = list()
+    for fact in prog3.get_exps(prog3.remove_outer_parenthesis(goal_s)):
+        if fact.startswith('('):
+            if prog3.wfp_checkerFOL(fact) != 't':
+                raise ValueError('%s is not a well-formed goal' % fact)
+            goals.append(prog3.parse_fact(fact))
+    return goals
+
+def validate(domain, plan_s, goal_s=None, include_state=False):
+    '''Validates one plan against a domain.
+
+    Keyword Arguments:
+    domain -- A prog3_planner.Domain
+    plan_s -- A (plan ...) expression
+    goal_s -- A (goal ...) expression, or None to use the domain's goals
+    include_state -- If True the response includes the facts of the final state
+
+    Returns:
+    A dictionary for the response.'''
+    plan = [step for step in prog3.get_exps(prog3.remove_outer_parenthesis(plan_s)) if step.startswith('(')]
+    goals = domain.goals if goal_s is None else parse_goals(goal_s)
+    monitor = prog3.GoalMonitor(goals, set(domain.init))
+    failed_step, world_state = prog3_planner.validate_plan(domain, plan, monitor)
+    response = {'ok': True, 'valid': failed_step is None, 'failed_step': failed_step, 'goal_reached': failed_step is None and monitor.satisfied(),
+                'goal_step': monitor.first_satisfied}
+    if include_state:
+        response['state'] = list(world_state)
+    return response
+
+class ValidationService(object):
+    '''Handles request lines against a DomainRegistry and keeps a latency histogram per kind of request.'''
+
+    def __init__(self, registry=None):
+        self.registry = DomainRegistry() if registry is None else registry
+        self.histograms = dict()
+        self.stats_lock = threading.Lock()
+
+    def handle(self, request):
+        '''Handles one decoded request and returns the response dictionary.'''
+        op = request.get('op')
+        if op == 'validate':
+            return validate(self.registry.get(request['domain']), request['plan'], request.get('goal'), request.get('state', False))
+        if op == 'load':
+            if 'text' in request:
+                domain = self.registry.load(request['domain'], request['text'])
+            else:
+                with open(request['path']) as domain_file:
+                    domain = self.registry.load(request['domain'], domain_file)
+            return {'ok': True, 'operators': sorted(domain.operators), 'facts': len(domain.init)}
+        if op == 'unload':
+            self.registry.unload(request['domain'])
+            return {'ok': True}
+        if op == 'domains':
+            return {'ok': True, 'domains': self.registry.names()}
+        if op == 'stats':
+            with self.stats_lock:
+                return {'ok': True, 'latency': {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}}
+        raise ValueError('Unknown op %s' % op)
+
+    def handle_line(self, line):
+        '''Decodes a request line, handles it and returns the response as a line of JSON (without the newline). Errors are reported in the
+response rather than raised, and every request is timed into the histogram for its op.'''
+        start = time.perf_counter()
+        op = 'invalid'
+        try:
+            request = json.loads(line)
+            response = self.handle(request)
+            op = request['op']
+        except KeyError as error:
+            response = {'ok': False, 'error': 'missing or unknown %s' % error}
+        except Exception as error:
+            response = {'ok': False, 'error': str(error)}
+        elapsed = time.perf_counter() - start
+        with self.stats_lock:
+            if not op in self.histograms:
+                self.histograms[op] = LatencyHistogram()
+            self.histograms[op].record(elapsed)
+        return json.dumps(response)
+
+    def serve_lines(self, input_file, output_file):
+        '''Answers every non-blank line of input_file with one line on output_file until the input ends.'''
+        for line in input_file:
+            if line.strip():
+                output_file.write(self.handle_line(line) + '\n')
+                output_file.flush()
+
+def serve_socket(service, path):
+    '''Serves the line protocol on a Unix socket, one thread per client, until interrupted or terminated. The socket file is removed on the way out.'''
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if line.strip():
+                    self.wfile.write((service.handle_line(line.decode('utf-8')) + '\n').encode('utf-8'))
+
+    if os.path.exists(path):
+        os.unlink(path)
+    #SIGTERM exits through the finally below just as Ctrl-C does
+    signal.signal(signal.SIGTERM, lambda signal_number, frame: sys.exit(0))
+    with socketserver.ThreadingUnixStreamServer(path, Handler) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Validates plans against domains that are parsed once and kept loaded.')
+    parser.add_argument('--socket', help='serve on this Unix socket instead of stdin and stdout')
+    parser.add_argument('--load', action='append', default=[], metavar='NAME=FILE', help='load a domain before serving')
+    args = parser.parse_args()
+    service = ValidationService()
+    for item in args.load:
+        name, file_name = item.split('=', 1)
+        with open(file_name) as domain_file:
+            service.registry.load(name, domain_file)
+    if args.socket is None:
+        service.serve_lines(sys.stdin, sys.stdout)
+    else:
+        serve_socket(service, args.socket)
@@ -0,0 +1,69 @@
+#!/usr/bin/python
+'''Parallel tautology checking for prog3. The blocks of truth assignments that prog3.search_blocks checks are split into shards,
+the shards are checked by a pool of processes, and the search stops as soon as any shard finds a falsifying assignment.'''
+import multiprocessing
+import time
+
+import prog3
+
+#How many shards to make per worker process, so that a slow shard does not leave the other workers idle at the end
+SHARDS_PER_JOB = 4
+
+def search_shard(task):
+    '''Checks one shard in a worker process.
+
+    Keyword Arguments:
+    task -- A tuple (wfp_s, shard, first_block, end_block)
+
+    Returns:
+    A tuple (shard, first_block, end_block, index, seconds) where index is the first falsifying assignment in the shard or None.'''
+    wfp_s, shard, first_block, end_block = task
+    start = time.perf_counter()
+    program, symbol_list = prog3.compile_proposition(wfp_s, True)
+    index = prog3.search_blocks(program, len(symbol_list), first_block, end_block)
+    return shard, first_block, end_block, index, time.perf_counter() - start
+
+def sharded_counterexample(wfp_s, jobs=None, shards=None):
+    '''Searches every truth assignment of a well-formed proposition for one that makes it false, split into shards checked in parallel.
+Once a shard finds a falsifying assignment the pool is terminated, which cancels every shard that is still waiting or running.
+Because shards finish in any order, the assignment found is not necessarily the first one find_counterexample would return.
+
+    Keyword Arguments:
+    wfp_s -- A string that is a well-formed proposition.
+    jobs -- The number of worker processes. Defaults to the number of CPUs.
+    shards -- The number of shards. Defaults to SHARDS_PER_JOB shards per job, and is never more than the number of blocks.
+
+    Returns:
+    A tuple (counterexample, shard_times). counterexample is a dictionary mapping each atom to its truth value, or None if the proposition
+is a tautology. shard_times is a list of dictionaries, one per shard that finished, with the keys shard, first_block, end_block, seconds and found.'''
+    program, symbol_list = prog3.compile_proposition(wfp_s)
+    block_count = prog3.tautology_block_count(len(symbol_list))
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    if shards is None:
+        shards = jobs * SHARDS_PER_JOB
+    shards = max(1, min(shards, block_count))
+
+    tasks = list()
+    for shard in range(shards):
+        tasks.append((wfp_s, shard, block_count * shard // shards, block_count * (shard + 1) // shards))
+
+    shard_times = list()
+    index = None
+    if shards == 1:
+        index = record_results(map(search_shard, tasks), shard_times)
+    else:
+        with multiprocessing.Pool(min(jobs, shards)) as pool:
+            #Leaving the with block terminates the pool, cancelling any shards that have not finished
+            index = record_results(pool.imap_unordered(search_shard, tasks), shard_times)
+    if index is None:
+        return None, shard_times
+    return {symbol: ((index >> j) & 1) == 1 for j, symbol in enumerate(symbol_list)}, shard_times
+
+def record_results(results, shard_times):
+    '''Appends the timing of each shard result to shard_times until one of them has found a falsifying assignment, and returns that assignment or None.'''
+    for shard, first_block, end_block, index, seconds in results:
+        shard_times.append({'shard': shard, 'first_block': first_block, 'end_block': end_block, 'seconds': seconds, 'found': index is not None})
+        if index is not None:
+            return index
+    return None